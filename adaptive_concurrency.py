@@ -0,0 +1,210 @@
+"""
+Concurrencia adaptativa para WhatsAppSender (AIMD guiado por latencia)
+En vez de fijar cuántos envíos hay en vuelo, el límite se ajusta solo según
+cómo responde Meta:
+
+- Mientras la latencia y los errores están sanos, el límite sube de a poco
+  (+1 por cada "ronda" de envíos, como TCP).
+- Si Meta limita (130429, 80007, 429) o falla (5xx), el límite se reduce a la
+  mitad, como máximo una vez por ronda.
+- Si el p95 de la última ventana supera `tolerance` veces el p95 base (el mejor
+  observado), también se reduce: la cola ya está creciendo del lado de Meta.
+
+Uso:
+    limiter = AdaptiveLimiter(initial=4, max_limit=64)
+    sender = AdaptiveSender(WhatsAppSender(), limiter)
+    sender.send_utility_template(...)    # espera un lugar libre, mide y ajusta
+    print(limiter.metrics())
+"""
+
+import time
+import threading
+from typing import Optional, Dict, Any
+from metrics import LatencyWindow
+from graph_errors import is_throttling_error, is_server_error
+
+def is_throttle_error(error: BaseException) -> bool:
+    """True si el error es un límite de tasa de Meta o un error 5xx (ver graph_errors.py)."""
+    return is_throttling_error(error) or is_server_error(error)
+
+
+class AdaptiveLimiter:
+    """
+    Límite de envíos en vuelo que se ajusta con AIMD.
+
+    Args:
+        initial: Límite inicial
+        min_limit: Límite mínimo
+        max_limit: Límite máximo (también el número de hilos que conviene tener)
+        backoff: Factor por el que se multiplica el límite al retroceder
+        tolerance: Cuántas veces el p95 base se acepta antes de retroceder
+        window: Latencias por ventana para calcular el p95
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        backoff: float = 0.5,
+        tolerance: float = 2.0,
+        window: int = 100
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.window = window
+
+        self._limit = float(min(max(initial, min_limit), max_limit))
+        self._in_flight = 0
+        self._latencies = LatencyWindow(size=window)
+        self._since_check = 0
+        self._since_decrease = 0
+        self._baseline_p95: Optional[float] = None
+        self._last_p95: Optional[float] = None
+        self._condition = threading.Condition()
+
+        self.completed = 0
+        self.throttled = 0
+        self.errors = 0
+        self.increases = 0
+        self.decreases = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    # ===============================
+    # 🚦 ADMISIÓN
+    # ===============================
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Espera hasta que haya lugar bajo el límite. Retorna False si vence el timeout."""
+        with self._condition:
+            if not self._condition.wait_for(lambda: self._in_flight < int(self._limit), timeout):
+                return False
+            self._in_flight += 1
+            return True
+
+    def release(self, latency: float, throttled: bool = False, failed: bool = False) -> None:
+        """
+        Registra el resultado de un envío y ajusta el límite.
+
+        Args:
+            latency: Segundos que tardó el envío
+            throttled: Meta limitó o falló del lado del servidor (ver is_throttle_error)
+            failed: El envío falló por otro motivo (no afecta el límite)
+        """
+        with self._condition:
+            self._in_flight -= 1
+            self.completed += 1
+            self._since_decrease += 1
+
+            if throttled:
+                self.throttled += 1
+                self._decrease()
+            elif failed:
+                self.errors += 1
+            else:
+                self._latencies.record(latency)
+                self._since_check += 1
+                if self._since_check >= self.window:
+                    self._check_latency()
+                elif self._in_flight + 1 >= int(self._limit):
+                    # Solo se sube si el límite realmente se está usando
+                    self._increase()
+
+            self._condition.notify_all()
+
+    def _increase(self) -> None:
+        if self._limit < self.max_limit:
+            # +1 por cada `limit` envíos exitosos (una ronda)
+            self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+            self.increases += 1
+
+    def _decrease(self) -> None:
+        # Una sola reducción por ronda: los envíos que ya estaban en vuelo no cuentan dos veces
+        if self._since_decrease < int(self._limit):
+            return
+        self._limit = max(self.min_limit, self._limit * self.backoff)
+        self._since_decrease = 0
+        self.decreases += 1
+
+    def _check_latency(self) -> None:
+        """Compara el p95 de la ventana con el p95 base y retrocede si subió demasiado."""
+        self._since_check = 0
+        p95 = self._latencies.percentile(95)
+        self._last_p95 = p95
+
+        if self._baseline_p95 is None or p95 < self._baseline_p95:
+            self._baseline_p95 = p95
+        else:
+            # La base sube lentamente para adaptarse a cambios permanentes de Meta
+            self._baseline_p95 *= 1.01
+
+        if p95 > self._baseline_p95 * self.tolerance:
+            self._decrease()
+
+    def metrics(self) -> Dict[str, Any]:
+        """Estado del controlador: límite, envíos en vuelo, latencias y ajustes."""
+        with self._condition:
+            p50 = self._latencies.percentile(50)
+            return {
+                'limit': int(self._limit),
+                'in_flight': self._in_flight,
+                'completed': self.completed,
+                'throttled': self.throttled,
+                'errors': self.errors,
+                'increases': self.increases,
+                'decreases': self.decreases,
+                'p50_ms': None if p50 is None else round(p50 * 1000, 2),
+                'p95_ms': None if self._last_p95 is None else round(self._last_p95 * 1000, 2),
+                'baseline_p95_ms': None if self._baseline_p95 is None else round(self._baseline_p95 * 1000, 2),
+            }
+
+
+class AdaptiveSender:
+    """
+    Envuelve un WhatsAppSender (o SenderPool): cada método send_* espera lugar en
+    el AdaptiveLimiter, mide la latencia y le informa el resultado.
+
+    Con un SenderPool la latencia se mide desde que el pool toma el token del
+    límite de tasa (on_acquire): la espera por el token no es latencia de Meta
+    y, si contara, el límite retrocedería cada vez que el límite de tasa aprieta.
+    """
+
+    def __init__(self, sender, limiter: Optional[AdaptiveLimiter] = None):
+        self.sender = sender
+        self.limiter = limiter or AdaptiveLimiter()
+        self._local = threading.local()
+        if hasattr(sender, 'on_acquire'):
+            sender.on_acquire = self._start
+
+    def _start(self) -> None:
+        self._local.start = time.perf_counter()
+
+    def _call(self, method, *args, **kwargs):
+        self.limiter.acquire()
+        self._start()
+        try:
+            result = method(*args, **kwargs)
+        except Exception as e:
+            throttled = is_throttle_error(e)
+            self.limiter.release(time.perf_counter() - self._local.start, throttled=throttled, failed=not throttled)
+            raise
+        self.limiter.release(time.perf_counter() - self._local.start)
+        return result
+
+    def __getattr__(self, name: str):
+        attribute = getattr(self.sender, name)
+        if not name.startswith('send_') or not callable(attribute):
+            return attribute
+
+        def method(*args, **kwargs):
+            return self._call(attribute, *args, **kwargs)
+
+        return method
@@ -0,0 +1,214 @@
+"""
+Transporte por lotes (Graph Batch API) para WhatsAppSender
+Agrupa los mensajes pendientes en peticiones batch de hasta 50 operaciones y
+reparte cada respuesta individual a quien envió ese mensaje, con su propio error.
+
+Uso:
+    transport = GraphBatchTransport(linger=0.05)
+    sender = WhatsAppSender(transport=transport)
+    sender.send_utility_template(...)   # se envía dentro de un lote
+    transport.close()
+"""
+
+import json
+import time
+import queue
+import threading
+import requests
+from urllib.parse import urlencode
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
+from graph_errors import GraphAPIError
+
+GRAPH_URL = "https://graph.facebook.com/"
+
+# Máximo de operaciones que Graph acepta en una petición batch
+MAX_BATCH_SIZE = 50
+
+
+def _encode_body(payload: Dict[str, Any]) -> str:
+    """Cuerpo de una operación batch: form-urlencoded con los objetos como JSON."""
+    return urlencode({
+        key: value if isinstance(value, str) else json.dumps(value)
+        for key, value in payload.items()
+    })
+
+
+class GraphBatchTransport:
+    """
+    Transporte que acumula mensajes durante `linger` segundos (o hasta llenar un
+    lote) y los envía en una sola petición a la Graph Batch API.
+
+    Args:
+        max_batch: Máximo de mensajes por petición (Graph admite hasta 50)
+        linger: Segundos que se espera a que llegue más tráfico para llenar el lote
+        max_in_flight: Lotes que pueden estar en vuelo a la vez
+        timeout: Timeout (segundos) de cada petición batch
+    """
+
+    def __init__(
+        self,
+        max_batch: int = MAX_BATCH_SIZE,
+        linger: float = 0.05,
+        max_in_flight: int = 4,
+        timeout: Optional[float] = 60,
+        session: Optional[requests.Session] = None
+    ):
+        if not 1 <= max_batch <= MAX_BATCH_SIZE:
+            raise ValueError(f"max_batch debe estar entre 1 y {MAX_BATCH_SIZE}")
+
+        self.max_batch = max_batch
+        self.linger = linger
+        self.timeout = timeout
+        self.session = session or requests.Session()
+
+        self._queue: "queue.Queue[Optional[Tuple]]" = queue.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=max_in_flight)
+        self._closed = False
+        # Protege _closed junto con el put: nada entra a la cola después del None de close()
+        self._lock = threading.Lock()
+        self._dispatcher = threading.Thread(target=self._dispatch_loop, daemon=True)
+        self._dispatcher.start()
+
+    # ===============================
+    # 📤 INTERFAZ DE TRANSPORTE
+    # ===============================
+    def submit(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Future:
+        """Encola un mensaje y retorna un Future con la respuesta de la API."""
+        future: Future = Future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("El transporte por lotes está cerrado")
+            self._queue.put((url, headers.get('Authorization', ''), payload, future))
+        return future
+
+    def send(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Envía un mensaje dentro de un lote y espera su respuesta."""
+        return self.submit(url, headers, payload).result()
+
+    def close(self) -> None:
+        """Envía lo pendiente y detiene el transporte."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._queue.put(None)
+        self._dispatcher.join()
+        self._executor.shutdown(wait=True)
+
+    # ===============================
+    # 📦 ARMADO DE LOTES
+    # ===============================
+    def _dispatch_loop(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+
+            batch = [item]
+            stop = False
+            deadline = time.monotonic() + self.linger
+
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                batch.append(item)
+
+            self._flush(batch)
+
+            if stop:
+                # Vaciar lo que quedó en la cola antes de terminar
+                rest = []
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not None:
+                        rest.append(item)
+                for i in range(0, len(rest), self.max_batch):
+                    self._flush(rest[i:i + self.max_batch])
+                return
+
+    def _flush(self, batch: List[Tuple]) -> None:
+        """Agrupa por token (cada petición batch usa un solo access token) y envía."""
+        by_token: Dict[str, List[Tuple]] = {}
+        for item in batch:
+            by_token.setdefault(item[1], []).append(item)
+
+        for authorization, items in by_token.items():
+            self._executor.submit(self._post_batch, authorization, items)
+
+    def _post_batch(self, authorization: str, items: List[Tuple]) -> None:
+        operations = [
+            {
+                'method': 'POST',
+                'relative_url': url[len(GRAPH_URL):] if url.startswith(GRAPH_URL) else url,
+                'body': _encode_body(payload),
+            }
+            for url, _, payload, _ in items
+        ]
+
+        try:
+            response = self.session.post(
+                GRAPH_URL,
+                headers={'Authorization': authorization},
+                data={'batch': json.dumps(operations)},
+                timeout=self.timeout
+            )
+            response.raise_for_status()
+            results = response.json()
+        except requests.exceptions.RequestException as e:
+            error_msg = f"❌ Error enviando lote: {str(e)}"
+            status, detail = 0, None
+            if hasattr(e, 'response') and e.response is not None:
+                status = e.response.status_code
+                try:
+                    detail = e.response.json()
+                    error_msg += f"\nDetalles: {detail}"
+                except:
+                    error_msg += f"\nStatus Code: {e.response.status_code}"
+            error = GraphAPIError(error_msg, status, detail)
+            error.__cause__ = e
+            for item in items:
+                item[3].set_exception(error)
+            return
+        except Exception as e:
+            for item in items:
+                item[3].set_exception(e)
+            return
+
+        for index, item in enumerate(items):
+            future = item[3]
+            result = results[index] if index < len(results) else None
+            self._resolve(future, result)
+
+    @staticmethod
+    def _resolve(future: Future, result: Optional[Dict[str, Any]]) -> None:
+        """Entrega a cada mensaje su propia respuesta (o su propio error)."""
+        if result is None:
+            future.set_exception(Exception(
+                "❌ Error enviando mensaje: Graph no procesó esta operación del lote (timeout)"
+            ))
+            return
+
+        code = result.get('code', 0)
+        try:
+            body = json.loads(result.get('body') or '{}')
+        except ValueError:
+            body = {'raw': result.get('body')}
+
+        if code >= 400:
+            future.set_exception(GraphAPIError(
+                f"❌ Error enviando mensaje: HTTP {code}\nDetalles: {body}", code, body
+            ))
+        else:
+            future.set_result(body)
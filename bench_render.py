@@ -0,0 +1,76 @@
+"""
+Benchmark del armado de payloads (sin red)
+Mide cuántos payloads por segundo se generan con WhatsAppSender:
+1. Solo armado del payload (transporte que descarta)
+2. Armado + escritura en JSONL comprimido (DryRunTransport, lo que usa --dry-run)
+
+Uso: python bench_render.py [--count=200000] [--tipo=marketing]
+"""
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from whatsapp_sender_v2 import WhatsAppSender
+from dry_run import DryRunTransport
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+RESPONSE = {'messages': [{'id': 'bench'}]}
+
+
+class NullTransport:
+    """Transporte que descarta el payload (mide solo el armado)."""
+
+    def send(self, url, headers, payload):
+        return RESPONSE
+
+
+def render(sender: WhatsAppSender, tipo: str, count: int) -> float:
+    """Arma `count` payloads del tipo indicado y retorna los segundos empleados."""
+    phones = [f"+56 9 {i:08d}" for i in range(count)]
+    start = time.perf_counter()
+
+    if tipo == 'marketing':
+        for phone in phones:
+            sender.send_marketing_template(phone, 'promo_bench', ['Ana', '20%'], 'https://example.com/img.jpg', 'es_CL')
+    elif tipo == 'utility':
+        for phone in phones:
+            sender.send_utility_template(phone, 'aviso_bench', ['Ana', 'mañana 10:00'], 'es_CL')
+    else:
+        for phone in phones:
+            sender.send_text_message(phone, 'Hola Ana, tu pedido está en camino')
+
+    return time.perf_counter() - start
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(description='Benchmark del armado de payloads (sin red)')
+    parser.add_argument('--count', type=int, default=200000, help='Payloads a generar (por defecto: 200000)')
+    parser.add_argument('--tipo', choices=['text', 'utility', 'marketing'], default='marketing')
+    args = parser.parse_args()
+
+    credentials = {'access_token': 'bench', 'phone_number_id': '000000000000000'}
+
+    print("=" * 60)
+    print(f"🧪 Benchmark de armado de payloads ({args.tipo}, {args.count} mensajes)")
+    print("=" * 60)
+
+    elapsed = render(WhatsAppSender(transport=NullTransport(), **credentials), args.tipo, args.count)
+    print(f"⚙️  Solo armado:        {args.count / elapsed:>12,.0f} payloads/s")
+
+    path = os.path.join(tempfile.gettempdir(), 'bench_render.jsonl.gz')
+    transport = DryRunTransport(path)
+    elapsed = render(WhatsAppSender(transport=transport, **credentials), args.tipo, args.count)
+    transport.close()
+    print(f"📄 Armado + JSONL.gz:  {args.count / elapsed:>12,.0f} payloads/s ({os.path.getsize(path) / 1e6:.1f} MB)")
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Benchmark de transportes HTTP contra una Graph API simulada (local)
+Levanta un servidor local que responde como el endpoint de mensajes, con una
+latencia fija, y que habla HTTP/1.1 y HTTP/2 sin TLS (h2c, requiere el paquete
+h2). Envía los mismos mensajes con WhatsAppSender usando:
+
+1. RequestsTransport (HTTP/1.1, el de siempre): una conexión por envío en vuelo
+2. HTTP2Transport (httpx): los envíos en vuelo comparten pocas conexiones
+
+y muestra mensajes por segundo, latencia p50/p99 y sockets abiertos.
+
+Uso: python bench_transport.py [--count=5000] [--concurrency=64] [--latency=0.05]
+Para HTTP/2: pip install 'httpx[http2]'
+"""
+
+import sys
+import json
+import heapq
+import socket
+import argparse
+import threading
+import time
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any
+from whatsapp_sender_v2 import WhatsAppSender
+from http_transport import RequestsTransport, HTTP2Transport
+from metrics import LatencyWindow
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+H2_PREFACE = b'PRI * HTTP/2.0'
+
+
+def _response_body(request_body: bytes, number: int) -> bytes:
+    to = json.loads(request_body).get('to', '')
+    return json.dumps({
+        'messaging_product': 'whatsapp',
+        'contacts': [{'input': to, 'wa_id': to}],
+        'messages': [{'id': f'wamid.mock{number}'}],
+    }).encode('utf-8')
+
+
+# ===============================
+# 🧪 GRAPH API SIMULADA
+# ===============================
+class MockGraphServer:
+    """
+    Servidor local que responde a cada POST después de `latency` segundos.
+    Cuenta las conexiones abiertas por los clientes.
+    """
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.connections = 0
+        self.requests = 0
+        self._lock = threading.Lock()
+
+        try:
+            import h2.connection
+            import h2.config
+            import h2.events
+            import h2.settings
+            self._h2 = h2
+        except ImportError:
+            self._h2 = None
+
+        # Respuestas HTTP/2 pendientes: (instante, orden, función)
+        self._timers = []
+        self._timers_cond = threading.Condition()
+        self._order = 0
+
+        self._sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._sock.bind(('127.0.0.1', 0))
+        self._sock.listen(1024)
+        self.port = self._sock.getsockname()[1]
+
+        threading.Thread(target=self._accept_loop, daemon=True).start()
+        threading.Thread(target=self._timer_loop, daemon=True).start()
+
+    @property
+    def supports_http2(self) -> bool:
+        return self._h2 is not None
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.port}{path}"
+
+    def _next_number(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+    def _accept_loop(self) -> None:
+        while True:
+            conn, _ = self._sock.accept()
+            conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            with self._lock:
+                self.connections += 1
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn: socket.socket) -> None:
+        try:
+            start = b''
+            while len(start) < len(H2_PREFACE) and H2_PREFACE.startswith(start):
+                start = conn.recv(len(H2_PREFACE), socket.MSG_PEEK)
+                if not start:
+                    return
+            if start.startswith(H2_PREFACE) and self._h2 is not None:
+                self._serve_h2(conn)
+            else:
+                self._serve_http1(conn)
+        except OSError:
+            pass
+        finally:
+            conn.close()
+
+    def _serve_http1(self, conn: socket.socket) -> None:
+        reader = conn.makefile('rb')
+        while True:
+            request_line = reader.readline()
+            if not request_line:
+                return
+            length = 0
+            while True:
+                line = reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.partition(b':')
+                if name.strip().lower() == b'content-length':
+                    length = int(value.strip())
+            body = reader.read(length)
+
+            time.sleep(self.latency)
+            data = _response_body(body, self._next_number())
+            conn.sendall(
+                b'HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n'
+                b'Content-Length: ' + str(len(data)).encode() + b'\r\n\r\n' + data
+            )
+
+    def _serve_h2(self, conn: socket.socket) -> None:
+        h2 = self._h2
+        config = h2.config.H2Configuration(client_side=False, header_encoding='utf-8')
+        connection = h2.connection.H2Connection(config=config)
+        connection.local_settings = h2.settings.Settings(
+            client=False, initial_values={h2.settings.SettingCodes.MAX_CONCURRENT_STREAMS: 1000}
+        )
+        lock = threading.Lock()
+        bodies: Dict[int, bytearray] = {}
+
+        with lock:
+            connection.initiate_connection()
+            conn.sendall(connection.data_to_send())
+
+        def respond(stream_id: int, body: bytes) -> None:
+            data = _response_body(body, self._next_number())
+            try:
+                with lock:
+                    connection.send_headers(stream_id, [
+                        (':status', '200'),
+                        ('content-type', 'application/json'),
+                        ('content-length', str(len(data))),
+                    ])
+                    connection.send_data(stream_id, data, end_stream=True)
+                    conn.sendall(connection.data_to_send())
+            except Exception:
+                # El cliente cerró la conexión o el stream
+                pass
+
+        while True:
+            data = conn.recv(65535)
+            if not data:
+                return
+            with lock:
+                events = connection.receive_data(data)
+            for event in events:
+                if isinstance(event, h2.events.RequestReceived):
+                    bodies[event.stream_id] = bytearray()
+                elif isinstance(event, h2.events.DataReceived):
+                    bodies.setdefault(event.stream_id, bytearray()).extend(event.data)
+                    with lock:
+                        connection.acknowledge_received_data(event.flow_controlled_length, event.stream_id)
+                elif isinstance(event, h2.events.StreamEnded):
+                    self._schedule(respond, event.stream_id, bytes(bodies.pop(event.stream_id, b'{}')))
+                elif isinstance(event, h2.events.ConnectionTerminated):
+                    return
+            with lock:
+                pending = connection.data_to_send()
+                if pending:
+                    conn.sendall(pending)
+
+    def _schedule(self, function, *args) -> None:
+        with self._timers_cond:
+            self._order += 1
+            heapq.heappush(self._timers, (time.monotonic() + self.latency, self._order, function, args))
+            self._timers_cond.notify()
+
+    def _timer_loop(self) -> None:
+        while True:
+            with self._timers_cond:
+                while not self._timers or self._timers[0][0] > time.monotonic():
+                    self._timers_cond.wait(self._timers[0][0] - time.monotonic() if self._timers else None)
+                _, _, function, args = heapq.heappop(self._timers)
+            function(*args)
+
+    def close(self) -> None:
+        self._sock.close()
+
+
+# ===============================
+# 📊 BENCHMARK
+# ===============================
+def run(server: MockGraphServer, transport, count: int, concurrency: int) -> Dict[str, Any]:
+    """Envía `count` plantillas con `concurrency` hilos y retorna las métricas."""
+    sender = WhatsAppSender(access_token='bench', phone_number_id='000000000000000', transport=transport)
+    sender.base_url = server.url('/v21.0/000000000000000/messages')
+    latency = LatencyWindow(size=count)
+    connections_before = server.connections
+
+    def send(i: int) -> None:
+        start = time.perf_counter()
+        sender.send_utility_template(f"569{i:08d}", 'aviso_bench', ['Ana'], 'es_CL')
+        latency.record(time.perf_counter() - start)
+
+    # Una vuelta de calentamiento abre las conexiones antes de medir
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(send, range(concurrency)))
+        latency = LatencyWindow(size=count)
+        start = time.perf_counter()
+        list(executor.map(send, range(count)))
+        elapsed = time.perf_counter() - start
+
+    result = {'rate': count / elapsed, 'connections': server.connections - connections_before}
+    result.update(latency.snapshot())
+    return result
+
+
+def print_result(name: str, result: Dict[str, Any]) -> None:
+    print(
+        f"{name:<24} {result['rate']:>10,.0f} msg/s   p50 {result['p50_ms']:>7.1f} ms   "
+        f"p99 {result['p99_ms']:>7.1f} ms   {result['connections']:>4} sockets"
+    )
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Compara RequestsTransport (HTTP/1.1) y HTTP2Transport contra una Graph API local',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python bench_transport.py
+  python bench_transport.py --count=20000 --concurrency=256 --latency=0.1
+  python bench_transport.py --http2-connections=1
+
+HTTP/2 requiere: pip install 'httpx[http2]'
+        """
+    )
+    parser.add_argument('--count', type=int, default=5000, help='Mensajes por transporte (por defecto: 5000)')
+    parser.add_argument('--concurrency', type=int, default=64, help='Envíos en vuelo (por defecto: 64)')
+    parser.add_argument('--latency', type=float, default=0.05, help='Latencia simulada de la API en segundos (por defecto: 0.05)')
+    parser.add_argument('--http2-connections', type=int, default=2, help='Conexiones de HTTP2Transport (por defecto: 2)')
+    args = parser.parse_args()
+
+    server = MockGraphServer(latency=args.latency)
+
+    print("=" * 60)
+    print(f"🧪 Benchmark de transportes ({args.count} mensajes, {args.concurrency} en vuelo, latencia {args.latency * 1000:.0f} ms)")
+    print("=" * 60)
+
+    try:
+        # HTTP/1.1 en su mejor caso: el pool admite una conexión por hilo
+        session = requests.Session()
+        session.mount('http://', requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=args.concurrency))
+        transport = RequestsTransport(session)
+        print_result("requests (HTTP/1.1)", run(server, transport, args.count, args.concurrency))
+        transport.close()
+
+        if not server.supports_http2:
+            print("⚠️  HTTP/2 omitido: el servidor simulado necesita el paquete h2 (pip install 'httpx[http2]')")
+            return
+        try:
+            transport = HTTP2Transport(max_connections=args.http2_connections, prior_knowledge=True)
+        except ImportError as e:
+            print(f"⚠️  HTTP/2 omitido: {e}")
+            return
+        print_result("httpx (HTTP/2)", run(server, transport, args.count, args.concurrency))
+        transport.close()
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,742 @@
+"""
+Script para envíos masivos de plantillas desde un archivo CSV
+El CSV debe tener una columna 'phone'; el resto de columnas se usan, en orden,
+como parámetros de la plantilla (o del mensaje de texto con --tipo=text).
+
+Los envíos se reparten entre los números configurados (ver sender_pool.py) y
+respetan el límite de mensajes por segundo de cada número. Con --processes los
+envíos se hacen desde varios procesos que comparten ese mismo límite.
+
+El avance de cada fila se guarda en un checkpoint; si la campaña se interrumpe,
+--resume la continúa sin reenviar a quien ya recibió el mensaje. Con --suppress
+se omite a quien ya recibió la misma plantilla en otra campaña en los últimos días.
+Con --adaptive la cantidad de envíos en vuelo se ajusta sola según la latencia y
+los límites de Meta (--workers pasa a ser el máximo). Las filas repetidas para un
+mismo teléfono se difieren para respetar el límite por destinatario (--pair-interval).
+Los parámetros que Meta rechazaría (saltos de línea, vacíos, demasiado largos) se
+detectan antes de enviar (--validate=reject) o se corrigen (--validate=fix).
+
+Uso: python bulk_send.py destinatarios.csv --tipo=utility --template=crpc_bienvenida [--processes=4] [--resume]
+"""
+
+import os
+import sys
+import csv
+import time
+import heapq
+import shutil
+import itertools
+import argparse
+import threading
+import multiprocessing
+from multiprocessing.connection import wait
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Callable
+from dotenv import load_dotenv
+from rate_limit import SharedTokenBucket
+from sender_pool import SenderPool, DEFAULT_RATE_PER_NUMBER
+from batch_transport import GraphBatchTransport, MAX_BATCH_SIZE
+from dry_run import DryRunTransport
+from http_transport import HTTP2Transport
+from recipient_store import RecipientStore, Row
+from campaign_checkpoint import CampaignCheckpoint, campaign_fingerprint, PENDING, SENT, FAILED, IN_FLIGHT, UNKNOWN, SUPPRESSED
+from adaptive_concurrency import AdaptiveLimiter, AdaptiveSender
+from circuit_breaker import CircuitOpenError
+from pair_pacing import PairPacer, DEFAULT_PAIR_INTERVAL
+from graph_errors import is_pair_rate_error, is_ambiguous_error
+from payload_validation import PayloadValidator, PayloadError
+from suppression import SuppressionFilter, open_suppression, DEFAULT_PATH as SUPPRESSION_PATH, DEFAULT_DAYS as SUPPRESSION_DAYS
+from send_result import message_id_of
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Hilos de envío por proceso
+DEFAULT_WORKERS = 8
+
+# Máximo de envíos en vuelo por proceso con --adaptive (si no se indica --workers)
+ADAPTIVE_MAX_WORKERS = 64
+
+# Espera mínima (segundos) antes de reintentar una fila con el circuito abierto
+CIRCUIT_RETRY_MIN = 1.0
+
+# Espera máxima (segundos) de una fila con el circuito abierto antes de darla por fallida
+CIRCUIT_MAX_WAIT = float(os.getenv('WHATSAPP_CIRCUIT_MAX_WAIT', '600'))
+
+# Reintentos de una fila que Meta rechazó por el límite por destinatario (131056)
+PAIR_RETRIES = 3
+
+# Resultados que cada proceso acumula antes de enviarlos por el pipe
+RESULTS_PER_MESSAGE = 100
+
+# Columnas del archivo de resultados
+RESULT_FIELDS = ['row', 'phone', 'status', 'message_id', 'error']
+
+# Error de las filas que pudieron haber llegado (en vuelo o sin respuesta de la API)
+UNKNOWN_ERROR = 'Interrumpido durante el envío; no se reenvía para no duplicar'
+
+TIPOS = ['text', 'auth', 'utility', 'marketing', 'service']
+
+def load_recipients(path: str) -> List[Tuple[str, List[str]]]:
+    """Lee el CSV de destinatarios: [(teléfono, [parámetros...]), ...]."""
+    with open(path, newline='', encoding='utf-8') as file:
+        reader = csv.DictReader(file)
+        if not reader.fieldnames or 'phone' not in reader.fieldnames:
+            raise ValueError(f"El archivo {path} debe tener una columna 'phone'")
+
+        param_fields = [f for f in reader.fieldnames if f != 'phone']
+        return [
+            (row['phone'].strip(), [row[f] or '' for f in param_fields])
+            for row in reader
+            if row['phone'] and row['phone'].strip()
+        ]
+
+
+def send_one(
+    sender,
+    job: Dict[str, Any],
+    phone: str,
+    params: List[str],
+    message: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Envía un mensaje a un destinatario según el tipo de campaña. Para --tipo=text,
+    message es el texto ya armado (y validado); por defecto se arma con los parámetros.
+    """
+    tipo = job['tipo']
+    template = job.get('template')
+    language = job.get('language', 'es')
+
+    if tipo == 'text':
+        return sender.send_text_message(phone, message if message is not None else job['message'].format(*params))
+    if tipo == 'auth':
+        return sender.send_authentication_template(phone, template, params[0], language)
+    if tipo == 'utility':
+        return sender.send_utility_template(phone, template, params or None, language)
+    if tipo == 'marketing':
+        return sender.send_marketing_template(phone, template, params, job.get('image'), language)
+    if tipo == 'service':
+        return sender.send_service_template(phone, template, params, language)
+
+    raise ValueError(f"Tipo de mensaje no soportado: {tipo}")
+
+
+def send_parked(
+    sender,
+    job: Dict[str, Any],
+    phone: str,
+    params: List[str],
+    message: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Como send_one, pero si la Graph API está caída (circuito abierto) el hilo
+    espera a que el circuito vuelva a probar y reintenta la misma fila, en vez
+    de marcar como fallida al resto de la campaña. Después de CIRCUIT_MAX_WAIT
+    segundos relanza el CircuitOpenError (la fila no se envió: queda fallida).
+    """
+    deadline = time.monotonic() + CIRCUIT_MAX_WAIT
+    while True:
+        try:
+            return send_one(sender, job, phone, params, message)
+        except CircuitOpenError as e:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise
+            time.sleep(min(max(e.retry_in, CIRCUIT_RETRY_MIN), remaining))
+
+
+def make_sender(job: Dict[str, Any], **kwargs):
+    """
+    Crea el pool de envío de la campaña. Con job['dry_run'] los payloads se escriben
+    en ese archivo sin enviarse; con job['batch_linger'] se envían agrupados por la
+    Graph Batch API; con job['http2'] se multiplexan sobre pocas conexiones HTTP/2.
+    Con job['adaptive'] (máximo de envíos en vuelo) el pool se envuelve en un
+    AdaptiveSender. Los envíos retornan SendResult compactos. El sender no
+    valida los payloads: run_rows ya valida cada fila según job['validate'].
+    Retorna (sender, transport o None).
+    """
+    transport = None
+    if job.get('dry_run'):
+        transport = DryRunTransport(job['dry_run'])
+    elif job.get('batch_linger') is not None:
+        transport = GraphBatchTransport(linger=job['batch_linger'])
+    elif job.get('http2'):
+        transport = HTTP2Transport()
+    sender = SenderPool.from_env(
+        transport=transport, typed_results=True, **kwargs
+    )
+    if job.get('adaptive') and not job.get('dry_run'):
+        sender = AdaptiveSender(sender, AdaptiveLimiter(max_limit=job['adaptive']))
+    return sender, transport
+
+
+def run_rows(
+    sender,
+    job: Dict[str, Any],
+    rows: Iterable[Row],
+    workers: int,
+    emit: Callable[[tuple], None],
+    checkpoint: Optional[CampaignCheckpoint] = None,
+    suppression: Optional[SuppressionFilter] = None,
+    pacer: Optional[PairPacer] = None,
+    valid: Optional[Callable[[], bool]] = None
+) -> None:
+    """
+    Envía las filas con varios hilos. Cada resultado se entrega a emit() como
+    (row, phone, status, message_id, error), en el orden en que terminan.
+    Con checkpoint, cada fila se marca en vuelo antes de enviarla y enviada o
+    fallida después; si la petición salió pero no hubo respuesta (timeout de
+    lectura, conexión cortada) queda desconocida y no se reintenta. Con suppression, se omiten (status 'suppressed') los
+    destinatarios que ya recibieron la plantilla y se registran los envíos exitosos.
+    Con pacer, la fila a un teléfono que recibió un mensaje hace muy poco (o que
+    Meta rechazó con 131056) se deja para más tarde y el hilo sigue con otras filas.
+    Con job['validate'], los parámetros (o el texto) inválidos se rechazan o
+    corrigen antes de consumir cupo del límite de tasa; es la única validación
+    de la campaña (el sender de make_sender no vuelve a validar).
+    Con valid, los hilos dejan de tomar filas (nuevas o diferidas) en cuanto
+    valid() retorna False; las diferidas sin enviar quedan pendientes en el checkpoint.
+    """
+    iterator = iter(rows)
+    lock = threading.Lock()
+    template = job.get('template')
+    if job['tipo'] == 'text':
+        suppression = None
+    record = suppression is not None and not job.get('dry_run')
+    validator = PayloadValidator(fix=job['validate'] == 'fix') if job.get('validate') else None
+
+    # Filas diferidas: (instante en que pueden enviarse, orden, fila, reintentos)
+    deferred = []
+    order = itertools.count()
+    exhausted = False
+
+    def defer(row: Row, delay: float, retries: int) -> None:
+        with lock:
+            heapq.heappush(deferred, (time.monotonic() + delay, next(order), row, retries))
+
+    def next_row():
+        """Próxima fila: primero las diferidas que ya vencieron. None si no queda nada."""
+        nonlocal exhausted
+        while True:
+            with lock:
+                if valid is not None and not valid():
+                    return None
+                if deferred and deferred[0][0] <= time.monotonic():
+                    _, _, row, retries = heapq.heappop(deferred)
+                    return row, True, retries
+                if not exhausted:
+                    row = next(iterator, None)
+                    if row is not None:
+                        return row, False, 0
+                    exhausted = True
+                if not deferred:
+                    return None
+                wait = deferred[0][0] - time.monotonic()
+            time.sleep(min(max(wait, 0), 1.0))
+
+    def worker():
+        while True:
+            item = next_row()
+            if item is None:
+                return
+
+            row, reserved, retries = item
+            index, phone, params = row
+            if suppression is not None and suppression.seen(phone, template):
+                if checkpoint is not None:
+                    checkpoint.mark(index, SUPPRESSED)
+                emit((index, phone, 'suppressed', '', 'Ya recibió esta plantilla en los últimos días'))
+                continue
+
+            message = None
+            if validator is not None:
+                try:
+                    if job['tipo'] == 'text':
+                        # También las diferidas: el texto corregido no se guarda en la fila
+                        message = validator.text(job['message'].format(*params))
+                    elif not reserved:
+                        params = validator.parameters(params)
+                        row = (index, phone, params)
+                except PayloadError as e:
+                    if checkpoint is not None:
+                        checkpoint.mark(index, FAILED)
+                    emit((index, phone, 'error', '', str(e)))
+                    continue
+
+            # Las filas diferidas ya tienen su turno reservado
+            if pacer is not None and not reserved:
+                delay = pacer.reserve(phone)
+                if delay > 0:
+                    defer(row, delay, retries)
+                    continue
+
+            if checkpoint is not None:
+                checkpoint.mark(index, IN_FLIGHT)
+            try:
+                result = send_parked(sender, job, phone, params, message)
+                message_id = message_id_of(result, '')
+            except Exception as e:
+                if pacer is not None and retries < PAIR_RETRIES and is_pair_rate_error(e):
+                    if checkpoint is not None:
+                        checkpoint.mark(index, PENDING)
+                    defer(row, pacer.penalize(phone), retries + 1)
+                    continue
+                if is_ambiguous_error(e):
+                    # Pudo haber llegado: se reporta como las filas interrumpidas en vuelo
+                    if checkpoint is not None:
+                        checkpoint.mark(index, UNKNOWN)
+                    emit((index, phone, 'error', '', f"{UNKNOWN_ERROR}: {e}"))
+                    continue
+                if checkpoint is not None:
+                    checkpoint.mark(index, FAILED)
+                emit((index, phone, 'error', '', str(e)))
+                continue
+
+            if checkpoint is not None:
+                checkpoint.mark(index, SENT)
+            if record:
+                suppression.add(phone, template)
+            emit((index, phone, 'ok', message_id, ''))
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, workers))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+# ===============================
+# 🧩 MODO MULTIPROCESO
+# ===============================
+def _process_worker(
+    conn,
+    store: RecipientStore,
+    shard: int,
+    shards: int,
+    job: Dict[str, Any],
+    buckets: Dict[str, Any],
+    workers: int,
+    rate: float,
+    checkpoint_path: Optional[str] = None,
+    pacer: Optional[PairPacer] = None
+) -> None:
+    """
+    Proceso hijo: envía las filas shard, shard+shards, ... del store y reporta
+    los resultados por el pipe. Las filas ya completadas según el checkpoint se saltan.
+    """
+    pending = []
+    done = set()
+    lock = threading.Lock()
+
+    def emit(result):
+        with lock:
+            done.add(result[0])
+            pending.append(result)
+            if len(pending) >= RESULTS_PER_MESSAGE:
+                conn.send(pending[:])
+                pending.clear()
+
+    transport = None
+    checkpoint = CampaignCheckpoint(checkpoint_path) if checkpoint_path else None
+    skip = checkpoint.should_skip if checkpoint is not None else None
+    suppression = None
+    adaptive_metrics = None
+    try:
+        suppression = open_suppression(job)
+        sender, transport = make_sender(job, buckets=buckets, rate_per_number=rate)
+        run_rows(sender, job, store.rows(shard, shards, skip), workers, emit, checkpoint, suppression, pacer)
+        if isinstance(sender, AdaptiveSender):
+            adaptive_metrics = sender.limiter.metrics()
+    except Exception as e:
+        # Error al crear el enviador: las filas pendientes quedan fallidas en el CSV
+        # y en el checkpoint
+        for index, phone, _ in store.rows(shard, shards, skip):
+            if index not in done:
+                if checkpoint is not None:
+                    checkpoint.mark(index, FAILED)
+                pending.append((index, phone, 'error', '', str(e)))
+    finally:
+        if transport is not None:
+            transport.close()
+        if checkpoint is not None:
+            checkpoint.close()
+        if suppression is not None:
+            suppression.close()
+
+    with lock:
+        if pending:
+            conn.send(pending)
+        if adaptive_metrics is not None:
+            conn.send({'adaptive': adaptive_metrics})
+        conn.send(None)
+    conn.close()
+
+
+def run_processes(
+    job: Dict[str, Any],
+    store: RecipientStore,
+    processes: int,
+    workers: int,
+    rate: float,
+    emit: Callable[[tuple], None],
+    checkpoint_path: Optional[str] = None,
+    on_metrics: Optional[Callable[[Dict[str, Any]], None]] = None
+) -> None:
+    """
+    Reparte las filas del store entre varios procesos (sin copiarlas: con fork se
+    heredan y un store abierto con mmap se reabre). Todos consumen del mismo límite
+    de tasa por phone_number_id (SharedTokenBucket) y del mismo ritmo por destinatario
+    (PairPacer en memoria compartida), y devuelven sus resultados por pipes.
+    on_metrics recibe el estado final de la concurrencia adaptativa de cada proceso.
+    """
+    ctx = multiprocessing.get_context()
+    buckets = {
+        phone_number_id: SharedTokenBucket(rate, ctx=ctx)
+        for phone_number_id in SenderPool.phone_number_ids_from_env()
+    } if rate != float('inf') else {}
+    pacer = PairPacer(job['pair_interval'], ctx=ctx) if job.get('pair_interval') else None
+    dry_run_parts = []
+
+    conns = []
+    procs = []
+    for k in range(processes):
+        process_job = job
+        if job.get('dry_run'):
+            # Cada proceso escribe su parte; al final se concatenan (gzip admite varios miembros)
+            base, ext = os.path.splitext(job['dry_run']) if job['dry_run'].endswith('.gz') else (job['dry_run'], '')
+            process_job = dict(job, dry_run=f"{base}.part{k}{ext}")
+            dry_run_parts.append(process_job['dry_run'])
+
+        parent_conn, child_conn = ctx.Pipe(duplex=False)
+        proc = ctx.Process(
+            target=_process_worker,
+            args=(child_conn, store, k, processes, process_job, buckets, workers, rate, checkpoint_path, pacer),
+            daemon=True
+        )
+        proc.start()
+        child_conn.close()
+        conns.append(parent_conn)
+        procs.append(proc)
+
+    while conns:
+        for conn in wait(conns):
+            try:
+                message = conn.recv()
+            except EOFError:
+                message = None
+
+            if message is None:
+                conns.remove(conn)
+                conn.close()
+                continue
+
+            if isinstance(message, dict):
+                if on_metrics is not None:
+                    on_metrics(message['adaptive'])
+                continue
+
+            for result in message:
+                emit(result)
+
+    for proc in procs:
+        proc.join()
+
+    if dry_run_parts:
+        with open(job['dry_run'], 'wb') as out:
+            for part in dry_run_parts:
+                if os.path.exists(part):
+                    with open(part, 'rb') as file:
+                        shutil.copyfileobj(file, out)
+                    os.remove(part)
+
+
+# ===============================
+# 🚀 CAMPAÑA
+# ===============================
+def prepare_job(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Sube una sola vez la imagen local del header (marketing) y usa su URL."""
+    image = job.get('image')
+    if job.get('dry_run'):
+        return job
+    if image and not image.startswith('http') and os.path.exists(os.path.expanduser(image)):
+        from whatsapp_sender_v2 import WhatsAppSender
+        print(f"📤 Subiendo imagen desde: {image}")
+        job = dict(job, image=WhatsAppSender().upload_media(os.path.expanduser(image)))
+    return job
+
+
+def open_recipients(path: str) -> RecipientStore:
+    """Abre un store .rcp (mmap) o carga un CSV de destinatarios."""
+    if path.endswith('.rcp'):
+        return RecipientStore.open(path)
+    return RecipientStore.from_csv(path)
+
+
+def run_campaign(
+    recipients_path: str,
+    job: Dict[str, Any],
+    output_path: str,
+    workers: int = DEFAULT_WORKERS,
+    processes: int = 0,
+    rate: float = DEFAULT_RATE_PER_NUMBER,
+    checkpoint_path: Optional[str] = None,
+    resume: bool = False
+) -> Dict[str, int]:
+    """
+    Ejecuta la campaña completa y escribe un CSV con el resultado de cada fila.
+    Retorna el conteo de envíos exitosos y fallidos.
+
+    Con job['adaptive'] los envíos en vuelo de cada proceso se ajustan solos
+    hasta `workers`, y al final se muestra el límite alcanzado.
+
+    El avance se guarda en checkpoint_path (por defecto <output>.ckpt, salvo en
+    dry run). Con resume=True se continúa una campaña interrumpida: se saltan las
+    filas ya enviadas, se reintentan las fallidas y los resultados se agregan al
+    CSV existente.
+    """
+    store = open_recipients(recipients_path)
+    # La huella usa el job original: subir la imagen local da una URL nueva en
+    # cada ejecución y --resume rechazaría la campaña. Incluye el contenido de los
+    # destinatarios: reanudar con un archivo editado saltaría filas que no se enviaron
+    fingerprint = campaign_fingerprint(job, len(store), store.digest())
+    job = prepare_job(job)
+    if job.get('validate') and job['tipo'] != 'text':
+        # Un idioma inválido haría fallar todas las filas: se revisa una vez
+        job = dict(job, language=PayloadValidator(fix=job['validate'] == 'fix').language(job.get('language', 'es')))
+
+    # En dry run no hay red: un hilo por proceso y sin límites de tasa
+    if job.get('dry_run'):
+        workers, rate = 1, float('inf')
+        job = dict(job, pair_interval=0)
+    elif job.get('adaptive'):
+        job = dict(job, adaptive=workers)
+
+    counts = {'ok': 0, 'error': 0, 'suppressed': 0}
+    lock = threading.Lock()
+
+    checkpoint = None
+    unknown = []
+    if not job.get('dry_run'):
+        checkpoint_path = checkpoint_path or f"{output_path}.ckpt"
+        if resume:
+            checkpoint, unknown = CampaignCheckpoint.resume(checkpoint_path, len(store), fingerprint)
+        else:
+            checkpoint = CampaignCheckpoint.create(checkpoint_path, len(store), fingerprint)
+
+    append = resume and os.path.exists(output_path)
+    with open(output_path, 'a' if append else 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out)
+        if not append:
+            writer.writerow(RESULT_FIELDS)
+
+        def emit(result):
+            with lock:
+                writer.writerow(result)
+                counts[result[2]] += 1
+
+        def report(metrics):
+            print(
+                f"⚙️  Concurrencia adaptativa: límite final {metrics['limit']} "
+                f"(p95 {metrics['p95_ms']} ms, base {metrics['baseline_p95_ms']} ms, "
+                f"{metrics['throttled']} limitados, {metrics['decreases']} retrocesos)"
+            )
+
+        # Filas que estaban en vuelo al interrumpirse: no se reenvían
+        for index in unknown:
+            emit((index, store.phone(index), 'error', '', UNKNOWN_ERROR))
+
+        try:
+            if processes > 0:
+                if checkpoint is not None:
+                    checkpoint.flush()
+                run_processes(job, store, processes, workers, rate, emit, checkpoint and checkpoint.path, report)
+            else:
+                sender, transport = make_sender(job, rate_per_number=rate)
+                skip = checkpoint.should_skip if checkpoint is not None else None
+                suppression = open_suppression(job)
+                pacer = PairPacer(job['pair_interval']) if job.get('pair_interval') else None
+                try:
+                    run_rows(sender, job, store.rows(skip=skip), workers, emit, checkpoint, suppression, pacer)
+                    if isinstance(sender, AdaptiveSender):
+                        report(sender.limiter.metrics())
+                finally:
+                    if transport is not None:
+                        transport.close()
+                    if suppression is not None:
+                        suppression.close()
+        finally:
+            if checkpoint is not None:
+                checkpoint.close()
+
+    return counts
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Envía una plantilla a todos los destinatarios de un CSV',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python bulk_send.py clientes.csv --tipo=utility --template=crpc_bienvenida
+  python bulk_send.py clientes.csv --tipo=marketing --template=promo --image=https://...
+  python bulk_send.py clientes.csv --tipo=text --message="Hola {0}"
+  python bulk_send.py clientes.csv --tipo=utility --template=aviso --processes=4 --workers=16
+  python bulk_send.py clientes.csv --tipo=utility --template=aviso --batch --linger=0.1
+  python bulk_send.py clientes.csv --tipo=utility --template=aviso --http2 --workers=64
+  python bulk_send.py clientes.csv --tipo=utility --template=aviso --dry-run=revision.jsonl.gz
+  python bulk_send.py clientes.csv --tipo=utility --template=aviso --resume
+  python bulk_send.py clientes.csv --tipo=utility --template=aviso --adaptive
+  python bulk_send.py clientes.csv --tipo=marketing --template=promo --suppress --suppress-days=7
+  python bulk_send.py clientes.csv --tipo=text --message="Hola {0}" --pair-interval=10
+  python bulk_send.py clientes.csv --tipo=utility --template=aviso --validate=fix
+
+El CSV debe tener una columna 'phone'; las demás columnas son los parámetros.
+También acepta un archivo .rcp creado con recipient_store.py (se abre con mmap).
+        """
+    )
+
+    parser.add_argument('recipients', type=str, help='Archivo CSV (o .rcp) con los destinatarios')
+    parser.add_argument('--tipo', choices=TIPOS, required=True, help='Tipo de mensaje a enviar')
+    parser.add_argument('--template', type=str, default=None, help='Nombre de la plantilla')
+    parser.add_argument('--lang', type=str, default='es', help='Código de idioma (por defecto: es)')
+    parser.add_argument('--image', type=str, default=None, help='URL o ruta local de la imagen del header (marketing)')
+    parser.add_argument('--message', type=str, default=None, help='Texto del mensaje para --tipo=text ({0}, {1}... = columnas)')
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help=f'Hilos de envío por proceso (por defecto: {DEFAULT_WORKERS}; con --adaptive es el máximo, por defecto {ADAPTIVE_MAX_WORKERS})'
+    )
+    parser.add_argument(
+        '--adaptive',
+        action='store_true',
+        help='Ajustar solos los envíos en vuelo según la latencia y los límites de Meta'
+    )
+    parser.add_argument('--processes', type=int, default=0, help='Procesos de envío (por defecto: 0 = un solo proceso)')
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=float(os.getenv('WHATSAPP_RATE_PER_NUMBER', DEFAULT_RATE_PER_NUMBER)),
+        help='Mensajes por segundo por número, compartido entre procesos'
+    )
+    parser.add_argument(
+        '--batch',
+        action='store_true',
+        help=f'Agrupar los envíos en peticiones batch de Graph (hasta {MAX_BATCH_SIZE} mensajes por petición)'
+    )
+    parser.add_argument('--linger', type=float, default=0.05, help='Segundos de espera para llenar cada lote (por defecto: 0.05)')
+    parser.add_argument(
+        '--http2',
+        action='store_true',
+        help='Enviar por HTTP/2: muchos envíos en vuelo sobre pocas conexiones (requiere httpx[http2])'
+    )
+    parser.add_argument(
+        '--dry-run',
+        type=str,
+        default=None,
+        metavar='ARCHIVO',
+        help='No enviar: escribir los payloads exactos en ARCHIVO (JSONL, comprimido si termina en .gz)'
+    )
+    parser.add_argument('--output', type=str, default=None, help='CSV de resultados (por defecto: <archivo>_resultados.csv)')
+    parser.add_argument('--checkpoint', type=str, default=None, help='Archivo de avance (por defecto: <output>.ckpt)')
+    parser.add_argument('--resume', action='store_true', help='Continuar una campaña interrumpida sin reenviar lo ya enviado')
+    parser.add_argument(
+        '--suppress',
+        nargs='?',
+        const=SUPPRESSION_PATH,
+        default=None,
+        metavar='ARCHIVO',
+        help=f'Omitir a quien ya recibió la plantilla en otra campaña (filtro en ARCHIVO, por defecto: {SUPPRESSION_PATH})'
+    )
+    parser.add_argument(
+        '--suppress-days',
+        type=int,
+        default=SUPPRESSION_DAYS,
+        help=f'Días hacia atrás que revisa --suppress (por defecto: {SUPPRESSION_DAYS}; solo al crear el filtro)'
+    )
+
+    parser.add_argument(
+        '--pair-interval',
+        type=float,
+        default=DEFAULT_PAIR_INTERVAL,
+        help=f'Segundos mínimos entre mensajes al mismo teléfono; las filas repetidas se difieren (por defecto: {DEFAULT_PAIR_INTERVAL:g}, 0 = sin límite)'
+    )
+
+    parser.add_argument(
+        '--validate',
+        choices=['reject', 'fix', 'off'],
+        default='reject',
+        help='Parámetros que la API rechazaría: reject = fila fallida sin enviar (por defecto), fix = corregirlos, off = no revisar'
+    )
+
+    args = parser.parse_args()
+
+    if args.tipo == 'text' and not args.message:
+        parser.error("--tipo=text requiere --message")
+    if args.tipo != 'text' and not args.template:
+        parser.error(f"--tipo={args.tipo} requiere --template")
+    if args.resume and args.dry_run:
+        parser.error("--resume no se puede usar con --dry-run")
+    if args.batch and args.http2:
+        parser.error("--batch y --http2 no se pueden usar a la vez")
+
+    output = args.output or f"{os.path.splitext(args.recipients)[0]}_resultados.csv"
+    job = {
+        'tipo': args.tipo,
+        'template': args.template,
+        'language': args.lang,
+        'image': args.image,
+        'message': args.message,
+        'batch_linger': args.linger if args.batch else None,
+        'http2': args.http2,
+        'dry_run': args.dry_run,
+        'suppress': args.suppress,
+        'suppress_days': args.suppress_days,
+        'adaptive': args.adaptive,
+        'pair_interval': args.pair_interval,
+        'validate': None if args.validate == 'off' else args.validate,
+    }
+
+    if args.workers is None:
+        args.workers = ADAPTIVE_MAX_WORKERS if args.adaptive else DEFAULT_WORKERS
+
+    # Cada hilo espera su respuesta, así que para llenar lotes hacen falta más hilos
+    if args.batch and args.workers < MAX_BATCH_SIZE:
+        args.workers = MAX_BATCH_SIZE
+
+    print("=" * 60)
+    print("🚀 Envío masivo")
+    print("=" * 60)
+    print(f"📄 Destinatarios: {args.recipients}")
+    print(f"📋 Tipo: {args.tipo}  Plantilla: {args.template or '-'}  Idioma: {args.lang}")
+    print(f"⚙️  Procesos: {args.processes or 1}  Hilos: {args.workers}  Límite: {args.rate:g} msg/s por número")
+    print("=" * 60)
+
+    start = time.monotonic()
+    try:
+        counts = run_campaign(
+            args.recipients, job, output, args.workers, args.processes, args.rate,
+            checkpoint_path=args.checkpoint, resume=args.resume
+        )
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+    elapsed = time.monotonic() - start
+
+    total = counts['ok'] + counts['error'] + counts['suppressed']
+    print(f"\n✅ Enviados: {counts['ok']}")
+    print(f"❌ Fallidos: {counts['error']}")
+    if counts['suppressed']:
+        print(f"🚫 Omitidos por duplicados: {counts['suppressed']}")
+    print(f"⏱️  {total} mensajes en {elapsed:.1f}s ({total / elapsed if elapsed else 0:.1f} msg/s)")
+    print(f"📄 Resultados: {output}")
+    if args.dry_run:
+        print(f"🧪 Dry run: no se envió nada. Payloads en {args.dry_run}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,512 @@
+"""
+Analítica de campañas sobre los eventos de estado de WhatsApp
+Consume los eventos de estado (sent, delivered, read, failed) que Meta envía
+al webhook y mantiene contadores acumulados por plantilla, código de país y
+hora, más histogramas de cuánto tardan los mensajes en entregarse y leerse.
+
+- Los mensajes enviados se registran desde el CSV de resultados de bulk_send.py
+  (wamid -> plantilla) en una tabla hash sobre arrays (~27 bytes por mensaje).
+- Cada evento se cuenta una sola vez por mensaje, aunque Meta lo repita.
+- Las consultas leen los contadores ya agregados: no se vuelven a recorrer los
+  eventos. La ingesta de un archivo JSONL es incremental (sigue desde donde quedó).
+- Exporta a CSV o Parquet (Parquet requiere pyarrow).
+
+Uso:
+    python campaign_analytics.py register clientes_resultados.csv --template=promo_verano
+    python campaign_analytics.py ingest webhook_eventos.jsonl
+    python campaign_analytics.py report --by=template,country
+    python campaign_analytics.py export embudo.parquet --by=template,hour
+"""
+
+import os
+import sys
+import csv
+import json
+import time
+import struct
+import hashlib
+import argparse
+from array import array
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Iterator
+from dotenv import load_dotenv
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Cargar variables de entorno
+load_dotenv()
+
+DEFAULT_STATE_PATH = os.getenv('WHATSAPP_ANALYTICS_PATH', '.campaign_analytics.state')
+
+# Estados del embudo (en orden) y su bit en el estado de cada mensaje
+STATUSES = ('sent', 'delivered', 'read', 'failed')
+_STATUS_INDEX = {status: i for i, status in enumerate(STATUSES)}
+
+# Plantilla de los eventos de mensajes que no se registraron
+UNKNOWN_TEMPLATE = '(desconocida)'
+
+DIMENSIONS = ('template', 'country', 'hour')
+
+# Límites superiores (segundos) de los buckets de los histogramas de latencia
+LATENCY_BUCKETS = (1, 2, 5, 10, 30, 60, 300, 900, 3600, 6 * 3600, 24 * 3600, float('inf'))
+
+# Ocupación máxima de la tabla hash antes de duplicarla
+_MAX_LOAD = 0.7
+
+MAGIC = b'WSPANL1\n'
+_HEADER = struct.Struct('<8sQ')
+
+# Códigos de país E.164 (ITU-T), incluidos los de servicios globales (800, 870, 881...).
+# Ningún código es prefijo de otro: a lo más uno coincide con el inicio del teléfono.
+CALLING_CODES = frozenset("""
+1 7
+20 27 30 31 32 33 34 36 39 40 41 43 44 45 46 47 48 49 51 52 53 54 55 56 57 58
+60 61 62 63 64 65 66 81 82 84 86 90 91 92 93 94 95 98
+211 212 213 216 218 220 221 222 223 224 225 226 227 228 229
+230 231 232 233 234 235 236 237 238 239 240 241 242 243 244 245 246 247 248 249
+250 251 252 253 254 255 256 257 258 260 261 262 263 264 265 266 267 268 269
+290 291 297 298 299 350 351 352 353 354 355 356 357 358 359
+370 371 372 373 374 375 376 377 378 379 380 381 382 383 385 386 387 389
+420 421 423 500 501 502 503 504 505 506 507 508 509
+590 591 592 593 594 595 596 597 598 599
+670 672 673 674 675 676 677 678 679 680 681 682 683 685 686 687 688 689 690 691 692
+800 808 850 852 853 855 856 870 878 880 881 882 883 886 888
+960 961 962 963 964 965 966 967 968 970 971 972 973 974 975 976 977 979
+992 993 994 995 996 998
+""".split())
+
+
+def _hash(message_id: str) -> int:
+    # El 0 marca un lugar vacío en la tabla
+    return int.from_bytes(hashlib.blake2b(message_id.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+
+def country_code(phone: str) -> str:
+    """Código de país E.164 del teléfono, o '?' si no empieza con uno asignado."""
+    digits = phone.replace(' ', '').replace('-', '').replace('+', '')
+    for length in (1, 2, 3):
+        if digits[:length] in CALLING_CODES:
+            return digits[:length]
+    return '?'
+
+
+def _latency_bucket(seconds: float) -> int:
+    for i, limit in enumerate(LATENCY_BUCKETS):
+        if seconds <= limit:
+            return i
+    return len(LATENCY_BUCKETS) - 1
+
+
+def iter_statuses(payload: Any) -> Iterator[Dict[str, Any]]:
+    """
+    Extrae los eventos de estado de un payload del webhook
+    ({"entry": [{"changes": [{"value": {"statuses": [...]}}]}]}), de una lista
+    de eventos o de un evento suelto.
+    """
+    if isinstance(payload, list):
+        for item in payload:
+            yield from iter_statuses(item)
+    elif isinstance(payload, dict):
+        if 'entry' in payload:
+            for entry in payload.get('entry', []):
+                for change in entry.get('changes', []):
+                    yield from change.get('value', {}).get('statuses', [])
+        elif 'statuses' in payload:
+            yield from payload['statuses']
+        elif 'status' in payload and 'id' in payload:
+            yield payload
+
+
+class CampaignAnalytics:
+    """
+    Contadores del embudo por (plantilla, país, hora, estado) e histogramas de latencia.
+
+    Args:
+        capacity: Mensajes esperados (la tabla crece sola si se supera)
+    """
+
+    def __init__(self, capacity: int = 1 << 16):
+        size = 1
+        while size * _MAX_LOAD < capacity:
+            size <<= 1
+        self._allocate(size)
+        self._size = 0
+
+        self.templates: List[str] = [UNKNOWN_TEMPLATE]
+        self._template_ids: Dict[str, int] = {UNKNOWN_TEMPLATE: 0}
+        # (id de plantilla, país, hora epoch / 3600, índice del estado) -> cantidad
+        self.counters: Dict[Tuple[int, str, int, int], int] = {}
+        # id de plantilla -> [histograma sent->delivered, histograma delivered->read]
+        self.latency: Dict[int, List[array]] = {}
+        # Archivos ingeridos -> bytes ya leídos
+        self.sources: Dict[str, int] = {}
+        self.duplicates = 0
+
+    def _allocate(self, size: int) -> None:
+        self._keys = array('Q', bytes(8 * size))
+        self._template = array('H', bytes(2 * size))
+        self._state = array('B', bytes(size))
+        self._sent_at = array('I', bytes(4 * size))
+        self._delivered_at = array('I', bytes(4 * size))
+        self._mask = size - 1
+
+    def __len__(self) -> int:
+        return self._size
+
+    # ===============================
+    # 🗂️ MENSAJES
+    # ===============================
+    def _slot(self, key: int) -> int:
+        """Lugar de la clave en la tabla, o el lugar vacío donde iría."""
+        keys = self._keys
+        mask = self._mask
+        i = key & mask
+        while True:
+            k = keys[i]
+            if k == key or k == 0:
+                return i
+            i = (i + 1) & mask
+
+    def _grow(self) -> None:
+        old = (self._keys, self._template, self._state, self._sent_at, self._delivered_at)
+        self._allocate(len(self._keys) * 2)
+        for i, key in enumerate(old[0]):
+            if key:
+                j = self._slot(key)
+                self._keys[j] = key
+                self._template[j] = old[1][i]
+                self._state[j] = old[2][i]
+                self._sent_at[j] = old[3][i]
+                self._delivered_at[j] = old[4][i]
+
+    def template_id(self, template: str) -> int:
+        template_id = self._template_ids.get(template)
+        if template_id is None:
+            template_id = self._template_ids[template] = len(self.templates)
+            self.templates.append(template)
+        return template_id
+
+    def register(self, message_id: str, template: str) -> None:
+        """Asocia un wamid con la plantilla con que se envió."""
+        if (self._size + 1) > _MAX_LOAD * len(self._keys):
+            self._grow()
+
+        key = _hash(message_id)
+        i = self._slot(key)
+        if self._keys[i] == 0:
+            self._keys[i] = key
+            self._size += 1
+        self._template[i] = self.template_id(template)
+
+    def register_results(self, path: str, template: str) -> int:
+        """Registra los envíos exitosos de un CSV de resultados de bulk_send.py."""
+        count = 0
+        with open(path, newline='', encoding='utf-8') as file:
+            for row in csv.DictReader(file):
+                if row.get('status') == 'ok' and row.get('message_id'):
+                    self.register(row['message_id'], template)
+                    count += 1
+        return count
+
+    # ===============================
+    # 📥 EVENTOS
+    # ===============================
+    def ingest_status(self, event: Dict[str, Any]) -> bool:
+        """
+        Cuenta un evento de estado. Retorna False si se ignoró (estado desconocido
+        o evento repetido para el mismo mensaje).
+        """
+        status_index = _STATUS_INDEX.get(event.get('status'))
+        if status_index is None:
+            return False
+
+        timestamp = int(event.get('timestamp') or time.time())
+        key = _hash(event.get('id', ''))
+        i = self._slot(key)
+
+        if not self._keys[i]:
+            # Mensaje no registrado: se guarda con plantilla desconocida para
+            # reconocer sus eventos repetidos
+            if (self._size + 1) > _MAX_LOAD * len(self._keys):
+                self._grow()
+                i = self._slot(key)
+            self._keys[i] = key
+            self._size += 1
+
+        bit = 1 << status_index
+        if self._state[i] & bit:
+            self.duplicates += 1
+            return False
+        self._state[i] |= bit
+        template_id = self._template[i]
+
+        if status_index == 0:
+            self._sent_at[i] = timestamp
+        elif status_index == 1:
+            self._delivered_at[i] = timestamp
+            if self._sent_at[i]:
+                self._record_latency(template_id, 0, timestamp - self._sent_at[i])
+        elif status_index == 2 and self._delivered_at[i]:
+            self._record_latency(template_id, 1, timestamp - self._delivered_at[i])
+
+        key = (template_id, country_code(event.get('recipient_id', '')), timestamp // 3600, status_index)
+        self.counters[key] = self.counters.get(key, 0) + 1
+        return True
+
+    def _record_latency(self, template_id: int, stage: int, seconds: int) -> None:
+        histograms = self.latency.get(template_id)
+        if histograms is None:
+            histograms = self.latency[template_id] = [
+                array('Q', [0] * len(LATENCY_BUCKETS)) for _ in range(2)
+            ]
+        histograms[stage][_latency_bucket(max(seconds, 0))] += 1
+
+    def ingest(self, payload: Any) -> int:
+        """Cuenta los eventos de un payload del webhook. Retorna cuántos se contaron."""
+        return sum(self.ingest_status(event) for event in iter_statuses(payload))
+
+    def ingest_lines(self, lines: Iterable[str]) -> int:
+        """Cuenta los eventos de líneas JSON (una por payload del webhook)."""
+        counted = 0
+        for line in lines:
+            line = line.strip()
+            if line:
+                counted += self.ingest(json.loads(line))
+        return counted
+
+    def ingest_file(self, path: str) -> int:
+        """
+        Cuenta los eventos nuevos de un archivo JSONL: retoma desde el byte en que
+        quedó la ingesta anterior, así se puede llamar repetidamente sobre un log que crece.
+        """
+        offset = self.sources.get(os.path.abspath(path), 0)
+        if offset > os.path.getsize(path):
+            offset = 0  # el archivo se rotó
+
+        counted = 0
+        with open(path, 'rb') as file:
+            file.seek(offset)
+            for raw in file:
+                if not raw.endswith(b'\n'):
+                    break  # línea aún incompleta: se lee en la próxima ingesta
+                offset += len(raw)
+                counted += self.ingest_lines((raw.decode('utf-8'),))
+        self.sources[os.path.abspath(path)] = offset
+        return counted
+
+    # ===============================
+    # 📊 CONSULTAS
+    # ===============================
+    def funnel(self, by: Iterable[str] = ('template',), template: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Embudo agrupado por las dimensiones indicadas (template, country, hour):
+        cantidad de sent/delivered/read/failed y tasas de entrega y lectura.
+        """
+        by = tuple(by)
+        for dimension in by:
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"Dimensión desconocida: {dimension} (usa {', '.join(DIMENSIONS)})")
+        template_filter = self._template_ids.get(template, -1) if template else None
+
+        groups: Dict[tuple, List[int]] = {}
+        for (template_id, country, hour, status_index), count in self.counters.items():
+            if template_filter is not None and template_id != template_filter:
+                continue
+            values = {'template': self.templates[template_id], 'country': country, 'hour': hour}
+            group = tuple(values[d] for d in by)
+            totals = groups.get(group)
+            if totals is None:
+                totals = groups[group] = [0] * len(STATUSES)
+            totals[status_index] += count
+
+        rows = []
+        for group in sorted(groups):
+            totals = groups[group]
+            row = {}
+            for dimension, value in zip(by, group):
+                row[dimension] = time.strftime('%Y-%m-%d %H:00', time.gmtime(value * 3600)) if dimension == 'hour' else value
+            row.update(zip(STATUSES, totals))
+            sent, delivered, read, _ = totals
+            row['delivery_rate'] = round(delivered / sent, 4) if sent else None
+            row['read_rate'] = round(read / delivered, 4) if delivered else None
+            rows.append(row)
+        return rows
+
+    def latency_histogram(self, template: Optional[str] = None, stage: str = 'delivered') -> Dict[str, int]:
+        """
+        Histograma de segundos hasta 'delivered' (desde sent) o 'read' (desde delivered),
+        de una plantilla o de todas.
+        """
+        index = {'delivered': 0, 'read': 1}[stage]
+        totals = [0] * len(LATENCY_BUCKETS)
+        for template_id, histograms in self.latency.items():
+            if template is None or self.templates[template_id] == template:
+                for i, count in enumerate(histograms[index]):
+                    totals[i] += count
+        labels = [f"<={limit:g}s" for limit in LATENCY_BUCKETS[:-1]] + [f">{LATENCY_BUCKETS[-2]:g}s"]
+        return dict(zip(labels, totals))
+
+    def export(self, path: str, by: Iterable[str] = ('template',)) -> int:
+        """Exporta el embudo a CSV o, si la ruta termina en .parquet, a Parquet."""
+        by = tuple(by)
+        rows = self.funnel(by)
+        if path.endswith('.parquet'):
+            try:
+                import pyarrow
+                import pyarrow.parquet
+            except ImportError:
+                raise ImportError("Exportar a Parquet requiere pyarrow: pip install pyarrow")
+            pyarrow.parquet.write_table(pyarrow.Table.from_pylist(rows), path)
+        else:
+            fields = list(by) + list(STATUSES) + ['delivery_rate', 'read_rate']
+            with open(path, 'w', newline='', encoding='utf-8') as file:
+                writer = csv.DictWriter(file, fieldnames=fields)
+                writer.writeheader()
+                writer.writerows(rows)
+        return len(rows)
+
+    # ===============================
+    # 💾 ESTADO
+    # ===============================
+    def save(self, path: str) -> None:
+        """Guarda el estado completo: metadatos en JSON seguidos de los arrays de la tabla."""
+        meta = {
+            'capacity': len(self._keys),
+            'size': self._size,
+            'templates': self.templates,
+            'counters': [list(key) + [count] for key, count in self.counters.items()],
+            'latency': {str(t): [list(h) for h in histograms] for t, histograms in self.latency.items()},
+            'sources': self.sources,
+            'duplicates': self.duplicates,
+        }
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(_HEADER.pack(MAGIC, len(meta_bytes)))
+            file.write(meta_bytes)
+            for column in (self._keys, self._template, self._state, self._sent_at, self._delivered_at):
+                column.tofile(file)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> 'CampaignAnalytics':
+        """Carga un estado guardado con save()."""
+        with open(path, 'rb') as file:
+            magic, meta_len = _HEADER.unpack(file.read(_HEADER.size))
+            if magic != MAGIC:
+                raise ValueError(f"{path} no es un archivo de analítica válido")
+            meta = json.loads(file.read(meta_len).decode('utf-8'))
+
+            analytics = cls.__new__(cls)
+            capacity = meta['capacity']
+            analytics._mask = capacity - 1
+            columns = []
+            for typecode in ('Q', 'H', 'B', 'I', 'I'):
+                column = array(typecode)
+                column.fromfile(file, capacity)
+                columns.append(column)
+            analytics._keys, analytics._template, analytics._state, analytics._sent_at, analytics._delivered_at = columns
+
+        analytics._size = meta['size']
+        analytics.templates = meta['templates']
+        analytics._template_ids = {t: i for i, t in enumerate(analytics.templates)}
+        analytics.counters = {tuple(item[:4]): item[4] for item in meta['counters']}
+        analytics.latency = {
+            int(t): [array('Q', h) for h in histograms] for t, histograms in meta['latency'].items()
+        }
+        analytics.sources = meta['sources']
+        analytics.duplicates = meta['duplicates']
+        return analytics
+
+    @classmethod
+    def open(cls, path: str = DEFAULT_STATE_PATH) -> 'CampaignAnalytics':
+        """Carga el estado si existe o crea uno vacío."""
+        return cls.load(path) if os.path.exists(path) else cls()
+
+
+def print_funnel(rows: List[Dict[str, Any]], by: Tuple[str, ...]) -> None:
+    """Imprime el embudo como tabla."""
+    if not rows:
+        print("ℹ️  Sin eventos todavía")
+        return
+
+    header = [d for d in by] + list(STATUSES) + ['entrega', 'lectura']
+    print("  ".join(f"{h:>12}" for h in header))
+    print("-" * 14 * len(header))
+    for row in rows:
+        cells = [str(row[d]) for d in by] + [str(row[s]) for s in STATUSES]
+        cells.append('-' if row['delivery_rate'] is None else f"{row['delivery_rate']:.1%}")
+        cells.append('-' if row['read_rate'] is None else f"{row['read_rate']:.1%}")
+        print("  ".join(f"{c:>12}" for c in cells))
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Embudo de entrega/lectura de campañas a partir de los eventos de estado',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python campaign_analytics.py register clientes_resultados.csv --template=promo_verano
+  python campaign_analytics.py ingest webhook_eventos.jsonl
+  cat eventos.jsonl | python campaign_analytics.py ingest -
+  python campaign_analytics.py report --by=template,country
+  python campaign_analytics.py report --by=hour --template=promo_verano
+  python campaign_analytics.py export embudo.csv --by=template,country,hour
+  python campaign_analytics.py export embudo.parquet --by=template,hour
+
+Los eventos son los payloads del webhook de WhatsApp (uno por línea).
+        """
+    )
+    parser.add_argument('command', choices=['register', 'ingest', 'report', 'export'], help='Acción a realizar')
+    parser.add_argument('path', nargs='?', help='CSV de resultados (register), JSONL de eventos (ingest, - = stdin) o archivo de salida (export)')
+    parser.add_argument('--template', type=str, default=None, help='Plantilla de los envíos (register) o filtro (report)')
+    parser.add_argument('--by', type=str, default='template', help='Dimensiones separadas por coma: template, country, hour')
+    parser.add_argument('--state', type=str, default=DEFAULT_STATE_PATH, help=f'Archivo de estado (por defecto: {DEFAULT_STATE_PATH})')
+    args = parser.parse_args()
+
+    by = tuple(d.strip() for d in args.by.split(',') if d.strip())
+    analytics = CampaignAnalytics.open(args.state)
+
+    try:
+        if args.command == 'register':
+            if not args.path or not args.template:
+                parser.error("register requiere el CSV de resultados y --template")
+            count = analytics.register_results(args.path, args.template)
+            analytics.save(args.state)
+            print(f"✅ {count} mensajes registrados para {args.template} ({len(analytics)} en total)")
+
+        elif args.command == 'ingest':
+            if not args.path:
+                parser.error("ingest requiere un archivo JSONL o -")
+            start = time.monotonic()
+            if args.path == '-':
+                counted = analytics.ingest_lines(sys.stdin)
+            else:
+                counted = analytics.ingest_file(args.path)
+            analytics.save(args.state)
+            print(f"✅ {counted} eventos contados en {time.monotonic() - start:.1f}s ({analytics.duplicates} repetidos ignorados en total)")
+
+        elif args.command == 'report':
+            print_funnel(analytics.funnel(by, args.template), by)
+            print("\n⏱️  Tiempo hasta entrega:")
+            for bucket, count in analytics.latency_histogram(args.template).items():
+                if count:
+                    print(f"   {bucket:>10}: {count}")
+
+        else:
+            if not args.path:
+                parser.error("export requiere el archivo de salida (.csv o .parquet)")
+            rows = analytics.export(args.path, by)
+            print(f"✅ {rows} filas exportadas a {args.path}")
+
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Checkpoint de campañas masivas (reanudar sin reenviar)
+Guarda el estado de cada fila de la campaña en un archivo mapeado en memoria
+(mmap), un byte por fila: pendiente, en vuelo, enviada, fallida, desconocida
+u omitida por duplicada (ver suppression.py).
+
+- Antes de enviar una fila se marca "en vuelo" y al terminar "enviada" o "fallida".
+  Cada marca es una escritura de un byte en el mmap: si el proceso muere, el
+  sistema operativo conserva lo escrito, así que el archivo siempre está al día.
+- Cada fila tiene su propio byte, por eso varios hilos y procesos pueden marcar
+  filas distintas sin locks.
+- Al reanudar, las filas enviadas se saltan (O(1) cada una), las fallidas se
+  reintentan y las que quedaron "en vuelo" pasan a "desconocidas": no se
+  reenvían, porque pudieron haber llegado al cliente.
+
+Uso:
+    checkpoint = CampaignCheckpoint.create("campania.ckpt", len(store), fingerprint)
+    checkpoint.mark(index, SENT)
+    ...
+    checkpoint, unknown = CampaignCheckpoint.resume("campania.ckpt", len(store), fingerprint)
+"""
+
+import os
+import json
+import mmap
+import time
+import struct
+import hashlib
+from typing import Dict, Any, List, Tuple
+
+# Estados de cada fila
+PENDING = 0
+IN_FLIGHT = 1
+SENT = 2
+FAILED = 3
+UNKNOWN = 4
+SUPPRESSED = 5
+
+STATE_NAMES = {
+    PENDING: 'pending',
+    IN_FLIGHT: 'in_flight',
+    SENT: 'sent',
+    FAILED: 'failed',
+    UNKNOWN: 'unknown',
+    SUPPRESSED: 'suppressed',
+}
+
+# Cabecera: firma, cantidad de filas y huella de la campaña (relleno hasta 64 bytes)
+MAGIC = b'WSPCKP1\n'
+_HEADER = struct.Struct('<8sQ32s')
+HEADER_SIZE = 64
+
+# Cada cuántos segundos como máximo se pide al SO escribir el mmap a disco
+FLUSH_INTERVAL = 1.0
+
+
+def campaign_fingerprint(job: Dict[str, Any], count: int, recipients: bytes = b'') -> bytes:
+    """
+    Huella de la campaña (plantilla, parámetros del envío, cantidad de filas y
+    recipients: la huella del contenido de los destinatarios, ver RecipientStore.digest).
+    """
+    fields = {k: job.get(k) for k in ('tipo', 'template', 'language', 'image', 'message')}
+    fields['count'] = count
+    fields['recipients'] = recipients.hex()
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).digest()
+
+
+class CampaignCheckpoint:
+    """Estado por fila de una campaña, en un archivo mapeado en memoria."""
+
+    def __init__(self, path: str):
+        with open(path, 'r+b') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0)
+
+        magic, count, fingerprint = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} no es un archivo de checkpoint válido")
+
+        self.path = path
+        self.count = count
+        self.fingerprint = fingerprint
+        self._states = memoryview(self._mmap)[HEADER_SIZE:HEADER_SIZE + count]
+        self._last_flush = time.monotonic()
+
+    @classmethod
+    def create(cls, path: str, count: int, fingerprint: bytes) -> 'CampaignCheckpoint':
+        """Crea un checkpoint nuevo con todas las filas pendientes."""
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(_HEADER.pack(MAGIC, count, fingerprint).ljust(HEADER_SIZE, b'\0'))
+            # El resto del archivo queda en ceros (PENDING) sin escribirlo
+            file.truncate(HEADER_SIZE + max(count, 1))
+        os.replace(tmp_path, path)
+        return cls(path)
+
+    @classmethod
+    def resume(cls, path: str, count: int, fingerprint: bytes) -> Tuple['CampaignCheckpoint', List[int]]:
+        """
+        Abre un checkpoint para reanudar la misma campaña. Las filas que quedaron
+        en vuelo pasan a UNKNOWN y se retornan para reportarlas.
+        """
+        if not os.path.exists(path):
+            error_msg = f"❌ Error al reanudar la campaña\nDetalles: no existe el checkpoint {path}"
+            raise Exception(error_msg)
+
+        checkpoint = cls(path)
+        if checkpoint.count != count or checkpoint.fingerprint != fingerprint:
+            checkpoint.close()
+            error_msg = f"❌ Error al reanudar la campaña\nDetalles: {path} corresponde a otra campaña o a otro archivo de destinatarios"
+            raise Exception(error_msg)
+
+        unknown = checkpoint.indices(IN_FLIGHT)
+        for index in unknown:
+            checkpoint._states[index] = UNKNOWN
+        checkpoint.flush()
+        return checkpoint, unknown
+
+    # ===============================
+    # ✏️ ESTADO
+    # ===============================
+    def mark(self, index: int, state: int) -> None:
+        """Marca el estado de una fila."""
+        self._states[index] = state
+        now = time.monotonic()
+        if now - self._last_flush >= FLUSH_INTERVAL:
+            self._last_flush = now
+            self._mmap.flush()
+
+    def state(self, index: int) -> int:
+        return self._states[index]
+
+    def should_skip(self, index: int) -> bool:
+        """True si la fila no debe enviarse (ya enviada, en vuelo, desconocida u omitida)."""
+        return self._states[index] not in (PENDING, FAILED)
+
+    def indices(self, state: int) -> List[int]:
+        """Índices de las filas que están en el estado indicado."""
+        data = self._mmap
+        marker = bytes([state])
+        end = HEADER_SIZE + self.count
+        result = []
+        position = data.find(marker, HEADER_SIZE, end)
+        while position != -1:
+            result.append(position - HEADER_SIZE)
+            position = data.find(marker, position + 1, end)
+        return result
+
+    def counts(self) -> Dict[str, int]:
+        """Cantidad de filas por estado."""
+        states = bytes(self._states)
+        return {name: states.count(state) for state, name in STATE_NAMES.items()}
+
+    # ===============================
+    # 💾 ARCHIVO
+    # ===============================
+    def flush(self) -> None:
+        """Pide al sistema operativo escribir el estado a disco."""
+        self._last_flush = time.monotonic()
+        self._mmap.flush()
+
+    def close(self) -> None:
+        self._states.release()
+        self._mmap.flush()
+        self._mmap.close()
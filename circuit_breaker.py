@@ -0,0 +1,232 @@
+"""
+Circuit breaker para la Graph API
+Cuando graph.facebook.com se degrada, seguir enviando solo acumula hilos
+esperando respuestas que no llegan. El circuito de cada endpoint (mensajes,
+media, plantillas) tiene tres estados:
+
+- Cerrado: las llamadas pasan normalmente y se registra su resultado.
+- Abierto: si en las últimas llamadas hay demasiados fallos (errores de red,
+  timeouts, 5xx) o demasiadas lentas, las llamadas fallan al instante con
+  CircuitOpenError durante `open_seconds`.
+- Semiabierto: pasado ese tiempo se hace una petición de prueba (probe) y se
+  dejan pasar unas pocas llamadas reales; si salen bien el circuito se cierra,
+  si fallan se vuelve a abrir.
+
+Los errores 4xx (número inválido, plantilla inexistente, límite de tasa) no
+cuentan como fallos: indican que la API está respondiendo.
+
+Uso:
+    breaker = CircuitBreaker('messages')
+    with breaker.guard():
+        response = session.post(...)
+"""
+
+import time
+import threading
+from collections import deque
+from typing import Optional, Callable, Dict, Any
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(Exception):
+    """El circuito del endpoint está abierto: la llamada no se hizo."""
+
+    def __init__(self, name: str, retry_in: float):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(
+            f"❌ Error: la Graph API no está disponible (circuito '{name}' abierto)\n"
+            f"Detalles: se reintentará en {retry_in:.0f}s"
+        )
+
+
+def is_outage_error(error: BaseException) -> bool:
+    """
+    True si el error indica que el endpoint no está sano: errores de red o
+    timeouts (requests los define como OSError) y respuestas 5xx.
+    """
+    response = getattr(error, 'response', None)
+    if response is not None:
+        return response.status_code >= 500
+    return isinstance(error, OSError)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker con ventana de las últimas `window` llamadas.
+
+    Args:
+        name: Nombre del endpoint (aparece en los errores)
+        failure_rate: Fracción de fallos en la ventana que abre el circuito
+        slow_call_seconds: Latencia a partir de la cual una llamada se considera lenta
+        slow_call_rate: Fracción de llamadas lentas en la ventana que abre el circuito
+        window: Llamadas que se miran para calcular las tasas
+        min_calls: Llamadas mínimas en la ventana antes de evaluar
+        open_seconds: Segundos que el circuito queda abierto antes de probar
+        half_open_calls: Llamadas de prueba en estado semiabierto
+        probe: Función opcional sin argumentos que verifica el endpoint (lanza si falla)
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 10.0,
+        slow_call_rate: float = 0.8,
+        window: int = 50,
+        min_calls: int = 20,
+        open_seconds: float = 30.0,
+        half_open_calls: int = 3,
+        probe: Optional[Callable[[], None]] = None
+    ):
+        self.name = name
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.slow_call_rate = slow_call_rate
+        self.min_calls = min_calls
+        self.open_seconds = open_seconds
+        self.half_open_calls = half_open_calls
+        self.probe = probe
+
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=window)  # (falló, lenta)
+        self._failures = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._trials = 0
+        self._trial_successes = 0
+        self._lock = threading.Lock()
+
+        self.rejected = 0
+        self.times_opened = 0
+
+    # ===============================
+    # 🚦 ADMISIÓN
+    # ===============================
+    def allow(self) -> None:
+        """Lanza CircuitOpenError si la llamada no debe hacerse ahora."""
+        with self._lock:
+            if self.state == CLOSED:
+                return
+
+            if self.state == OPEN:
+                retry_in = self._opened_at + self.open_seconds - time.monotonic()
+                if retry_in > 0 or self._probing:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, max(retry_in, 0))
+                if self.probe is None:
+                    self._half_open()
+                else:
+                    self._probing = True
+
+            if self.state == HALF_OPEN:
+                if self._trials >= self.half_open_calls:
+                    self.rejected += 1
+                    raise CircuitOpenError(self.name, 0)
+                self._trials += 1
+                return
+
+        # Solo un hilo hace la petición de prueba, fuera del lock
+        try:
+            self.probe()
+        except Exception as e:
+            with self._lock:
+                self._probing = False
+                self._open()
+            raise CircuitOpenError(self.name, self.open_seconds) from e
+
+        with self._lock:
+            self._probing = False
+            self._half_open()
+            self._trials += 1
+
+    def guard(self) -> '_Guard':
+        """Context manager: admite la llamada y registra su resultado al salir."""
+        self.allow()
+        return _Guard(self)
+
+    # ===============================
+    # 📝 RESULTADOS
+    # ===============================
+    def record(self, latency: float, failed: bool) -> None:
+        """Registra el resultado de una llamada admitida."""
+        slow = latency >= self.slow_call_seconds
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._trials = max(0, self._trials - 1)
+                if failed:
+                    self._open()
+                else:
+                    self._trial_successes += 1
+                    if self._trial_successes >= self.half_open_calls:
+                        self._close()
+                return
+
+            if self.state == OPEN:
+                return
+
+            if len(self._outcomes) == self._outcomes.maxlen:
+                old_failed, old_slow = self._outcomes[0]
+                self._failures -= old_failed
+                self._slow -= old_slow
+            self._outcomes.append((failed, slow))
+            self._failures += failed
+            self._slow += slow
+
+            calls = len(self._outcomes)
+            if calls >= self.min_calls and (
+                self._failures >= self.failure_rate * calls or self._slow >= self.slow_call_rate * calls
+            ):
+                self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self._opened_at = time.monotonic()
+        self._trials = 0
+        self.times_opened += 1
+
+    def _half_open(self) -> None:
+        self.state = HALF_OPEN
+        self._trials = 0
+        self._trial_successes = 0
+
+    def _close(self) -> None:
+        self.state = CLOSED
+        self._outcomes.clear()
+        self._failures = 0
+        self._slow = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Estado del circuito y conteos de la ventana actual."""
+        with self._lock:
+            return {
+                'name': self.name,
+                'state': self.state,
+                'calls': len(self._outcomes),
+                'failures': self._failures,
+                'slow': self._slow,
+                'rejected': self.rejected,
+                'times_opened': self.times_opened,
+            }
+
+
+class _Guard:
+    """Mide la llamada y le informa al circuito si falló por una caída del endpoint."""
+
+    __slots__ = ('breaker', 'start')
+
+    def __init__(self, breaker: CircuitBreaker):
+        self.breaker = breaker
+        self.start = time.perf_counter()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        failed = exc is not None and is_outage_error(exc)
+        self.breaker.record(time.perf_counter() - self.start, failed)
+        return False
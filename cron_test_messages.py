@@ -1,6 +1,8 @@
 """
 Script para enviar mensajes de prueba cada 2 segundos
-Cada mensaje incluye un número de secuencia para identificarlo
+Cada mensaje incluye un número de secuencia para identificarlo.
+Meta limita los mensajes seguidos al mismo destinatario (error 131056): si el
+intervalo es menor que ese límite, los mensajes se difieren en vez de fallar.
 Uso: python cron_test_messages.py [--phone=5693443695]
 """
 
@@ -10,6 +12,9 @@ import time
 import argparse
 import signal
 from whatsapp_sender import WhatsAppSender
+from send_result import message_id_of
+from pair_pacing import PairPacer, DEFAULT_PAIR_INTERVAL
+from graph_errors import is_pair_rate_error
 from dotenv import load_dotenv
 from datetime import datetime
 
@@ -52,22 +57,43 @@ def get_phone_number(phone_arg: str = None) -> str:
     return DEFAULT_PHONE
 
 
-def send_test_message(sender: WhatsAppSender, phone: str, message_number: int):
+def wait_seconds(seconds: float) -> None:
+    """Espera los segundos indicados (o hasta que se detenga con Ctrl+C)."""
+    deadline = time.monotonic() + seconds
+    while running and time.monotonic() < deadline:
+        time.sleep(min(1.0, deadline - time.monotonic()))
+
+
+def send_test_message(sender: WhatsAppSender, phone: str, message_number: int, pacer: PairPacer = None):
     """
-    Envía un mensaje de prueba con número de secuencia
+    Envía un mensaje de prueba con número de secuencia.
+    Retorna True si se envió, False si falló y None si Meta lo rechazó por el
+    límite por destinatario (hay que reintentarlo).
     """
+    if pacer is not None:
+        delay = pacer.reserve(phone)
+        if delay > 0:
+            print(f"⏳ Mensaje #{message_number} diferido {delay:.1f}s (límite de mensajes al mismo destinatario)")
+            wait_seconds(delay)
+            if not running:
+                return None
+
     try:
         # Crear mensaje con número de secuencia y timestamp
         timestamp = datetime.now().strftime("%H:%M:%S")
         message = f"🧪 Mensaje de prueba #{message_number}\n⏰ Hora: {timestamp}\n📱 Este es el mensaje número {message_number}"
         
         result = sender.send_text_message(phone, message)
-        message_id = result.get('messages', [{}])[0].get('id', 'N/A')
+        message_id = message_id_of(result)
         
         print(f"✅ Mensaje #{message_number} enviado - ID: {message_id[:20]}... - Hora: {timestamp}")
         return True
         
     except Exception as e:
+        if pacer is not None and is_pair_rate_error(e):
+            pacer.penalize(phone)
+            print(f"⏳ Mensaje #{message_number} rechazado por el límite por destinatario (131056), se reintentará")
+            return None
         print(f"❌ Error al enviar mensaje #{message_number}: {e}")
         return False
 
@@ -102,6 +128,13 @@ Presiona Ctrl+C para detener el envío.
         help='Intervalo en segundos entre mensajes (por defecto: 2)'
     )
     
+    parser.add_argument(
+        '--pair-interval',
+        type=float,
+        default=DEFAULT_PAIR_INTERVAL,
+        help=f'Segundos mínimos entre mensajes al mismo destinatario (por defecto: {DEFAULT_PAIR_INTERVAL:g}, 0 = sin límite)'
+    )
+    
     args = parser.parse_args()
     
     # Configurar manejador de señales para Ctrl+C
@@ -116,6 +149,8 @@ Presiona Ctrl+C para detener el envío.
     print("=" * 60)
     print(f"📱 Teléfono de destino: {phone}")
     print(f"⏱️  Intervalo: {interval} segundos")
+    if 0 < interval < args.pair_interval:
+        print(f"⚠️  Meta limita a un mensaje cada ~{args.pair_interval:g}s al mismo destinatario: los mensajes se diferirán")
     print(f"🛑 Presiona Ctrl+C para detener")
     print("=" * 60)
     print()
@@ -123,18 +158,17 @@ Presiona Ctrl+C para detener el envío.
     try:
         # Inicializar el enviador
         sender = WhatsAppSender()
+        pacer = PairPacer(args.pair_interval, slots=1) if args.pair_interval > 0 else None
         
         message_number = 1
         
         while running:
-            send_test_message(sender, phone, message_number)
-            message_number += 1
+            # None: rechazado por el límite por destinatario, se reintenta el mismo número
+            if send_test_message(sender, phone, message_number, pacer) is not None:
+                message_number += 1
             
             # Esperar el intervalo especificado (o hasta que se detenga)
-            for _ in range(interval):
-                if not running:
-                    break
-                time.sleep(1)
+            wait_seconds(interval)
         
         print(f"\n📊 Total de mensajes enviados: {message_number - 1}")
         print("✅ Proceso finalizado")
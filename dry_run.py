@@ -0,0 +1,77 @@
+"""
+Transporte de prueba (dry run) para WhatsAppSender
+Genera exactamente el payload que se enviaría a la API (plantilla, componentes,
+teléfono normalizado) y lo escribe en un archivo JSONL comprimido, sin tocar la red.
+Sirve para que cumplimiento revise una campaña antes de enviarla.
+
+Uso:
+    transport = DryRunTransport("campania.jsonl.gz")
+    sender = WhatsAppSender(transport=transport)
+    sender.send_utility_template(...)   # se escribe en el archivo, no se envía
+    transport.close()
+"""
+
+import gzip
+import json
+import threading
+from typing import Dict, Any
+
+# Líneas acumuladas en memoria antes de escribirlas al archivo
+WRITE_BUFFER_LINES = 4096
+
+_encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':'))
+
+
+class DryRunTransport:
+    """
+    Transporte que escribe cada payload como una línea JSON y responde como la API.
+
+    Cada línea tiene {"url": ..., "payload": ...}; el access token nunca se escribe.
+    Si la ruta termina en .gz el archivo se comprime con gzip.
+    """
+
+    def __init__(self, path: str, compresslevel: int = 1):
+        # Binario: cada lote se codifica a UTF-8 de una vez, sin la capa de texto por escritura
+        if path.endswith('.gz'):
+            self._file = gzip.open(path, 'wb', compresslevel=compresslevel)
+        else:
+            self._file = open(path, 'wb')
+
+        self.path = path
+        self.count = 0
+        self._url_json: Dict[str, str] = {}
+        self._buffer = []
+        self._lock = threading.Lock()
+
+    def send(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Registra el payload y retorna una respuesta con la forma de la API."""
+        url_json = self._url_json.get(url)
+        if url_json is None:
+            url_json = self._url_json[url] = _encoder.encode(url)
+        line = f'{{"url":{url_json},"payload":{_encoder.encode(payload)}}}'
+
+        with self._lock:
+            self.count += 1
+            message_id = f"dryrun.{self.count}"
+            self._buffer.append(line)
+            if len(self._buffer) >= WRITE_BUFFER_LINES:
+                self._flush()
+
+        to = payload.get('to', '')
+        return {
+            'messaging_product': 'whatsapp',
+            'contacts': [{'input': to, 'wa_id': to}],
+            'messages': [{'id': message_id}],
+        }
+
+    def _flush(self) -> None:
+        if self._buffer:
+            self._buffer.append('')
+            self._file.write('\n'.join(self._buffer).encode('utf-8'))
+            self._buffer.clear()
+
+    def close(self) -> None:
+        """Escribe lo pendiente y cierra el archivo."""
+        with self._lock:
+            self._flush()
+            self._file.close()
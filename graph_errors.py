@@ -0,0 +1,117 @@
+"""
+Errores de la Graph API con su código de Meta
+WhatsAppSender y los transportes que hablan con la API (lotes, grabación y
+reproducción) lanzan GraphAPIError, que guarda el status HTTP y el código de
+error de Meta además del mensaje de siempre. Las funciones de este módulo son
+la única clasificación de esos códigos: el pool de números, la concurrencia
+adaptativa y el pacing por destinatario las comparten.
+
+is_ambiguous_error distingue además los errores de red que dejan la duda de si
+el mensaje llegó (ver bulk_send.py).
+"""
+
+from typing import Optional, Any, Iterator
+from requests.exceptions import ReadTimeout
+from urllib3.exceptions import ProtocolError
+
+# Códigos de Meta que indican un límite de tasa (del número, la WABA o la app), no
+# un mensaje inválido: 4 límite de la app, 613 límite de llamadas, 80007 límite
+# de la WABA, 130429 throughput del número, 131048 límite por spam.
+THROTTLING_CODES = frozenset((4, 613, 80007, 130429, 131048))
+
+# Demasiados mensajes seguidos al mismo destinatario (es del destinatario, no del número)
+PAIR_RATE_ERROR_CODE = 131056
+
+# Errores de httpx (HTTP2Transport) con la petición ya enviada; httpx es opcional
+_HTTPX_AMBIGUOUS = frozenset(('ReadTimeout', 'ReadError', 'RemoteProtocolError'))
+
+
+def error_code(detail: Any) -> Optional[int]:
+    """Código de Meta de un cuerpo de error de la API ({'error': {'code': ...}})."""
+    if isinstance(detail, dict) and isinstance(detail.get('error'), dict):
+        code = detail['error'].get('code')
+        if isinstance(code, int):
+            return code
+    return None
+
+
+class GraphAPIError(Exception):
+    """
+    Error de una llamada a la Graph API.
+
+    Args:
+        message: Mensaje en el formato de siempre ("❌ Error ...\\nDetalles: ...")
+        status: Status HTTP (0 si la API no respondió)
+        detail: Cuerpo de error de la API; de ahí se toma el código de Meta
+    """
+
+    def __init__(self, message: str, status: int = 0, detail: Any = None):
+        super().__init__(message)
+        self.status = status
+        self.detail = detail
+        self.code = error_code(detail)
+
+
+def _chain(error: Optional[BaseException], depth: int = 4) -> Iterator[BaseException]:
+    """El error y sus causas (los envoltorios las dejan en __cause__/__context__)."""
+    for _ in range(depth):
+        if error is None:
+            return
+        yield error
+        error = error.__cause__ or error.__context__
+
+
+def _graph_error(error: BaseException) -> Optional[GraphAPIError]:
+    """El GraphAPIError del error o de su causa."""
+    for candidate in _chain(error, 3):
+        if isinstance(candidate, GraphAPIError):
+            return candidate
+    return None
+
+
+def graph_error_code(error: BaseException) -> Optional[int]:
+    """Código de Meta del error, o None si no vino de la API."""
+    graph_error = _graph_error(error)
+    return graph_error.code if graph_error is not None else None
+
+
+def http_status(error: BaseException) -> int:
+    """Status HTTP del error (del GraphAPIError o de la respuesta de requests/httpx), o 0."""
+    graph_error = _graph_error(error)
+    if graph_error is not None and graph_error.status:
+        return graph_error.status
+    for candidate in (error, error.__cause__ or error.__context__):
+        response = getattr(candidate, 'response', None)
+        if response is not None:
+            return response.status_code
+    return 0
+
+
+def is_throttling_error(error: BaseException) -> bool:
+    """True si Meta limitó la tasa (429 o un código de THROTTLING_CODES)."""
+    return graph_error_code(error) in THROTTLING_CODES or http_status(error) == 429
+
+
+def is_server_error(error: BaseException) -> bool:
+    """True si la API respondió 5xx."""
+    return http_status(error) >= 500
+
+
+def is_pair_rate_error(error: BaseException) -> bool:
+    """True si Meta rechazó el mensaje por escribir demasiado seguido al destinatario."""
+    return graph_error_code(error) == PAIR_RATE_ERROR_CODE
+
+
+def is_ambiguous_error(error: BaseException) -> bool:
+    """
+    True si la petición se alcanzó a enviar pero no hubo respuesta (timeout de
+    lectura o conexión cortada): la API pudo haber aceptado el mensaje. Los
+    errores al conectar no son ambiguos: el mensaje no salió.
+    """
+    for candidate in _chain(error):
+        if isinstance(candidate, (ReadTimeout, ProtocolError, ConnectionResetError)):
+            return True
+        kind = type(candidate)
+        if kind.__module__.startswith('httpx') and kind.__name__ in _HTTPX_AMBIGUOUS:
+            return True
+    return False
@@ -0,0 +1,176 @@
+"""
+Transportes HTTP para los envíos de WhatsAppSender
+Define la interfaz de transporte del sender y las dos implementaciones HTTP:
+
+- RequestsTransport (por defecto): HTTP/1.1 con requests y keep-alive. Cada
+  petición en vuelo ocupa su propia conexión, así que con muchos hilos se abren
+  cientos de sockets a graph.facebook.com.
+- HTTP2Transport: HTTP/2 con httpx (opcional: pip install 'httpx[http2]'). Las
+  peticiones en vuelo se multiplexan como streams sobre unas pocas conexiones.
+
+Cualquier objeto con send(url, headers, payload) -> dict sirve como transporte
+(DryRunTransport, GraphBatchTransport, ReplayTransport...): reemplaza el POST
+completo. Los que heredan de HTTPTransport, en cambio, solo reemplazan la capa
+HTTP: el sender sigue usando su circuit breaker, las respuestas tipadas y el
+mismo formato de errores.
+
+Uso:
+    sender = WhatsAppSender()                                   # requests (HTTP/1.1)
+    sender = WhatsAppSender(transport=HTTP2Transport())         # HTTP/2 multiplexado
+    python bench_transport.py --concurrency=64                  # comparar ambos
+"""
+
+import os
+import json
+import requests
+from typing import Optional, Dict, Any, Tuple, Protocol
+
+# Conexiones por defecto de HTTP2Transport (cada una lleva muchos streams a la vez)
+DEFAULT_HTTP2_CONNECTIONS = 2
+
+_encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':'))
+
+
+def default_timeout() -> Tuple[float, float]:
+    """(conexión, lectura) en segundos, desde WHATSAPP_CONNECT_TIMEOUT / WHATSAPP_READ_TIMEOUT."""
+    return (
+        float(os.getenv('WHATSAPP_CONNECT_TIMEOUT', '5')),
+        float(os.getenv('WHATSAPP_READ_TIMEOUT', '30'))
+    )
+
+
+class Transport(Protocol):
+    """Interfaz mínima de un transporte: envía un payload y retorna la respuesta de la API."""
+
+    def send(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        ...
+
+
+# ===============================
+# ❗ ERRORES
+# ===============================
+class TransportError(Exception):
+    """Error de un transporte HTTP que no es de requests."""
+
+    response = None
+
+
+class TransportConnectionError(TransportError, ConnectionError):
+    """Error de red o timeout (el circuit breaker lo cuenta como caída, como los de requests)."""
+
+
+class _Response:
+    """Lo mínimo de una respuesta con error: status_code y json()."""
+
+    __slots__ = ('status_code', 'content')
+
+    def __init__(self, status_code: int, content: bytes):
+        self.status_code = status_code
+        self.content = content
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class HTTPStatusError(TransportError):
+    """Respuesta 4xx/5xx de la API (el breaker solo cuenta los 5xx)."""
+
+    def __init__(self, status_code: int, content: bytes, url: str):
+        self.response = _Response(status_code, content)
+        kind = 'Client' if status_code < 500 else 'Server'
+        super().__init__(f"{status_code} {kind} Error for url: {url}")
+
+
+# ===============================
+# 🌐 TRANSPORTES HTTP
+# ===============================
+class HTTPTransport:
+    """
+    Base de los transportes HTTP: subclases implementan post() y, si hace falta, close().
+    send_bytes() lanza HTTPStatusError o TransportConnectionError (o los errores de requests).
+    """
+
+    def post(self, url: str, headers: Dict[str, str], body: bytes) -> Tuple[int, bytes]:
+        """POST con el cuerpo JSON ya codificado. Retorna (status, cuerpo de la respuesta)."""
+        raise NotImplementedError
+
+    def send_bytes(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> bytes:
+        """Envía el payload y retorna el cuerpo de la respuesta sin decodificar."""
+        status, content = self.post(url, headers, _encoder.encode(payload).encode('utf-8'))
+        if status >= 400:
+            raise HTTPStatusError(status, content, url)
+        return content
+
+    def send(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        return json.loads(self.send_bytes(url, headers, payload))
+
+    def close(self) -> None:
+        """Cierra las conexiones abiertas."""
+
+
+class RequestsTransport(HTTPTransport):
+    """
+    HTTP/1.1 con una requests.Session (keep-alive): el comportamiento de siempre.
+
+    Args:
+        session: Sesión a usar (por defecto una nueva)
+        timeout: (conexión, lectura) en segundos; por defecto los del .env
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None, timeout=None):
+        self.session = session or requests.Session()
+        self.timeout = timeout or default_timeout()
+
+    def send_bytes(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> bytes:
+        response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+        return response.content
+
+    def post(self, url: str, headers: Dict[str, str], body: bytes) -> Tuple[int, bytes]:
+        response = self.session.post(url, headers=headers, data=body, timeout=self.timeout)
+        return response.status_code, response.content
+
+    def close(self) -> None:
+        self.session.close()
+
+
+class HTTP2Transport(HTTPTransport):
+    """
+    HTTP/2 con httpx: muchas peticiones simultáneas comparten pocas conexiones.
+    Seguro entre hilos (un solo cliente para todos).
+
+    Args:
+        max_connections: Conexiones como máximo al mismo host
+        timeout: (conexión, lectura) en segundos; por defecto los del .env
+        prior_knowledge: Hablar HTTP/2 sin negociarlo (para servidores h2c sin TLS,
+            como el mock de bench_transport.py)
+    """
+
+    def __init__(self, max_connections: int = DEFAULT_HTTP2_CONNECTIONS, timeout=None, prior_knowledge: bool = False):
+        connect_timeout, read_timeout = timeout or default_timeout()
+        try:
+            import httpx
+            client = httpx.Client(
+                http1=not prior_knowledge,
+                http2=True,
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            )
+        except ImportError as e:
+            raise ImportError(
+                f"HTTP2Transport necesita httpx con soporte HTTP/2: pip install 'httpx[http2]' ({e})"
+            ) from e
+
+        self._httpx = httpx
+        self._client = client
+
+    def post(self, url: str, headers: Dict[str, str], body: bytes) -> Tuple[int, bytes]:
+        try:
+            response = self._client.post(url, headers=headers, content=body)
+        except self._httpx.TransportError as e:
+            # Errores de red y timeouts: el sender los reporta y el breaker los cuenta
+            raise TransportConnectionError(f"{type(e).__name__}: {e}") from e
+        return response.status_code, response.content
+
+    def close(self) -> None:
+        self._client.close()
@@ -1,10 +1,20 @@
 """
 Script para listar todas las plantillas de WhatsApp disponibles
-Uso: python list_templates.py
+Recorre todas las páginas de uno o varios WABA (en paralelo) y muestra cada
+plantilla apenas llega, como tabla o JSONL.
+
+Uso:
+    python list_templates.py
+    python list_templates.py --waba=111,222 --status=APPROVED --format=jsonl
 """
 
+import os
 import sys
 import json
+import queue
+import argparse
+import threading
+from typing import Dict, Any, List, Iterator, Tuple
 from whatsapp_sender_v2 import WhatsAppSender
 from dotenv import load_dotenv
 
@@ -16,58 +26,162 @@ if sys.platform == 'win32':
 # Cargar variables de entorno
 load_dotenv()
 
+# Campos que se piden por defecto (los componentes son lo más pesado de la respuesta)
+DEFAULT_FIELDS = ['name', 'status', 'category', 'language']
+
+_DONE = object()
+
+
+def iter_all_templates(
+    sender: WhatsAppSender,
+    waba_ids: List[str],
+    workers: int = 4,
+    **filters
+) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Recorre las plantillas de varios WABA en paralelo y entrega (waba_id, plantilla)
+    en el orden en que van llegando las páginas.
+
+    Los filtros (fields, status, category, language, page_size) se pasan a
+    WhatsAppSender.iter_templates. Si se deja de consumir el generador, los hilos
+    se detienen al terminar la página en curso.
+    """
+    results: queue.Queue = queue.Queue()
+    pending: queue.Queue = queue.Queue()
+    for waba_id in waba_ids:
+        pending.put(waba_id)
+    stop = threading.Event()
+
+    def worker():
+        while not stop.is_set():
+            try:
+                waba_id = pending.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                for template in sender.iter_templates(waba_id=waba_id, **filters):
+                    if stop.is_set():
+                        break
+                    results.put((waba_id, template))
+            except Exception as e:
+                results.put((waba_id, e))
+        results.put(_DONE)
+
+    threads = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, min(workers, len(waba_ids))))]
+    for thread in threads:
+        thread.start()
+
+    try:
+        running = len(threads)
+        while running:
+            item = results.get()
+            if item is _DONE:
+                running -= 1
+                continue
+            waba_id, template = item
+            if isinstance(template, Exception):
+                raise template
+            yield waba_id, template
+    finally:
+        stop.set()
+
+
+def print_table_row(i: int, waba_id: str, template: Dict[str, Any], show_waba: bool) -> None:
+    """Imprime una plantilla como fila de la tabla (y sus componentes si se pidieron)."""
+    waba = f"{waba_id:<18} " if show_waba else ''
+    print(
+        f"{i:>5}. {waba}{template.get('name', 'N/A'):<40} {template.get('status', 'N/A'):<10} "
+        f"{template.get('category', 'N/A'):<15} {template.get('language', 'N/A')}",
+        flush=True
+    )
+
+    # Mostrar componentes si existen
+    for comp in template.get('components', []):
+        comp_type = comp.get('type', 'N/A')
+        if comp_type.upper() == 'BODY':
+            text = comp.get('text', 'N/A')
+            print(f"         - Tipo: {comp_type}, Texto: {text[:50]}...")
+        elif comp_type.upper() == 'HEADER':
+            format_type = comp.get('format', 'N/A')
+            print(f"         - Tipo: {comp_type}, Formato: {format_type}")
+        else:
+            print(f"         - Tipo: {comp_type}")
+
 
 def main():
     """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Listar plantillas de WhatsApp de uno o varios WABA',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python list_templates.py
+  python list_templates.py --status=APPROVED --category=UTILITY
+  python list_templates.py --waba=111111,222222 --language=es_CL
+  python list_templates.py --components
+  python list_templates.py --format=jsonl > plantillas.jsonl
+
+Sin --waba se usan WHATSAPP_BUSINESS_ACCOUNT_IDS (separados por coma) o
+WHATSAPP_BUSINESS_ACCOUNT_ID del .env.
+        """
+    )
+    parser.add_argument('--waba', type=str, default=None, help='WABA IDs separados por coma')
+    parser.add_argument('--status', type=str, default=None, help='Filtrar por estado (APPROVED, PENDING, REJECTED, ...)')
+    parser.add_argument('--category', type=str, default=None, help='Filtrar por categoría (UTILITY, MARKETING, AUTHENTICATION)')
+    parser.add_argument('--language', type=str, default=None, help='Filtrar por idioma (ej. es_CL)')
+    parser.add_argument('--fields', type=str, default=None, help=f"Campos a pedir separados por coma (por defecto: {','.join(DEFAULT_FIELDS)})")
+    parser.add_argument('--components', action='store_true', help='Incluir los componentes de cada plantilla')
+    parser.add_argument('--format', choices=['table', 'jsonl'], default='table', help='Formato de salida (por defecto: table)')
+    parser.add_argument('--workers', type=int, default=4, help='WABA consultados en paralelo (por defecto: 4)')
+    args = parser.parse_args()
+
+    waba_list = args.waba or os.getenv('WHATSAPP_BUSINESS_ACCOUNT_IDS') or os.getenv('WHATSAPP_BUSINESS_ACCOUNT_ID') or ''
+    # Sin repetir (WHATSAPP_BUSINESS_ACCOUNT_IDS puede tener un WABA por número)
+    waba_ids = list(dict.fromkeys(w.strip() for w in waba_list.split(',') if w.strip()))
+
+    fields = args.fields.split(',') if args.fields else list(DEFAULT_FIELDS)
+    if args.components and 'components' not in fields:
+        fields.append('components')
+
     try:
         sender = WhatsAppSender()
-        
-        print("\n📋 Obteniendo plantillas disponibles...\n")
-        result = sender.list_templates()
-        
-        templates = result.get('data', [])
-        
-        if not templates:
-            print("❌ No se encontraron plantillas.")
+        if not waba_ids:
+            waba_ids = [sender._require_waba_id()]
+
+        templates = iter_all_templates(
+            sender,
+            waba_ids,
+            workers=args.workers,
+            fields=fields,
+            status=args.status,
+            category=args.category,
+            language=args.language
+        )
+
+        if args.format == 'jsonl':
+            for waba_id, template in templates:
+                print(json.dumps({'waba_id': waba_id, **template}, ensure_ascii=False), flush=True)
             return
-        
-        print(f"✅ Se encontraron {len(templates)} plantilla(s):\n")
+
+        print(f"\n📋 Obteniendo plantillas de {len(waba_ids)} cuenta(s)...\n")
         print("=" * 80)
-        
-        for i, template in enumerate(templates, 1):
-            name = template.get('name', 'N/A')
-            status = template.get('status', 'N/A')
-            category = template.get('category', 'N/A')
-            language = template.get('language', 'N/A')
-            
-            print(f"\n{i}. Nombre: {name}")
-            print(f"   Estado: {status}")
-            print(f"   Categoría: {category}")
-            print(f"   Idioma: {language}")
-            
-            # Mostrar componentes si existen
-            components = template.get('components', [])
-            if components:
-                print(f"   Componentes:")
-                for comp in components:
-                    comp_type = comp.get('type', 'N/A')
-                    if comp_type == 'body':
-                        text = comp.get('text', 'N/A')
-                        print(f"     - Tipo: {comp_type}, Texto: {text[:50]}...")
-                    elif comp_type == 'header':
-                        format_type = comp.get('format', 'N/A')
-                        print(f"     - Tipo: {comp_type}, Formato: {format_type}")
-                    else:
-                        print(f"     - Tipo: {comp_type}")
-        
-        print("\n" + "=" * 80)
+
+        count = 0
+        for count, (waba_id, template) in enumerate(templates, 1):
+            print_table_row(count, waba_id, template, show_waba=len(waba_ids) > 1)
+
+        print("=" * 80)
+        if not count:
+            print("❌ No se encontraron plantillas.")
+            return
+
+        print(f"\n✅ Se encontraron {count} plantilla(s)")
         print("\n💡 Para usar una plantilla, copia el nombre exacto y úsalo en mandar_msg_v2.py")
-        
+
     except Exception as e:
         print(f"❌ Error: {e}")
+        sys.exit(1)
 
 
 if __name__ == "__main__":
     main()
-
-
@@ -7,7 +7,9 @@ import sys
 import os
 import argparse
 from pathlib import Path
-from whatsapp_sender_v2 import WhatsAppSender
+from sender_daemon import get_sender
+from send_result import message_id_of
+from otp_service import OTPService, OTP_VALID, OTP_INVALID, OTP_EXPIRED, OTP_LOCKED
 from dotenv import load_dotenv
 
 # Configurar codificación UTF-8 para Windows
@@ -23,7 +25,6 @@ DEFAULT_PHONE = "5693443695"
 
 # Valores hardcoded para plantillas
 DEFAULT_AUTH_TEMPLATE = "nombre_plantilla_auth"  # Cambiar por el nombre real de tu plantilla
-DEFAULT_AUTH_CODE = "123456"  # Código OTP por defecto
 DEFAULT_UTILITY_TEMPLATE = "crpc_bienvenida"  # Plantilla de bienvenida sin parámetros
 DEFAULT_UTILITY_PARAMS = []  # Sin parámetros
 DEFAULT_MARKETING_TEMPLATE = "viaje_recordatorio_cprc"  # Cambiar por el nombre real
@@ -31,6 +32,13 @@ DEFAULT_MARKETING_PARAMS = ["Osvaldo"]  # Parámetros por defecto
 DEFAULT_MARKETING_IMAGE_URL = "~/Downloads/crpc_logo.jpeg"  # Ruta local o URL de imagen por defecto
 DEFAULT_LANGUAGE_CODE = "es_CL"  # Código de idioma por defecto (español de Chile)
 
+# Archivo donde se guardan los OTP emitidos (hash) para poder verificarlos después.
+# Solo se usa si OTP_SECRET está configurado en .env
+OTP_STORE_PATH = os.getenv('OTP_STORE_PATH', '.otp_store.json')
+
+# Reenviar al daemon (sender_daemon.py) si está corriendo; --direct lo desactiva
+USE_DAEMON = True
+
 
 def get_phone_number(phone_arg: str = None) -> str:
     """
@@ -53,7 +61,7 @@ def get_phone_number(phone_arg: str = None) -> str:
 def send_free_message(phone: str):
     """Envía un mensaje de texto libre (free)"""
     try:
-        sender = WhatsAppSender()
+        sender = get_sender(USE_DAEMON)
         
         # Obtener mensaje
         print("\n📝 Ingresa el mensaje a enviar (presiona Enter dos veces para finalizar):")
@@ -73,7 +81,7 @@ def send_free_message(phone: str):
         
         print(f"\n📤 Enviando mensaje libre a {phone}...")
         result = sender.send_text_message(phone, message)
-        message_id = result.get('messages', [{}])[0].get('id', 'N/A')
+        message_id = message_id_of(result)
         
         print("✅ Mensaje enviado exitosamente!")
         print(f"   Message ID: {message_id}")
@@ -85,7 +93,7 @@ def send_free_message(phone: str):
 def send_template_message(phone: str):
     """Envía un mensaje usando una plantilla (template)"""
     try:
-        sender = WhatsAppSender()
+        sender = get_sender(USE_DAEMON)
         
         # Obtener nombre de la plantilla
         template_name = input("\n📋 Ingresa el nombre de la plantilla: ").strip()
@@ -127,7 +135,7 @@ def send_template_message(phone: str):
             language_code=language_code,
             components=components
         )
-        message_id = result.get('messages', [{}])[0].get('id', 'N/A')
+        message_id = message_id_of(result)
         
         print("✅ Mensaje de plantilla enviado exitosamente!")
         print(f"   Message ID: {message_id}")
@@ -139,37 +147,75 @@ def send_template_message(phone: str):
 def send_authentication_message(phone: str):
     """Envía un mensaje de autenticación (OTP/código)"""
     try:
-        sender = WhatsAppSender()
+        sender = get_sender(USE_DAEMON)
         
-        # Valores hardcoded
+        # Valores hardcoded; el código se genera en cada envío
         template_name = DEFAULT_AUTH_TEMPLATE
-        code = DEFAULT_AUTH_CODE
         language_code = DEFAULT_LANGUAGE_CODE
+        otp = get_otp_service(sender)
+        code = otp.generate(phone)
         
         print(f"\n📋 Plantilla: {template_name}")
         print(f"🔐 Código OTP: {code}")
         print(f"🌐 Idioma: {language_code}")
         print(f"\n📤 Enviando mensaje de autenticación a {phone}...")
         
-        result = sender.send_authentication_template(
-            to=phone,
-            template_name=template_name,
-            code=code,
-            language_code=language_code
-        )
-        message_id = result.get('messages', [{}])[0].get('id', 'N/A')
+        try:
+            result = otp.send(phone, code)
+        except Exception:
+            otp.discard(phone)
+            raise
+        otp.save()
+        message_id = message_id_of(result)
         
         print("✅ Mensaje de autenticación enviado exitosamente!")
         print(f"   Message ID: {message_id}")
+        if not otp.store_path:
+            print("💡 Configura OTP_SECRET en .env para poder verificar el código con 'verify'")
         
     except Exception as e:
         print(f"❌ Error al enviar mensaje de autenticación: {e}")
 
 
+def get_otp_service(sender=None) -> OTPService:
+    """Servicio OTP de la plantilla de autenticación (persistente si hay OTP_SECRET)."""
+    return OTPService(
+        sender,
+        template_name=DEFAULT_AUTH_TEMPLATE,
+        language_code=DEFAULT_LANGUAGE_CODE,
+        store_path=OTP_STORE_PATH if os.getenv('OTP_SECRET') else None
+    )
+
+
+def verify_authentication_code(phone: str, code: str):
+    """Verifica un código OTP enviado antes con 'auth'"""
+    if not os.getenv('OTP_SECRET'):
+        print("❌ Para verificar códigos configura OTP_SECRET en .env")
+        return
+    if not code:
+        code = input("\n🔐 Ingresa el código recibido: ").strip()
+    
+    try:
+        otp = get_otp_service()
+        status = otp.verify(phone, code)
+        otp.save()
+    except Exception as e:
+        print(f"❌ Error al verificar código: {e}")
+        return
+    
+    messages = {
+        OTP_VALID: "✅ Código correcto",
+        OTP_INVALID: "❌ Código incorrecto",
+        OTP_EXPIRED: "⌛ El código expiró, pide uno nuevo",
+        OTP_LOCKED: "🔒 Demasiados intentos, pide un código nuevo",
+    }
+    print(messages.get(status, "❌ No hay un código activo para este número"))
+
+
 def send_utility_message(phone: str):
     """Envía un mensaje de utilidad (notificaciones)"""
     try:
-        sender = WhatsAppSender()
+        sender = get_sender(USE_DAEMON)
         
         # Valores hardcoded
         template_name = DEFAULT_UTILITY_TEMPLATE
@@ -190,7 +236,7 @@ def send_utility_message(phone: str):
             parameters=params,
             language_code=language_code
         )
-        message_id = result.get('messages', [{}])[0].get('id', 'N/A')
+        message_id = message_id_of(result)
         
         print("✅ Mensaje de utilidad enviado exitosamente!")
         print(f"   Message ID: {message_id}")
@@ -202,7 +248,7 @@ def send_utility_message(phone: str):
 def send_marketing_message(phone: str):
     """Envía un mensaje de marketing (promociones/ofertas)"""
     try:
-        sender = WhatsAppSender()
+        sender = get_sender(USE_DAEMON)
         
         # Valores hardcoded
         template_name = DEFAULT_MARKETING_TEMPLATE
@@ -253,7 +299,7 @@ def send_marketing_message(phone: str):
             header_image_url=header_image_url,
             language_code=language_code
         )
-        message_id = result.get('messages', [{}])[0].get('id', 'N/A')
+        message_id = message_id_of(result)
         
         print("✅ Mensaje de marketing enviado exitosamente!")
         print(f"   Message ID: {message_id}")
@@ -273,16 +319,20 @@ Ejemplos:
   python mandar_msg_v2.py free --phone=123456789   # Envía un mensaje libre a número específico
   python mandar_msg_v2.py template                # Envía un mensaje de plantilla genérica
   python mandar_msg_v2.py auth                    # Envía un mensaje de autenticación (OTP)
+  python mandar_msg_v2.py verify --code=123456    # Verifica el OTP recibido
   python mandar_msg_v2.py utility                 # Envía un mensaje de utilidad (notificaciones)
   python mandar_msg_v2.py marketing                # Envía un mensaje de marketing (promociones)
   python mandar_msg_v2.py marketing --phone=987654321  # Con número específico
+  python mandar_msg_v2.py free --direct            # Sin pasar por sender_daemon.py
+  python mandar_msg_v2.py utility --record=flujo.jsonl.gz           # Envía y graba las respuestas
+  python mandar_msg_v2.py utility --replay=flujo.jsonl.gz --replay-speed=0  # Sin red (ver record_replay.py)
         """
     )
     
     parser.add_argument(
         'tipo',
-        choices=['free', 'template', 'auth', 'utility', 'marketing'],
-        help='Tipo de mensaje: "free" (texto libre), "template" (genérico), "auth" (autenticación), "utility" (utilidad), "marketing" (marketing)'
+        choices=['free', 'template', 'auth', 'verify', 'utility', 'marketing'],
+        help='Tipo de mensaje: "free" (texto libre), "template" (genérico), "auth" (autenticación), "verify" (verificar OTP), "utility" (utilidad), "marketing" (marketing)'
     )
     
     parser.add_argument(
@@ -292,8 +342,53 @@ Ejemplos:
         help=f'Número de teléfono de destino (por defecto: {DEFAULT_PHONE} o YOUR_PHONE_NUMBER del .env)'
     )
     
+    parser.add_argument(
+        '--code',
+        type=str,
+        default=None,
+        help='Código OTP a verificar (solo para "verify")'
+    )
+    
+    parser.add_argument(
+        '--direct',
+        action='store_true',
+        help='Enviar directamente sin pasar por el daemon aunque esté corriendo'
+    )
+    
+    parser.add_argument(
+        '--record',
+        type=str,
+        default=None,
+        help='Graba los envíos y respuestas de la API en este cassette (ver record_replay.py)'
+    )
+    
+    parser.add_argument(
+        '--replay',
+        type=str,
+        default=None,
+        help='Responde desde este cassette grabado, sin usar la red'
+    )
+    
+    parser.add_argument(
+        '--replay-speed',
+        type=float,
+        default=None,
+        help='Factor de velocidad de las latencias grabadas (1 = original, 0 = sin esperar)'
+    )
+    
     args = parser.parse_args()
     
+    global USE_DAEMON
+    USE_DAEMON = not args.direct
+    
+    # get_sender() lee el cassette de estas variables
+    if args.record:
+        os.environ['WHATSAPP_RECORD'] = args.record
+    if args.replay:
+        os.environ['WHATSAPP_REPLAY'] = args.replay
+    if args.replay_speed is not None:
+        os.environ['WHATSAPP_REPLAY_SPEED'] = str(args.replay_speed)
+    
     # Obtener número de teléfono
     phone = get_phone_number(args.phone)
     print(f"📱 Teléfono de destino: {phone}")
@@ -305,6 +400,8 @@ Ejemplos:
         send_template_message(phone)
     elif args.tipo == "auth":
         send_authentication_message(phone)
+    elif args.tipo == "verify":
+        verify_authentication_code(phone, args.code)
     elif args.tipo == "utility":
         send_utility_message(phone)
     elif args.tipo == "marketing":
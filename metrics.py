@@ -0,0 +1,48 @@
+"""
+Métricas simples en memoria para los envíos (latencias y contadores)
+"""
+
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+
+def _percentile(samples: List[float], p: float) -> Optional[float]:
+    if not samples:
+        return None
+    index = min(len(samples) - 1, int(round(p / 100.0 * (len(samples) - 1))))
+    return samples[index]
+
+
+class LatencyWindow:
+    """
+    Guarda las últimas `size` latencias (en segundos) y calcula percentiles.
+    Seguro entre hilos; la memoria usada es fija.
+    """
+
+    def __init__(self, size: int = 10000):
+        self._samples = deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Percentil p (0-100) de la ventana en segundos, o None si no hay muestras."""
+        with self._lock:
+            samples = sorted(self._samples)
+        return _percentile(samples, p)
+
+    def snapshot(self) -> Dict[str, Optional[float]]:
+        """p50/p95/p99 de la ventana en milisegundos."""
+        with self._lock:
+            samples = sorted(self._samples)
+
+        result = {}
+        for p in (50, 95, 99):
+            value = _percentile(samples, p)
+            result[f'p{p}_ms'] = None if value is None else round(value * 1000, 2)
+        return result
@@ -0,0 +1,294 @@
+"""
+Servicio de códigos OTP sobre plantillas AUTHENTICATION
+Genera códigos, los envía por WhatsApp y los verifica.
+
+- Los códigos se guardan solo como HMAC-SHA256 (nunca en texto plano), en un
+  mapa en memoria con expiración automática (TTL).
+- Límite de intentos de verificación por código y tiempo mínimo entre reenvíos.
+- Persistencia opcional en un archivo JSON (requiere OTP_SECRET en .env).
+
+Uso:
+    otp = OTPService(WhatsAppSender(), template_name="codigo_verificacion")
+    otp.issue("5491123456789")                    # genera y envía el código
+    otp.verify("5491123456789", "123456")         # -> OTP_VALID, OTP_INVALID, ...
+"""
+
+import os
+import hmac
+import json
+import time
+import secrets
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, List
+from dotenv import load_dotenv
+from whatsapp_sender_v2 import WhatsAppSender
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Resultados de verify()
+OTP_VALID = 'valid'
+OTP_INVALID = 'invalid'
+OTP_EXPIRED = 'expired'
+OTP_LOCKED = 'locked'
+OTP_NOT_FOUND = 'not_found'
+
+
+class OTPRateLimitError(Exception):
+    """Se pidió un código nuevo antes de que pase el tiempo mínimo entre reenvíos."""
+
+
+class _OTPEntry:
+    """Código activo de un teléfono (memoria constante por código)."""
+
+    __slots__ = ('digest', 'issued_at', 'expires_at', 'attempts')
+
+    def __init__(self, digest: bytes, issued_at: float, expires_at: float, attempts: int = 0):
+        self.digest = digest
+        self.issued_at = issued_at
+        self.expires_at = expires_at
+        self.attempts = attempts
+
+
+class OTPService:
+    """
+    Emite y verifica códigos OTP.
+
+    Args:
+        sender: WhatsAppSender (o SenderPool / DaemonSender) para enviar la plantilla
+        template_name: Plantilla AUTHENTICATION aprobada
+        language_code: Idioma de la plantilla
+        digits: Largo del código
+        ttl: Segundos de validez de cada código
+        max_attempts: Intentos de verificación antes de invalidar el código
+        resend_interval: Segundos mínimos entre dos códigos para el mismo teléfono
+        copy_code_button: Incluir el código también en el botón "copiar código" de la plantilla
+        store_path: Archivo JSON para persistir los códigos activos (opcional)
+        secret: Clave del HMAC. Por defecto OTP_SECRET del .env o una aleatoria por proceso.
+    """
+
+    def __init__(
+        self,
+        sender,
+        template_name: str,
+        language_code: str = "es",
+        digits: int = 6,
+        ttl: float = 300,
+        max_attempts: int = 5,
+        resend_interval: float = 30,
+        copy_code_button: bool = False,
+        store_path: Optional[str] = None,
+        secret: Optional[str] = None
+    ):
+        secret = secret or os.getenv('OTP_SECRET')
+        if store_path and not secret:
+            raise ValueError("Para persistir los códigos configura OTP_SECRET en .env")
+
+        self.sender = sender
+        self.template_name = template_name
+        self.language_code = language_code
+        self.digits = digits
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.resend_interval = resend_interval
+        self.copy_code_button = copy_code_button
+        self.store_path = store_path
+        self._key = secret.encode('utf-8') if secret else secrets.token_bytes(32)
+
+        # Con TTL fijo, el orden de inserción es el orden de expiración:
+        # los vencidos siempre están al principio del OrderedDict.
+        self._codes: "OrderedDict[str, _OTPEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        if store_path and os.path.exists(store_path):
+            self.load()
+
+        # Camino rápido: solo WhatsAppSender recibe el payload ya armado (send_payload)
+        self._prerendered = isinstance(sender, WhatsAppSender)
+        self._render()
+
+        # Conexión caliente para que el primer OTP no pague el handshake TLS
+        if hasattr(sender, 'warm_up'):
+            sender.warm_up()
+
+    # ===============================
+    # 🔐 CÓDIGOS
+    # ===============================
+    @staticmethod
+    def _normalize(phone: str) -> str:
+        return phone.replace(' ', '').replace('-', '').replace('+', '')
+
+    def _digest(self, phone: str, code: str) -> bytes:
+        return hmac.new(self._key, f"{phone}:{code}".encode('utf-8'), hashlib.sha256).digest()
+
+    def _evict_expired(self, now: float) -> None:
+        while self._codes:
+            phone, entry = next(iter(self._codes.items()))
+            if entry.expires_at > now:
+                return
+            del self._codes[phone]
+
+    def generate(self, phone: str) -> str:
+        """
+        Genera y registra un código nuevo para el teléfono (sin enviarlo).
+        Lanza OTPRateLimitError si el último código se emitió hace muy poco.
+        """
+        phone = self._normalize(phone)
+        code = f"{secrets.randbelow(10 ** self.digits):0{self.digits}d}"
+        now = time.time()
+
+        with self._lock:
+            self._evict_expired(now)
+            previous = self._codes.get(phone)
+            if previous is not None and now - previous.issued_at < self.resend_interval:
+                wait = int(self.resend_interval - (now - previous.issued_at)) + 1
+                raise OTPRateLimitError(f"Espera {wait}s antes de pedir un código nuevo")
+
+            self._codes.pop(phone, None)
+            self._codes[phone] = _OTPEntry(self._digest(phone, code), now, now + self.ttl)
+
+        return code
+
+    def issue(self, phone: str) -> str:
+        """Genera un código, lo envía por WhatsApp y lo retorna."""
+        code = self.generate(phone)
+        try:
+            self.send(phone, code)
+        except Exception:
+            # Si no se pudo enviar, no dejar un código activo que bloquee el reenvío
+            self.discard(phone)
+            raise
+        return code
+
+    def discard(self, phone: str) -> None:
+        """Elimina el código activo del teléfono, si existe."""
+        with self._lock:
+            self._codes.pop(self._normalize(phone), None)
+
+    def verify(self, phone: str, code: str) -> str:
+        """
+        Verifica un código. Un código válido se consume (solo sirve una vez).
+        Retorna OTP_VALID, OTP_INVALID, OTP_EXPIRED, OTP_LOCKED u OTP_NOT_FOUND.
+        """
+        phone = self._normalize(phone)
+        now = time.time()
+
+        with self._lock:
+            entry = self._codes.get(phone)
+            if entry is None:
+                return OTP_NOT_FOUND
+            if entry.expires_at <= now:
+                del self._codes[phone]
+                return OTP_EXPIRED
+
+            if hmac.compare_digest(entry.digest, self._digest(phone, code.strip())):
+                del self._codes[phone]
+                return OTP_VALID
+
+            entry.attempts += 1
+            if entry.attempts >= self.max_attempts:
+                del self._codes[phone]
+                return OTP_LOCKED
+            return OTP_INVALID
+
+    def active_codes(self) -> int:
+        """Cantidad de códigos vigentes en memoria."""
+        with self._lock:
+            self._evict_expired(time.time())
+            return len(self._codes)
+
+    # ===============================
+    # 📤 ENVÍO
+    # ===============================
+    def _render(self) -> None:
+        """
+        Pre-arma las partes fijas del payload (plantilla, idioma, botón) y las
+        valida una sola vez: cada envío solo agrega el teléfono y el código, que
+        siempre son dígitos y no necesitan revisarse.
+        """
+        self._button = (
+            {"type": "button", "sub_type": "url", "index": "0"} if self.copy_code_button else None
+        )
+        self._head = {"messaging_product": "whatsapp", "recipient_type": "individual"}
+        self._language = self.language_code
+
+        validator = getattr(self.sender, 'validator', None)
+        if self._prerendered and validator is not None:
+            # En modo 'fix' el idioma queda corregido para todos los envíos
+            checked = validator.payload(self._payload('0', '0' * self.digits))
+            self._language = checked['template']['language']['code']
+
+    def _components(self, code: str) -> List[Dict[str, Any]]:
+        """Cuerpo (y botón "copiar código") con el código: lo único que cambia entre envíos."""
+        parameters = [{"type": "text", "text": code}]
+        components = [{"type": "body", "parameters": parameters}]
+        if self._button is not None:
+            components.append({**self._button, "parameters": parameters})
+        return components
+
+    def _payload(self, phone: str, code: str) -> Dict[str, Any]:
+        return {
+            **self._head,
+            "to": phone,
+            "type": "template",
+            "template": {
+                "name": self.template_name,
+                "language": {"code": self._language},
+                "components": self._components(code)
+            }
+        }
+
+    def send(self, phone: str, code: str) -> Dict[str, Any]:
+        """
+        Envía el código usando la plantilla AUTHENTICATION configurada. Con un
+        WhatsAppSender el payload pre-armado va directo al POST; con otros
+        senders (SenderPool, DaemonSender) se usa send_template_message.
+        """
+        phone = self._normalize(phone)
+        if self._prerendered:
+            return self.sender.send_payload(self._payload(phone, code), validated=True)
+        return self.sender.send_template_message(
+            phone,
+            self.template_name,
+            self.language_code,
+            self._components(code)
+        )
+
+    # ===============================
+    # 💾 PERSISTENCIA
+    # ===============================
+    def save(self) -> None:
+        """Guarda los códigos vigentes (solo sus hashes) en store_path."""
+        if not self.store_path:
+            return
+
+        with self._lock:
+            self._evict_expired(time.time())
+            data = {
+                phone: [entry.digest.hex(), entry.issued_at, entry.expires_at, entry.attempts]
+                for phone, entry in self._codes.items()
+            }
+
+        tmp_path = f"{self.store_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            json.dump(data, file)
+        os.replace(tmp_path, self.store_path)
+
+    def load(self) -> None:
+        """Carga los códigos vigentes desde store_path."""
+        with open(self.store_path, encoding='utf-8') as file:
+            data = json.load(file)
+
+        now = time.time()
+        entries = sorted(
+            (
+                (phone, _OTPEntry(bytes.fromhex(digest), issued_at, expires_at, attempts))
+                for phone, (digest, issued_at, expires_at, attempts) in data.items()
+                if expires_at > now
+            ),
+            key=lambda item: item[1].expires_at
+        )
+        with self._lock:
+            self._codes = OrderedDict(entries)
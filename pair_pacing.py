@@ -0,0 +1,91 @@
+"""
+Ritmo por destinatario (pair rate limit de WhatsApp)
+Meta rechaza con el error 131056 los mensajes enviados demasiado seguido al
+mismo destinatario (del mismo número de negocio). Este módulo recuerda cuándo
+puede volver a escribirse a cada destinatario y, en vez de dejar que el envío
+falle, indica cuánto hay que diferirlo. Los demás destinatarios no esperan.
+
+- El mapa es una tabla de tamaño fijo indexada por hash del teléfono con el
+  próximo instante permitido (8 bytes por casillero). Las entradas vencen solas:
+  un instante ya pasado equivale a un casillero libre.
+- Si dos teléfonos caen en el mismo casillero, el segundo espera de más: nunca
+  se envía antes de tiempo.
+- Con ctx (multiprocessing) la tabla vive en memoria compartida, como
+  SharedTokenBucket, y todos los procesos respetan el mismo ritmo.
+
+Uso:
+    pacer = PairPacer(interval=6)
+    delay = pacer.reserve("56912345678")   # 0 si puede enviarse ya
+    if delay:
+        ...diferir el envío `delay` segundos...
+"""
+
+import os
+import time
+import zlib
+import threading
+from array import array
+
+# Segundos mínimos entre mensajes al mismo destinatario
+DEFAULT_PAIR_INTERVAL = float(os.getenv('WHATSAPP_PAIR_INTERVAL', '6'))
+
+# Casilleros de la tabla (8 bytes cada uno)
+DEFAULT_SLOTS = 1 << 18
+
+
+class PairPacer:
+    """
+    Próximo instante permitido por destinatario.
+
+    Args:
+        interval: Segundos mínimos entre mensajes al mismo destinatario
+        slots: Casilleros de la tabla (se redondea a potencia de 2)
+        ctx: Contexto de multiprocessing para compartir la tabla entre procesos
+    """
+
+    def __init__(self, interval: float = DEFAULT_PAIR_INTERVAL, slots: int = DEFAULT_SLOTS, ctx=None):
+        bits = max(1, (slots - 1).bit_length())
+        size = 1 << bits
+        self.interval = float(interval)
+        self._shift = 64 - bits
+        if ctx is not None:
+            self._next = ctx.RawArray('d', size)
+            self._lock = ctx.Lock()
+        else:
+            self._next = array('d', bytes(8 * size))
+            self._lock = threading.Lock()
+
+        self.deferred = 0
+
+    def _slot(self, phone: str) -> int:
+        digits = phone.replace(' ', '').replace('-', '').replace('+', '')
+        key = int(digits) if digits.isdigit() else zlib.crc32(digits.encode('utf-8'))
+        # Hash multiplicativo: números consecutivos no quedan en casilleros vecinos
+        return ((key * 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF) >> self._shift
+
+    def reserve(self, phone: str) -> float:
+        """
+        Reserva el próximo turno del destinatario. Retorna 0 si el mensaje puede
+        enviarse ya, o los segundos que hay que diferirlo (el turno queda reservado).
+        """
+        i = self._slot(phone)
+        now = time.monotonic()
+        with self._lock:
+            at = max(now, self._next[i])
+            self._next[i] = at + self.interval
+            if at > now:
+                self.deferred += 1
+        return at - now
+
+    def penalize(self, phone: str) -> float:
+        """
+        Tras un error 131056: el destinatario no puede recibir hasta dentro de un
+        intervalo completo. Retorna los segundos que hay que diferir el reintento.
+        """
+        i = self._slot(phone)
+        now = time.monotonic()
+        with self._lock:
+            at = max(now + self.interval, self._next[i])
+            self._next[i] = at + self.interval
+            self.deferred += 1
+        return at - now
@@ -0,0 +1,252 @@
+"""
+Validación local de los payloads antes de enviarlos
+Meta rechaza con un 400, después del viaje de ida y vuelta, los textos de más
+de 4096 caracteres, los parámetros de plantilla con saltos de línea, tabs o más
+de 4 espacios seguidos, los parámetros vacíos y los códigos de idioma inválidos.
+Estas reglas se revisan localmente con expresiones regulares compiladas:
+
+- Modo 'reject': el envío falla al instante con PayloadError (sin gastar cupo).
+  Los parámetros que no son texto (ej. el número 12345) también se rechazan.
+- Modo 'fix': se corrige lo que se puede (saltos de línea y espacios seguidos
+  pasan a un espacio, los textos largos se recortan, 'es-cl' pasa a 'es_CL', los
+  valores que no son texto pasan por str()).
+
+WhatsAppSender solo valida si se le pide (validate='reject' o 'fix');
+bulk_send.py, shard_coordinator.py y send_service.py validan por defecto.
+
+En campañas se valida cada valor distinto una sola vez (los parámetros se
+repiten mucho), y recipient_store.py permite revisar el archivo completo por
+columna antes de enviar.
+
+Uso:
+    validator = PayloadValidator(fix=True)
+    params = validator.parameters(['Ana\\nPérez', '12345'])     # ['Ana Pérez', '12345']
+    python payload_validation.py clientes.csv                    # revisar un CSV/.rcp
+"""
+
+import re
+import sys
+import argparse
+from collections import Counter
+from typing import Optional, Dict, Any, List, Tuple
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Largo máximo del cuerpo de un mensaje de texto de WhatsApp
+MAX_TEXT_CHARS = 4096
+
+# Largo máximo de un parámetro según el componente de la plantilla
+MAX_BODY_PARAM_CHARS = 1024
+MAX_HEADER_PARAM_CHARS = 60
+
+# Valores distintos que se recuerdan ya validados
+_CACHE_SIZE = 1 << 16
+
+_BAD_WHITESPACE = re.compile(r'[\r\n\t]| {5,}')
+_FIX_WHITESPACE = re.compile(r'[\r\n\t]+| {5,}')
+_LANGUAGE = re.compile(r'^[a-z]{2,3}(?:_[A-Z]{2,4})?$')
+_LANGUAGE_PARTS = re.compile(r'^([A-Za-z]{2,3})(?:[-_]([A-Za-z]{2,4}))?$')
+
+
+class PayloadError(Exception):
+    """El payload no cumple los límites de la API (no se envió)."""
+
+    def __init__(self, detail: str):
+        self.detail = detail
+        super().__init__(f"❌ Error: payload inválido (no se envió)\nDetalles: {detail}")
+
+
+def parameter_problem(value: str, max_chars: int = MAX_BODY_PARAM_CHARS) -> Optional[str]:
+    """Motivo por el que Meta rechazaría el parámetro, o None si es válido."""
+    if not isinstance(value, str):
+        return f"el parámetro {value!r} no es texto ({type(value).__name__})"
+    if not value or value.isspace():
+        return "parámetro vacío"
+    if _BAD_WHITESPACE.search(value):
+        return f"el parámetro {value[:30]!r} tiene saltos de línea, tabs o más de 4 espacios seguidos"
+    if len(value) > max_chars:
+        return f"el parámetro {value[:30]!r}... tiene {len(value)} caracteres (máximo {max_chars})"
+    return None
+
+
+def fix_parameter(value: str, max_chars: int = MAX_BODY_PARAM_CHARS) -> str:
+    """Corrige el parámetro: saltos de línea, tabs y espacios seguidos pasan a un espacio."""
+    return _FIX_WHITESPACE.sub(' ', value).strip()[:max_chars]
+
+
+def fix_language(code: str) -> Optional[str]:
+    """Normaliza 'es-cl' o 'ES_cl' a 'es_CL'. None si no parece un código de idioma."""
+    match = _LANGUAGE_PARTS.match(code.strip())
+    if not match:
+        return None
+    language, region = match.groups()
+    return language.lower() + (f"_{region.upper()}" if region else '')
+
+
+class PayloadValidator:
+    """
+    Reglas de la API para textos, parámetros de plantilla e idiomas.
+
+    Args:
+        fix: True para corregir lo que se pueda; False para rechazar con PayloadError
+    """
+
+    def __init__(self, fix: bool = False):
+        self.fix = fix
+        self._cache: Dict[Tuple[str, int], Tuple[Optional[str], Optional[str]]] = {}
+
+        self.rejected = 0
+        self.fixed = 0
+
+    def _reject(self, detail: str):
+        self.rejected += 1
+        raise PayloadError(detail)
+
+    def _to_text(self, value: Any, what: str) -> str:
+        """Valores que no son texto: PayloadError, o en modo fix su str()."""
+        if not self.fix:
+            self._reject(f"{what} {value!r} no es texto ({type(value).__name__})")
+        self.fixed += 1
+        return '' if value is None else str(value)
+
+    def text(self, body: str) -> str:
+        """Cuerpo de un mensaje de texto (máximo 4096 caracteres)."""
+        if not isinstance(body, str):
+            body = self._to_text(body, 'el mensaje')
+        if not body or body.isspace():
+            self._reject("el mensaje está vacío")
+        if len(body) <= MAX_TEXT_CHARS:
+            return body
+        if not self.fix:
+            self._reject(f"el mensaje tiene {len(body)} caracteres (máximo {MAX_TEXT_CHARS})")
+        self.fixed += 1
+        return body[:MAX_TEXT_CHARS]
+
+    def parameter(self, value: str, max_chars: int = MAX_BODY_PARAM_CHARS) -> str:
+        """Parámetro de plantilla (cada valor distinto se revisa una sola vez)."""
+        if not isinstance(value, str):
+            value = self._to_text(value, 'el parámetro')
+        key = (value, max_chars)
+        cached = self._cache.get(key)
+        if cached is None:
+            problem = parameter_problem(value, max_chars)
+            fixed = None
+            if problem is not None and self.fix:
+                fixed = fix_parameter(value, max_chars)
+                if parameter_problem(fixed, max_chars) is None:
+                    problem = None
+                else:
+                    fixed = None
+            if len(self._cache) >= _CACHE_SIZE:
+                self._cache.clear()
+            cached = self._cache[key] = (fixed, problem)
+
+        fixed, problem = cached
+        if problem is not None:
+            self._reject(problem)
+        if fixed is not None:
+            self.fixed += 1
+            return fixed
+        return value
+
+    def parameters(self, values: List[str], max_chars: int = MAX_BODY_PARAM_CHARS) -> List[str]:
+        """Parámetros del cuerpo de una plantilla."""
+        return [self.parameter(value, max_chars) for value in values]
+
+    def language(self, code: str) -> str:
+        """Código de idioma de la plantilla (es, es_CL, pt_BR, ...)."""
+        if not isinstance(code, str):
+            self._reject(f"código de idioma inválido: {code!r} (ejemplos: es, es_CL, en_US)")
+        if _LANGUAGE.match(code):
+            return code
+        fixed = fix_language(code) if self.fix else None
+        if fixed is None:
+            self._reject(f"código de idioma inválido: {code!r} (ejemplos: es, es_CL, en_US)")
+        self.fixed += 1
+        return fixed
+
+    def payload(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Revisa (y en modo fix corrige en el lugar) un payload de la API de mensajes."""
+        if payload.get('type') == 'text':
+            text = payload['text']
+            text['body'] = self.text(text.get('body', ''))
+        elif payload.get('type') == 'template':
+            template = payload['template']
+            language = template.get('language', {})
+            language['code'] = self.language(language.get('code', ''))
+            for component in template.get('components') or []:
+                max_chars = MAX_HEADER_PARAM_CHARS if component.get('type') == 'header' else MAX_BODY_PARAM_CHARS
+                for parameter in component.get('parameters', []):
+                    if parameter.get('type') == 'text':
+                        parameter['text'] = self.parameter(parameter.get('text', ''), max_chars)
+        return payload
+
+
+def check_columns(columns: List[str], values: List[List[str]], counts: List[Counter]) -> List[Dict[str, Any]]:
+    """
+    Revisa cada valor distinto de cada columna una sola vez y retorna los problemas:
+    [{'column', 'value', 'problem', 'rows', 'fixable'}, ...].
+    """
+    issues = []
+    for column, column_values, column_counts in zip(columns, values, counts):
+        for code, value in enumerate(column_values):
+            problem = parameter_problem(value)
+            if problem is None:
+                continue
+            issues.append({
+                'column': column,
+                'value': value,
+                'problem': problem,
+                'rows': column_counts.get(code, 0),
+                'fixable': parameter_problem(fix_parameter(value)) is None,
+            })
+    return issues
+
+
+def main():
+    """Función principal"""
+    from recipient_store import RecipientStore
+
+    parser = argparse.ArgumentParser(
+        description='Revisa los parámetros de un archivo de destinatarios antes de enviar',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python payload_validation.py clientes.csv
+  python payload_validation.py clientes.rcp --lang=es-cl
+
+Cada valor distinto de cada columna se revisa una sola vez. Con
+bulk_send.py --validate=fix los problemas corregibles se corrigen al enviar.
+        """
+    )
+    parser.add_argument('recipients', type=str, help='Archivo CSV (o .rcp) con los destinatarios')
+    parser.add_argument('--lang', type=str, default=None, help='Código de idioma a revisar')
+    args = parser.parse_args()
+
+    try:
+        store = RecipientStore.open(args.recipients) if args.recipients.endswith('.rcp') else RecipientStore.from_csv(args.recipients)
+        issues = check_columns(*store.column_stats())
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    if args.lang and not _LANGUAGE.match(args.lang):
+        fixed = fix_language(args.lang)
+        print(f"⚠️  Código de idioma inválido: {args.lang!r}" + (f" (se corrige a {fixed!r})" if fixed else ''))
+
+    if not issues:
+        print(f"✅ {len(store)} destinatarios revisados: sin problemas")
+        return
+
+    rows = sum(issue['rows'] for issue in issues)
+    print(f"⚠️  {len(issues)} valores con problemas ({rows} filas afectadas de {len(store)}):\n")
+    for issue in sorted(issues, key=lambda issue: -issue['rows']):
+        fix = '🔧 corregible' if issue['fixable'] else '❌ no corregible'
+        print(f"   [{issue['column']}] {issue['rows']} filas - {issue['problem']} ({fix})")
+
+
+if __name__ == "__main__":
+    main()
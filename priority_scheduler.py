@@ -0,0 +1,179 @@
+"""
+Planificador con carriles de prioridad para WhatsAppSender
+Evita que los OTP (plantillas AUTHENTICATION) queden en cola detrás de una
+campaña de marketing: cada envío entra a un carril y los carriles se atienden
+por prioridad (authentication > utility/service > marketing).
+
+- Modo 'strict': siempre se atiende primero el carril más prioritario con trabajo.
+- Modo 'weighted': los carriles se reparten los envíos según sus pesos.
+- Una parte del límite de mensajes por segundo y algunos hilos quedan
+  reservados para el carril de autenticación.
+
+Uso:
+    scheduler = PriorityScheduler(WhatsAppSender(), rate=80)
+    future = scheduler.submit('send_marketing_template', phone, 'promo', ['Ana'])
+    scheduler.send_authentication_template(phone, 'otp', '123456')  # espera el resultado
+    print(scheduler.metrics())
+"""
+
+from concurrent.futures import Future
+from collections import deque
+from typing import Optional, Dict, Any
+from metrics import LatencyWindow
+from send_scheduler import SendScheduler, SchedulerSender
+
+LANE_AUTH = 'authentication'
+LANE_UTILITY = 'utility'
+LANE_MARKETING = 'marketing'
+
+# Carriles en orden de prioridad
+LANES = (LANE_AUTH, LANE_UTILITY, LANE_MARKETING)
+
+# Carril por defecto de cada método de WhatsAppSender
+METHOD_LANES = {
+    'send_authentication_template': LANE_AUTH,
+    'send_text_message': LANE_UTILITY,
+    'send_template_message': LANE_UTILITY,
+    'send_utility_template': LANE_UTILITY,
+    'send_service_template': LANE_UTILITY,
+    'send_marketing_template': LANE_MARKETING,
+}
+
+DEFAULT_WEIGHTS = {LANE_AUTH: 8, LANE_UTILITY: 4, LANE_MARKETING: 1}
+
+# Objetivo de latencia p99 (ms) por carril, reportado en metrics()
+DEFAULT_SLO_MS = {LANE_AUTH: 2000, LANE_UTILITY: 10000, LANE_MARKETING: 60000}
+
+
+class PriorityScheduler(SendScheduler):
+    """
+    Cola con prioridades delante de un WhatsAppSender (o SenderPool).
+    Los métodos send_* de WhatsAppSender encolan en el carril del método y
+    esperan el resultado.
+
+    Args:
+        sender: Objeto con los métodos send_* de WhatsAppSender
+        workers: Hilos de envío en total
+        rate: Mensajes por segundo permitidos (todos los carriles)
+        mode: 'strict' o 'weighted'
+        weights: Peso de cada carril en modo 'weighted'
+        auth_reserve: Fracción del límite de tasa que solo puede usar el carril de autenticación
+        auth_workers: Hilos dedicados exclusivamente al carril de autenticación
+        slo_ms: Objetivo de latencia p99 por carril
+    """
+
+    def __init__(
+        self,
+        sender,
+        workers: int = 8,
+        rate: float = 80,
+        mode: str = 'strict',
+        weights: Optional[Dict[str, int]] = None,
+        auth_reserve: float = 0.2,
+        auth_workers: int = 1,
+        slo_ms: Optional[Dict[str, float]] = None
+    ):
+        if mode not in ('strict', 'weighted'):
+            raise ValueError("mode debe ser 'strict' o 'weighted'")
+        if not 0 <= auth_reserve < 1:
+            raise ValueError("auth_reserve debe estar entre 0 y 1")
+        if auth_workers >= workers:
+            raise ValueError("auth_workers debe ser menor que workers")
+
+        super().__init__(sender, rate)
+        self.mode = mode
+        self.weights = dict(DEFAULT_WEIGHTS, **(weights or {}))
+        self.slo_ms = dict(DEFAULT_SLO_MS, **(slo_ms or {}))
+        self.reserve = auth_reserve * self.bucket.capacity
+
+        self._queues = {lane: deque() for lane in LANES}
+        self._credits = {lane: 0 for lane in LANES}
+
+        self._latency = {lane: LatencyWindow() for lane in LANES}
+        self._completed = {lane: 0 for lane in LANES}
+        self._failed = {lane: 0 for lane in LANES}
+
+        self._start_workers([(LANE_AUTH,)] * auth_workers + [LANES] * (workers - auth_workers))
+
+    # ===============================
+    # 📥 ENCOLAR
+    # ===============================
+    def submit(self, method: str, *args, lane: Optional[str] = None, **kwargs) -> Future:
+        """
+        Encola una llamada a sender.<method>(*args, **kwargs) y retorna un Future.
+        El carril se deduce del método salvo que se indique con lane=.
+        """
+        lane = lane or METHOD_LANES.get(method)
+        if lane not in LANES:
+            raise ValueError(f"Carril desconocido para {method}: {lane}")
+
+        item = self._item(method, args, kwargs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("El planificador está cerrado")
+            self._queues[lane].append(item)
+            # notify() podría despertar solo a un hilo exclusivo de autenticación
+            self._cond.notify_all()
+        return item[3]
+
+    def __getattr__(self, name: str):
+        if not name.startswith('send_'):
+            raise AttributeError(name)
+        return getattr(SchedulerSender(self.submit), name)
+
+    # ===============================
+    # ⚙️ DESPACHO
+    # ===============================
+    def _pick(self, *lanes):
+        """Elige el próximo carril a atender entre los que tienen trabajo."""
+        ready = [lane for lane in lanes if self._queues[lane]]
+        if not ready:
+            return None, None, None
+        if self.mode == 'strict' or len(ready) == 1:
+            chosen = ready[0]
+        else:
+            # Weighted round robin suave: cada carril suma su peso y se atiende al mayor
+            total = 0
+            for lane in ready:
+                self._credits[lane] += self.weights[lane]
+                total += self.weights[lane]
+            chosen = max(ready, key=lambda lane: self._credits[lane])
+            self._credits[chosen] -= total
+        return chosen, self._queues[chosen].popleft(), None
+
+    def _reserve(self, lane: str) -> float:
+        # El carril de autenticación puede usar todo el presupuesto; el resto
+        # deja libre la parte reservada
+        return 0.0 if lane == LANE_AUTH else self.reserve
+
+    def _record(self, lane: str, ok: bool, latency: float, now: float) -> None:
+        self._latency[lane].record(latency)
+        if ok:
+            self._completed[lane] += 1
+        else:
+            self._failed[lane] += 1
+
+    # ===============================
+    # 📊 MÉTRICAS
+    # ===============================
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Por carril: en cola, completados, fallidos, latencia (desde que se encola
+        hasta que responde la API) y si el p99 cumple el objetivo (slo_ms).
+        """
+        with self._cond:
+            queued = {lane: len(self._queues[lane]) for lane in LANES}
+
+        result = {}
+        for lane in LANES:
+            latency = self._latency[lane].snapshot()
+            p99 = latency['p99_ms']
+            result[lane] = {
+                'queued': queued[lane],
+                'completed': self._completed[lane],
+                'failed': self._failed[lane],
+                **latency,
+                'slo_ms': self.slo_ms[lane],
+                'slo_ok': p99 is None or p99 <= self.slo_ms[lane],
+            }
+        return result
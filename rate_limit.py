@@ -0,0 +1,149 @@
+"""
+Limitador de tasa (token bucket) para los envíos a WhatsApp Business API
+Meta limita los mensajes por segundo de cada phone_number_id; estos limitadores
+reparten ese presupuesto entre los hilos (TokenBucket) o entre procesos
+(SharedTokenBucket) que envían.
+"""
+
+import time
+import threading
+import multiprocessing
+from typing import Optional
+
+
+class TokenBucket:
+    """
+    Token bucket seguro entre hilos.
+
+    Args:
+        rate: Tokens (mensajes) que se reponen por segundo
+        capacity: Máximo de tokens acumulables (ráfaga). Por defecto igual a rate.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("El rate debe ser mayor que 0")
+
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    @property
+    def available(self) -> float:
+        """Tokens disponibles en este momento."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._tokens
+
+    def try_acquire(self, tokens: float = 1.0, reserve: float = 0.0) -> bool:
+        """
+        Toma tokens si hay disponibles, sin esperar. Con reserve solo los toma si
+        después quedan al menos `reserve` tokens (reservados para tráfico prioritario).
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens - tokens >= reserve:
+                self._tokens -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None, reserve: float = 0.0) -> bool:
+        """
+        Espera hasta poder tomar los tokens (dejando al menos `reserve` disponibles).
+        Retorna False si se agota el timeout antes de conseguirlos.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens - tokens >= reserve:
+                    self._tokens -= tokens
+                    return True
+                wait = (tokens + reserve - self._tokens) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+
+            time.sleep(wait)
+
+
+class SharedTokenBucket:
+    """
+    Token bucket compartido entre procesos (memoria compartida + lock).
+    Se crea en el proceso padre y se pasa a los procesos hijos al crearlos, de modo
+    que todos consumen del mismo presupuesto de mensajes por segundo.
+
+    Args:
+        rate: Tokens (mensajes) que se reponen por segundo
+        capacity: Máximo de tokens acumulables (ráfaga). Por defecto igual a rate.
+        ctx: Contexto de multiprocessing (por defecto el global)
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None, ctx=None):
+        if rate <= 0:
+            raise ValueError("El rate debe ser mayor que 0")
+
+        ctx = ctx or multiprocessing
+        self.rate = float(rate)
+        self.capacity = float(capacity if capacity is not None else rate)
+        # [tokens disponibles, última recarga (time.monotonic)]
+        self._state = ctx.RawArray('d', [self.capacity, time.monotonic()])
+        self._lock = ctx.Lock()
+
+    def _refill(self, now: float) -> None:
+        state = self._state
+        state[0] = min(self.capacity, state[0] + (now - state[1]) * self.rate)
+        state[1] = now
+
+    @property
+    def available(self) -> float:
+        """Tokens disponibles en este momento."""
+        with self._lock:
+            self._refill(time.monotonic())
+            return self._state[0]
+
+    def try_acquire(self, tokens: float = 1.0, reserve: float = 0.0) -> bool:
+        """
+        Toma tokens si hay disponibles, sin esperar. Con reserve solo los toma si
+        después quedan al menos `reserve` tokens (reservados para tráfico prioritario).
+        """
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._state[0] - tokens >= reserve:
+                self._state[0] -= tokens
+                return True
+            return False
+
+    def acquire(self, tokens: float = 1.0, timeout: Optional[float] = None, reserve: float = 0.0) -> bool:
+        """
+        Espera hasta poder tomar los tokens (dejando al menos `reserve` disponibles).
+        Retorna False si se agota el timeout antes de conseguirlos.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        while True:
+            with self._lock:
+                self._refill(time.monotonic())
+                if self._state[0] - tokens >= reserve:
+                    self._state[0] -= tokens
+                    return True
+                wait = (tokens + reserve - self._state[0]) / self.rate
+
+            if deadline is not None:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+
+            time.sleep(wait)
@@ -0,0 +1,391 @@
+"""
+Almacenamiento compacto de destinatarios para campañas grandes
+Guarda los teléfonos normalizados como enteros de 64 bits en un array y los
+parámetros de la plantilla como columnas codificadas por diccionario (cada valor
+distinto se guarda una sola vez). Un destinatario ocupa ~8 bytes + 4 por columna,
+en vez de los cientos de bytes de una lista de tuplas/dicts.
+
+Se puede guardar en un archivo y abrirlo con mmap, de modo que los datos los
+comparten los procesos de envío sin copiarlos. Los valores de las columnas y los
+teléfonos no numéricos también quedan en el mmap (offsets + bytes UTF-8): una
+columna con millones de valores distintos (nombres, ids) no se carga en memoria.
+
+Uso:
+    store = RecipientStore.from_csv("clientes.csv")
+    store.save("clientes.rcp")
+    store = RecipientStore.open("clientes.rcp")      # mmap, casi sin memoria
+    for index, phone, params in store.rows():
+        ...
+"""
+
+import os
+import sys
+import csv
+import argparse
+import json
+import mmap
+import bisect
+import struct
+import hashlib
+from array import array
+from collections import Counter
+from typing import Optional, Dict, List, Tuple, Iterator, Iterable, Callable
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Fila a enviar: (índice en el CSV, teléfono, parámetros)
+Row = Tuple[int, str, List[str]]
+
+# Cabecera del archivo: firma + largo del JSON de metadatos
+MAGIC = b'WSPRCP2\n'
+_HEADER = struct.Struct('<8sQ')
+
+# Los arrays del archivo empiezan alineados a 8 bytes
+_ALIGN = 8
+
+# Diccionarios de hasta estos valores se decodifican completos al abrir (se leen
+# en cada fila); los más grandes se leen del mmap valor por valor
+MATERIALIZE_VALUES = 4096
+
+
+def _normalize(phone: str) -> str:
+    return phone.strip().replace(' ', '').replace('-', '').replace('+', '')
+
+
+def _write_strings(file, values: Iterable[str]) -> None:
+    """Escribe una lista de textos: offsets uint64 (n + 1) y los bytes UTF-8 seguidos."""
+    blobs = [value.encode('utf-8') for value in values]
+    offsets = array('Q', [0])
+    total = 0
+    for blob in blobs:
+        total += len(blob)
+        offsets.append(total)
+    file.write(offsets)
+    file.write(b''.join(blobs))
+    file.write(b'\0' * (-file.tell() % _ALIGN))
+
+
+class _MappedStrings:
+    """Lista de textos de solo lectura sobre el mmap (ver _write_strings)."""
+
+    __slots__ = ('_offsets', '_blob')
+
+    def __init__(self, offsets: memoryview, blob: memoryview):
+        self._offsets = offsets
+        self._blob = blob
+
+    @classmethod
+    def read(cls, view: memoryview, offset: int, count: int) -> Tuple['_MappedStrings', int]:
+        """Lee la lista que empieza en offset. Retorna (lista, offset siguiente alineado)."""
+        offsets = view[offset:offset + (count + 1) * 8].cast('Q')
+        offset += (count + 1) * 8
+        size = offsets[count]
+        strings = cls(offsets, view[offset:offset + size])
+        offset += size
+        return strings, offset + (-offset % _ALIGN)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        return str(self._blob[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(len(self)):
+            yield self[index]
+
+
+class _MappedRawPhones:
+    """Teléfonos no numéricos sobre el mmap: índices de fila ordenados + textos."""
+
+    __slots__ = ('_indices', '_phones')
+
+    def __init__(self, indices: memoryview, phones: _MappedStrings):
+        self._indices = indices
+        self._phones = phones
+
+    def get(self, index: int, default: str = '') -> str:
+        position = bisect.bisect_left(self._indices, index)
+        if position < len(self._indices) and self._indices[position] == index:
+            return self._phones[position]
+        return default
+
+    def items(self) -> Iterator[Tuple[int, str]]:
+        return zip(self._indices, self._phones)
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+
+class _Column:
+    """Columna de texto codificada por diccionario: códigos uint32 + valores únicos."""
+
+    __slots__ = ('values', 'codes', '_index')
+
+    def __init__(self, values: Optional[List[str]] = None, codes=None):
+        self.values = values if values is not None else []
+        self.codes = codes if codes is not None else array('I')
+        self._index: Optional[Dict[str, int]] = None
+
+    def append(self, value: str) -> None:
+        if self._index is None:
+            self._index = {v: i for i, v in enumerate(self.values)}
+        code = self._index.get(value)
+        if code is None:
+            code = self._index[value] = len(self.values)
+            self.values.append(value)
+        self.codes.append(code)
+
+    def freeze(self) -> None:
+        """Libera el índice de construcción (solo hace falta para agregar filas)."""
+        self._index = None
+
+
+class RecipientStore:
+    """
+    Destinatarios de una campaña en formato columnar.
+
+    Los teléfonos que no son un número E.164 válido (no numéricos o con cero
+    inicial) se guardan tal cual aparte, para que el envío reporte su error
+    igual que antes.
+    """
+
+    def __init__(self, columns: Optional[List[str]] = None):
+        self.columns = list(columns or [])
+        self._phones = array('Q')
+        self._params = [_Column() for _ in self.columns]
+        # Con open() es un _MappedRawPhones (misma lectura con .get())
+        self._raw_phones: Dict[int, str] = {}
+        self._mmap: Optional[mmap.mmap] = None
+        self._path: Optional[str] = None
+
+    # ===============================
+    # 🏗️ CONSTRUCCIÓN
+    # ===============================
+    def append(self, phone: str, params: Iterable[str] = ()) -> None:
+        """Agrega un destinatario (solo en stores creados en memoria)."""
+        if self._mmap is not None:
+            raise ValueError("Un RecipientStore abierto desde archivo es de solo lectura")
+
+        phone = _normalize(phone)
+        if phone.isdigit() and not phone.startswith('0') and len(phone) <= 19:
+            self._phones.append(int(phone))
+        else:
+            self._raw_phones[len(self._phones)] = phone
+            self._phones.append(0)
+
+        values = list(params)
+        for k, column in enumerate(self._params):
+            column.append(values[k] if k < len(values) else '')
+
+    @classmethod
+    def from_csv(cls, path: str) -> 'RecipientStore':
+        """
+        Lee un CSV con una columna 'phone'; las demás columnas, en orden, son
+        los parámetros. Las filas sin teléfono se omiten.
+        """
+        with open(path, newline='', encoding='utf-8') as file:
+            reader = csv.reader(file)
+            header = next(reader, None)
+            if not header or 'phone' not in header:
+                raise ValueError(f"El archivo {path} debe tener una columna 'phone'")
+
+            phone_col = header.index('phone')
+            param_cols = [i for i, name in enumerate(header) if name != 'phone']
+            store = cls([header[i] for i in param_cols])
+
+            for record in reader:
+                if len(record) <= phone_col or not record[phone_col].strip():
+                    continue
+                store.append(record[phone_col], (record[i] if i < len(record) else '' for i in param_cols))
+
+        for column in store._params:
+            column.freeze()
+        return store
+
+    # ===============================
+    # 📖 LECTURA
+    # ===============================
+    def __len__(self) -> int:
+        return len(self._phones)
+
+    def phone(self, index: int) -> str:
+        """Teléfono normalizado de la fila."""
+        number = self._phones[index]
+        return str(number) if number else self._raw_phones.get(index, '')
+
+    def params(self, index: int) -> List[str]:
+        """Parámetros de la plantilla de la fila."""
+        return [column.values[column.codes[index]] for column in self._params]
+
+    def rows(
+        self,
+        start: int = 0,
+        step: int = 1,
+        skip: Optional[Callable[[int], bool]] = None,
+        stop: Optional[int] = None
+    ) -> Iterator[Row]:
+        """
+        Recorre las filas start, start+step, ... (hasta stop, sin incluirla) como
+        (índice, teléfono, parámetros). Con step > 1 cada proceso recorre su parte
+        sin copiar datos. Las filas para las que skip(índice) es True se saltan sin armarlas.
+        """
+        phones = self._phones
+        raw_phones = self._raw_phones
+        columns = [(column.values, column.codes) for column in self._params]
+
+        end = len(phones) if stop is None else min(stop, len(phones))
+        for index in range(start, end, step):
+            if skip is not None and skip(index):
+                continue
+            number = phones[index]
+            phone = str(number) if number else raw_phones.get(index, '')
+            yield index, phone, [values[codes[index]] for values, codes in columns]
+
+    def __iter__(self) -> Iterator[Row]:
+        return self.rows()
+
+    def column_stats(self) -> Tuple[List[str], List[List[str]], List[Counter]]:
+        """
+        (columnas, valores distintos de cada columna, filas por código de valor),
+        para revisar cada valor una sola vez en vez de fila por fila.
+        """
+        return (
+            self.columns,
+            [column.values for column in self._params],
+            [Counter(column.codes) for column in self._params],
+        )
+
+    def digest(self) -> bytes:
+        """
+        Huella del contenido (teléfonos y parámetros, fila por fila): cambia si el
+        archivo de destinatarios se edita aunque conserve la cantidad de filas.
+        """
+        digest = hashlib.sha256()
+        digest.update(json.dumps(self.columns, ensure_ascii=False).encode('utf-8'))
+        digest.update(self._phones)
+        for index, phone in sorted(self._raw_phones.items()):
+            digest.update(f"{index}:{phone}\0".encode('utf-8'))
+        for column in self._params:
+            digest.update(column.codes)
+            for value in column.values:
+                digest.update(value.encode('utf-8') + b'\0')
+        return digest.digest()
+
+    def nbytes(self) -> int:
+        """Bytes de los arrays (sin contar los valores únicos de cada columna)."""
+        return len(self._phones) * 8 + sum(len(column.codes) * 4 for column in self._params)
+
+    # ===============================
+    # 💾 ARCHIVO (MMAP)
+    # ===============================
+    def save(self, path: str) -> None:
+        """
+        Guarda el store en un archivo: cabecera JSON (columnas y tamaños) seguida
+        de los arrays alineados, los valores de cada columna y los teléfonos no
+        numéricos (offsets + bytes UTF-8).
+        """
+        raw_phones = sorted(self._raw_phones.items())
+        meta = {
+            'count': len(self._phones),
+            'columns': self.columns,
+            'distinct': [len(column.values) for column in self._params],
+            'raw_phones': len(raw_phones),
+        }
+        meta_bytes = json.dumps(meta, ensure_ascii=False).encode('utf-8')
+        meta_bytes += b' ' * (-(_HEADER.size + len(meta_bytes)) % _ALIGN)
+
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            file.write(_HEADER.pack(MAGIC, len(meta_bytes)))
+            file.write(meta_bytes)
+            file.write(self._phones)
+            for column in self._params:
+                file.write(column.codes)
+                file.write(b'\0' * (-file.tell() % _ALIGN))
+            for column in self._params:
+                _write_strings(file, column.values)
+            file.write(array('Q', [index for index, _ in raw_phones]))
+            _write_strings(file, (phone for _, phone in raw_phones))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def open(cls, path: str) -> 'RecipientStore':
+        """Abre un store guardado con save() usando mmap (solo lectura)."""
+        with open(path, 'rb') as file:
+            data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, meta_len = _HEADER.unpack_from(data, 0)
+        if magic != MAGIC:
+            data.close()
+            raise ValueError(f"{path} no es un archivo de destinatarios válido")
+
+        offset = _HEADER.size
+        meta = json.loads(bytes(data[offset:offset + meta_len]).decode('utf-8'))
+        offset += meta_len
+        count = meta['count']
+
+        store = cls(meta['columns'])
+        view = memoryview(data)
+        store._phones = view[offset:offset + count * 8].cast('Q')
+        offset += count * 8
+        codes = []
+        for _ in store.columns:
+            codes.append(view[offset:offset + count * 4].cast('I'))
+            offset += count * 4
+            offset += -offset % _ALIGN
+
+        for k, distinct in enumerate(meta['distinct']):
+            values, offset = _MappedStrings.read(view, offset, distinct)
+            if distinct <= MATERIALIZE_VALUES:
+                values = list(values)
+            store._params[k] = _Column(values, codes[k])
+        raw_count = meta['raw_phones']
+        indices = view[offset:offset + raw_count * 8].cast('Q')
+        phones, offset = _MappedStrings.read(view, offset + raw_count * 8, raw_count)
+        store._raw_phones = _MappedRawPhones(indices, phones)
+
+        store._mmap = data
+        store._path = path
+        return store
+
+    def __reduce_ex__(self, protocol):
+        # Entre procesos (spawn) se reabre el archivo en vez de copiar los datos
+        if self._path is not None:
+            return (RecipientStore.open, (self._path,))
+        return super().__reduce_ex__(protocol)
+
+
+def main():
+    """Función principal: convierte un CSV de destinatarios a un archivo .rcp"""
+    parser = argparse.ArgumentParser(
+        description='Convierte un CSV de destinatarios al formato compacto .rcp',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python recipient_store.py clientes.csv
+  python recipient_store.py clientes.csv --output=campania.rcp
+  python bulk_send.py clientes.rcp --tipo=utility --template=aviso --processes=4
+        """
+    )
+    parser.add_argument('csv', type=str, help='Archivo CSV con una columna phone')
+    parser.add_argument('--output', type=str, default=None, help='Archivo de salida (por defecto: <archivo>.rcp)')
+    args = parser.parse_args()
+
+    output = args.output or f"{os.path.splitext(args.csv)[0]}.rcp"
+    try:
+        store = RecipientStore.from_csv(args.csv)
+        store.save(output)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    print(f"✅ {len(store)} destinatarios guardados en {output}")
+    print(f"📦 Arrays: {store.nbytes() / 1e6:.1f} MB  Archivo: {os.path.getsize(output) / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+"""
+Transporte de grabación y reproducción (record/replay) para pruebas de rendimiento
+En modo grabación cada envío va a la Graph API de verdad y se guarda en un
+"cassette" (JSONL, comprimido si termina en .gz) el payload, el status, la
+respuesta y la latencia. En modo reproducción las respuestas se sirven desde un
+índice en memoria, esperando la latencia grabada (o escalada), sin tocar la red.
+Así los flujos de mandar_msg_v2.py se pueden medir en CI o en local con latencias
+realistas y resultados deterministas.
+
+- El access token nunca se escribe: el header Authorization no se graba y las
+  apariciones del token (o de access_token=...) en URLs y cuerpos se reemplazan.
+- Los errores de la API también se graban y se reproducen con el mismo mensaje
+  que lanzaría WhatsAppSender (incluido el código de error de Meta).
+- Una respuesta se busca por payload idéntico; si no hay, por tipo y plantilla;
+  si tampoco, en el orden del cassette. Las respuestas se reutilizan en ciclo.
+
+Solo los envíos de mensajes pasan por el transporte: las subidas de media y las
+consultas de plantillas siguen yendo a la API.
+
+Uso:
+    transport = RecordingTransport("flujo.jsonl.gz")
+    sender = WhatsAppSender(transport=transport)       # envía y graba
+    transport.close()
+
+    sender = WhatsAppSender(transport=ReplayTransport("flujo.jsonl.gz", speed=2))
+    WHATSAPP_REPLAY=flujo.jsonl.gz python mandar_msg_v2.py utility --direct
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import atexit
+import argparse
+import threading
+import requests
+from collections import Counter
+from typing import Optional, Dict, Any, List, Tuple
+from metrics import LatencyWindow
+from graph_errors import GraphAPIError
+from http_transport import default_timeout
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Texto que reemplaza a los tokens en el cassette
+REDACTED = '<REDACTED>'
+
+# Líneas acumuladas en memoria antes de escribirlas al archivo
+WRITE_BUFFER_LINES = 256
+
+_encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':'))
+_key_encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':'), sort_keys=True)
+
+# access_token=... en URLs (paginación de Graph) y tokens de Meta sueltos (EAA...)
+_TOKEN_PARAM = re.compile(r'(access_token=)[^&"\s]+')
+_META_TOKEN = re.compile(r'\bEAA[A-Za-z0-9]{20,}')
+
+
+def redact(text: str, token: Optional[str] = None) -> str:
+    """Reemplaza el token (y cualquier access_token=... o token EAA...) del texto."""
+    if token:
+        text = text.replace(token, REDACTED)
+    text = _TOKEN_PARAM.sub(r'\1' + REDACTED, text)
+    return _META_TOKEN.sub(REDACTED, text)
+
+
+def _open_cassette(path: str, mode: str):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', compresslevel=1)
+    return open(path, mode, encoding='utf-8')
+
+
+def _exact_key(url: str, payload: Dict[str, Any]) -> str:
+    # Sin el phone_number_id de la URL: un cassette sirve con otras credenciales
+    return url.rsplit('/', 1)[-1] + ' ' + _key_encoder.encode(payload)
+
+
+def _kind_key(payload: Dict[str, Any]) -> Tuple[str, str]:
+    template = payload.get('template') or {}
+    return payload.get('type', ''), template.get('name', '')
+
+
+def _api_error(error: str, detail: Any, status: int) -> GraphAPIError:
+    """El mismo error que lanza WhatsAppSender._post."""
+    error_msg = f"❌ Error enviando mensaje: {error}"
+    if detail is not None:
+        error_msg += f"\nDetalles: {detail}"
+    elif status:
+        error_msg += f"\nStatus Code: {status}"
+    return GraphAPIError(error_msg, status, detail)
+
+
+class RecordingTransport:
+    """
+    Transporte que envía cada mensaje a la API y lo graba en un cassette.
+
+    Solo graba los envíos de mensajes: upload_media no pasa por el transporte, así
+    que el flujo marketing con imagen local la sube a la API al grabar y también
+    al reproducir con ReplayTransport (para no tocar la red, usar una URL).
+
+    Args:
+        path: Archivo del cassette (.jsonl o .jsonl.gz)
+        session: Sesión HTTP a usar (por defecto una nueva, con keep-alive)
+        timeout: (conexión, lectura) en segundos; por defecto los del .env
+    """
+
+    def __init__(self, path: str, session: Optional[requests.Session] = None, timeout=None):
+        self.path = path
+        self.session = session or requests.Session()
+        self.timeout = timeout or default_timeout()
+        self.count = 0
+        self.errors = 0
+
+        self._file = _open_cassette(path, 'w')
+        self._buffer: List[str] = []
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def send(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Envía el payload, graba el intercambio y retorna la respuesta (o lanza su error)."""
+        start = time.perf_counter()
+        status, body, error, detail = 0, None, None, None
+        try:
+            response = self.session.post(url, headers=headers, json=payload, timeout=self.timeout)
+            status = response.status_code
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            error = str(e)
+            if getattr(e, 'response', None) is not None:
+                detail = body
+        latency = time.perf_counter() - start
+
+        token = headers.get('Authorization', '').rpartition(' ')[2]
+        record = {'url': url, 'payload': payload, 'status': status, 'latency': round(latency, 6)}
+        if error is None:
+            record['response'] = body
+        else:
+            record['error'] = error
+            record['detail'] = detail
+        self._write(redact(_encoder.encode(record), token))
+
+        if error is not None:
+            with self._lock:
+                self.errors += 1
+            raise _api_error(error, detail, status)
+        return body
+
+    def _write(self, line: str) -> None:
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("El cassette ya está cerrado")
+            self.count += 1
+            self._buffer.append(line)
+            if len(self._buffer) >= WRITE_BUFFER_LINES:
+                self._flush()
+
+    def _flush(self) -> None:
+        if self._buffer:
+            self._file.write('\n'.join(self._buffer) + '\n')
+            self._buffer.clear()
+
+    def close(self) -> None:
+        """Escribe lo pendiente y cierra el cassette."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._flush()
+            self._file.close()
+
+
+class _Entries:
+    """Respuestas grabadas para una misma clave, servidas en orden y en ciclo."""
+
+    __slots__ = ('items', 'next')
+
+    def __init__(self):
+        self.items: List[Dict[str, Any]] = []
+        self.next = 0
+
+    def take(self) -> Dict[str, Any]:
+        item = self.items[self.next]
+        self.next = (self.next + 1) % len(self.items)
+        return item
+
+
+class ReplayTransport:
+    """
+    Transporte que responde con lo grabado en un cassette, sin usar la red.
+    Excepción: upload_media (imagen local de marketing) sigue llamando a la API real.
+
+    Args:
+        path: Archivo del cassette grabado con RecordingTransport
+        speed: Factor de velocidad de las latencias (1 = original, 2 = el doble de
+            rápido, 0 = sin esperar)
+    """
+
+    def __init__(self, path: str, speed: float = 1.0):
+        if speed < 0:
+            raise ValueError("speed debe ser mayor o igual que 0")
+        self.path = path
+        self.speed = speed
+
+        self._exact: Dict[str, _Entries] = {}
+        self._kind: Dict[Tuple[str, str], _Entries] = {}
+        self._all = _Entries()
+        self.phone_number_id: Optional[str] = None
+
+        with _open_cassette(path, 'r') as file:
+            for line in file:
+                if line.strip():
+                    self._index(json.loads(line))
+        if not self._all.items:
+            raise ValueError(f"El cassette {path} no tiene envíos grabados")
+
+        self._lock = threading.Lock()
+        self.count = 0
+        self.exact_hits = 0
+
+    def _index(self, record: Dict[str, Any]) -> None:
+        url, payload = record['url'], record['payload']
+        if self.phone_number_id is None:
+            self.phone_number_id = url.rstrip('/').split('/')[-2]
+        self._exact.setdefault(_exact_key(url, payload), _Entries()).items.append(record)
+        self._kind.setdefault(_kind_key(payload), _Entries()).items.append(record)
+        self._all.items.append(record)
+
+    def credentials(self) -> Dict[str, str]:
+        """Credenciales para crear un WhatsAppSender sin .env (la red no se usa)."""
+        return {
+            'access_token': os.getenv('WHATSAPP_ACCESS_TOKEN') or REDACTED,
+            'phone_number_id': os.getenv('WHATSAPP_PHONE_NUMBER_ID') or self.phone_number_id,
+        }
+
+    def _lookup(self, url: str, payload: Dict[str, Any]) -> Tuple[Dict[str, Any], bool, int]:
+        """(registro grabado, si coincidió exacto, número de esta llamada)."""
+        with self._lock:
+            self.count += 1
+            entries = self._exact.get(_exact_key(url, payload))
+            if entries is not None:
+                self.exact_hits += 1
+                return entries.take(), True, self.count
+            entries = self._kind.get(_kind_key(payload)) or self._all
+            return entries.take(), False, self.count
+
+    def send(self, url: str, headers: Dict[str, str], payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Espera la latencia grabada y retorna la respuesta grabada (o lanza su error).
+        Cada llamada recibe un wamid propio (el grabado + ".r<n>"): los registros se
+        reutilizan, pero los resultados, checkpoints y la analítica necesitan ids únicos.
+        """
+        record, exact, number = self._lookup(url, payload)
+        if self.speed:
+            time.sleep(record.get('latency', 0) / self.speed)
+
+        if 'error' in record:
+            raise _api_error(record['error'], record.get('detail'), record.get('status', 0))
+
+        response = record.get('response')
+        if not isinstance(response, dict):
+            return response
+        if not exact and response.get('contacts'):
+            # Respuesta de otro destinatario: se ajusta al teléfono de este envío
+            to = payload.get('to', '')
+            response = dict(response, contacts=[{'input': to, 'wa_id': to}])
+        if response.get('messages'):
+            response = dict(response, messages=[
+                dict(message, id=f"{message.get('id', 'wamid.replay')}.r{number}")
+                for message in response['messages']
+            ])
+        return response
+
+    def close(self) -> None:
+        """Sin recursos que liberar (por simetría con los demás transportes)."""
+
+
+# Transporte configurado por variables de entorno (uno por proceso)
+_env_transport = None
+
+
+def transport_from_env():
+    """
+    RecordingTransport si WHATSAPP_RECORD indica un cassette, ReplayTransport si lo
+    indica WHATSAPP_REPLAY (con WHATSAPP_REPLAY_SPEED), o None.
+    """
+    global _env_transport
+    if _env_transport is None:
+        record_path = os.getenv('WHATSAPP_RECORD')
+        replay_path = os.getenv('WHATSAPP_REPLAY')
+        if record_path and replay_path:
+            raise ValueError("WHATSAPP_RECORD y WHATSAPP_REPLAY no se pueden usar a la vez")
+        if record_path:
+            _env_transport = RecordingTransport(record_path)
+            atexit.register(_env_transport.close)
+        elif replay_path:
+            _env_transport = ReplayTransport(replay_path, float(os.getenv('WHATSAPP_REPLAY_SPEED', '1')))
+    return _env_transport
+
+
+def summarize(path: str) -> Dict[str, Any]:
+    """Envíos, errores por status, tipos y percentiles de latencia de un cassette."""
+    window = LatencyWindow(size=1 << 20)
+    kinds: Counter = Counter()
+    statuses: Counter = Counter()
+    with _open_cassette(path, 'r') as file:
+        for line in file:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            window.record(record.get('latency', 0))
+            kinds['/'.join(filter(None, _kind_key(record['payload'])))] += 1
+            statuses[record.get('status', 0)] += 1
+    return {'count': window.count, 'statuses': dict(statuses), 'kinds': dict(kinds), **window.snapshot()}
+
+
+def main():
+    """Función principal: resume un cassette grabado"""
+    parser = argparse.ArgumentParser(
+        description='Muestra el contenido de un cassette de record/replay',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  WHATSAPP_RECORD=flujo.jsonl.gz python mandar_msg_v2.py utility --direct   # grabar
+  python mandar_msg_v2.py utility --replay=flujo.jsonl.gz --replay-speed=0  # reproducir
+  python record_replay.py flujo.jsonl.gz                                    # resumen
+        """
+    )
+    parser.add_argument('cassette', type=str, help='Archivo del cassette (.jsonl o .jsonl.gz)')
+    args = parser.parse_args()
+
+    try:
+        summary = summarize(args.cassette)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+    print(f"📼 {args.cassette}: {summary['count']} envíos grabados")
+    for status, count in sorted(summary['statuses'].items()):
+        print(f"   Status {status or 'sin respuesta'}: {count}")
+    for kind, count in sorted(summary['kinds'].items()):
+        print(f"   {kind}: {count}")
+    print(f"⏱️  Latencia p50={summary['p50_ms']} ms  p95={summary['p95_ms']} ms  p99={summary['p99_ms']} ms")
+
+
+if __name__ == "__main__":
+    main()
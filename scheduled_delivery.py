@@ -0,0 +1,413 @@
+"""
+Envíos programados (hora local del destinatario)
+Permite agendar millones de envíos a futuro, por ejemplo "entregar a las 10:00
+hora local", deduciendo la zona horaria desde el código de país del teléfono.
+
+- Los envíos pendientes viven en una rueda de tiempo jerárquica (inserción O(1)).
+- El estado se guarda en un journal (JSONL) que se reproduce al reiniciar.
+- Los envíos vencidos se liberan en ráfagas respetando el límite de mensajes
+  por segundo, sin consultar una base de datos periódicamente.
+
+Uso:
+    python scheduled_delivery.py add --phone=56912345678 --tipo=utility --template=aviso --at=10:00
+    python scheduled_delivery.py add-csv clientes.csv --tipo=utility --template=aviso --at=10:00
+    python scheduled_delivery.py list
+    python scheduled_delivery.py run
+"""
+
+import os
+import sys
+import json
+import time
+import heapq
+import uuid
+import argparse
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Tuple
+from dotenv import load_dotenv
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Cargar variables de entorno
+load_dotenv()
+
+DEFAULT_JOURNAL_PATH = os.getenv('SCHEDULE_JOURNAL', '.scheduled_messages.jsonl')
+
+# Zona horaria por código de país (se usa el prefijo más largo que coincida).
+# Para países con varias zonas se usa la de la capital.
+COUNTRY_TIMEZONES = {
+    '1': 'America/New_York',
+    '34': 'Europe/Madrid',
+    '44': 'Europe/London',
+    '51': 'America/Lima',
+    '52': 'America/Mexico_City',
+    '53': 'America/Havana',
+    '54': 'America/Argentina/Buenos_Aires',
+    '55': 'America/Sao_Paulo',
+    '56': 'America/Santiago',
+    '57': 'America/Bogota',
+    '58': 'America/Caracas',
+    '502': 'America/Guatemala',
+    '503': 'America/El_Salvador',
+    '504': 'America/Tegucigalpa',
+    '505': 'America/Managua',
+    '506': 'America/Costa_Rica',
+    '507': 'America/Panama',
+    '591': 'America/La_Paz',
+    '593': 'America/Guayaquil',
+    '595': 'America/Asuncion',
+    '598': 'America/Montevideo',
+}
+
+DEFAULT_TIMEZONE = os.getenv('SCHEDULE_DEFAULT_TZ', 'America/Santiago')
+
+
+def timezone_for_phone(phone: str) -> str:
+    """Zona horaria IANA deducida del código de país del teléfono."""
+    digits = phone.replace(' ', '').replace('-', '').replace('+', '')
+    for length in (3, 2, 1):
+        tz = COUNTRY_TIMEZONES.get(digits[:length])
+        if tz:
+            return tz
+    return DEFAULT_TIMEZONE
+
+
+def local_send_time(phone: str, at: str, after: Optional[float] = None) -> float:
+    """
+    Próximo instante (epoch) en que son las `at` (HH:MM) en la hora local del teléfono.
+    """
+    if ZoneInfo is None:
+        raise RuntimeError("La hora local del destinatario requiere Python 3.9+ (zoneinfo)")
+
+    hour, minute = (int(part) for part in at.split(':'))
+    tz = ZoneInfo(timezone_for_phone(phone))
+    now = datetime.fromtimestamp(after if after is not None else time.time(), tz)
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target = (target + timedelta(days=1)).replace(hour=hour, minute=minute)
+    return target.timestamp()
+
+
+# ===============================
+# ⏱️ RUEDA DE TIEMPO JERÁRQUICA
+# ===============================
+class TimingWheel:
+    """
+    Rueda de tiempo jerárquica con resolución de 1 tick (1 segundo).
+
+    Cuatro niveles de 256/64/64/64 ranuras cubren ~2 años; lo que queda más lejos
+    espera en un heap. Insertar es O(1); avanzar cuesta O(1) por tick más el
+    costo de bajar de nivel cada elemento (a lo sumo una vez por nivel).
+    """
+
+    def __init__(self, current_tick: int, bits: Tuple[int, ...] = (8, 6, 6, 6)):
+        self.bits = bits
+        self.current = current_tick
+        self.levels = [[[] for _ in range(1 << b)] for b in bits]
+        self._span = 1 << sum(bits)
+        self._overflow: List[Tuple[int, int, Any]] = []
+        self._seq = 0
+        self._ready: List[Any] = []
+        self.size = 0
+
+    def add(self, tick: int, item: Any) -> None:
+        self.size += 1
+        self._place(tick, item)
+
+    def _place(self, tick: int, item: Any) -> None:
+        if tick <= self.current:
+            self._ready.append(item)
+            return
+
+        delta = tick - self.current
+        shift = 0
+        for level, bits in enumerate(self.bits):
+            if delta < (1 << (shift + bits)):
+                slot = (tick >> shift) & ((1 << bits) - 1)
+                self.levels[level][slot].append((tick, item))
+                return
+            shift += bits
+
+        self._seq += 1
+        heapq.heappush(self._overflow, (tick, self._seq, item))
+
+    def advance(self, to_tick: int) -> List[Any]:
+        """Avanza hasta to_tick y retorna los elementos vencidos."""
+        due = self._ready
+        self._ready = []
+
+        while self.current < to_tick:
+            self.current += 1
+
+            # Bajar de nivel las ranuras cuyo intervalo empieza ahora
+            shift = self.bits[0]
+            for level in range(1, len(self.bits)):
+                if self.current & ((1 << shift) - 1):
+                    break
+                slot = (self.current >> shift) & ((1 << self.bits[level]) - 1)
+                bucket = self.levels[level][slot]
+                if bucket:
+                    self.levels[level][slot] = []
+                    for tick, item in bucket:
+                        self._place(tick, item)
+                shift += self.bits[level]
+
+            while self._overflow and self._overflow[0][0] - self.current < self._span:
+                tick, _, item = heapq.heappop(self._overflow)
+                self._place(tick, item)
+
+            slot = self.current & ((1 << self.bits[0]) - 1)
+            bucket = self.levels[0][slot]
+            if bucket:
+                self.levels[0][slot] = []
+                due.extend(item for _, item in bucket)
+
+            if self._ready:
+                due.extend(self._ready)
+                self._ready = []
+
+        self.size -= len(due)
+        return due
+
+
+# ===============================
+# 📅 AGENDA PERSISTENTE
+# ===============================
+class ScheduledDelivery:
+    """
+    Agenda de envíos con journal en disco.
+
+    Cada envío guarda el teléfono, los parámetros y la definición del mensaje en el
+    mismo formato que bulk_send.py (tipo, template, language, image, message).
+    """
+
+    def __init__(self, journal_path: str = DEFAULT_JOURNAL_PATH, compact: bool = False):
+        """
+        compact=True reescribe el journal al cargarlo; solo debe usarlo el proceso
+        que libera los envíos (run), nunca mientras otro proceso lo esté usando.
+        """
+        self.journal_path = journal_path
+        self.wheel = TimingWheel(int(time.time()))
+        self.pending: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self._offset = 0
+
+        if os.path.exists(journal_path):
+            self._replay()
+            if compact:
+                self.compact()
+        self._journal = open(journal_path, 'a', encoding='utf-8')
+
+    def _replay(self) -> None:
+        """Reconstruye la agenda desde el journal (agregados menos completados)."""
+        with open(self.journal_path, encoding='utf-8') as file:
+            for line in file:
+                self._apply(line)
+            self._offset = file.tell()
+
+    def _apply(self, line: str) -> None:
+        line = line.strip()
+        if not line:
+            return
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return  # Línea incompleta (ej. corte durante la escritura)
+
+        if record['op'] == 'add':
+            if record['id'] not in self.pending:
+                self.pending[record['id']] = record
+                self.wheel.add(int(record['due']), record['id'])
+        elif record['op'] in ('done', 'cancel'):
+            self.pending.pop(record['id'], None)
+
+    def poll_journal(self) -> None:
+        """Incorpora los envíos agregados al journal por otros procesos."""
+        with self._lock:
+            with open(self.journal_path, 'rb') as file:
+                file.seek(self._offset)
+                for raw in file:
+                    if not raw.endswith(b'\n'):
+                        break  # línea aún incompleta: se lee en el próximo poll
+                    self._offset += len(raw)
+                    self._apply(raw.decode('utf-8'))
+
+    def compact(self) -> None:
+        """Reescribe el journal dejando solo los envíos pendientes."""
+        tmp_path = f"{self.journal_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as file:
+            for record in self.pending.values():
+                file.write(json.dumps(record) + '\n')
+            self._offset = file.tell()
+        os.replace(tmp_path, self.journal_path)
+
+    def _write(self, record: Dict[str, Any]) -> None:
+        self._journal.write(json.dumps(record) + '\n')
+        self._journal.flush()
+
+    def add(self, phone: str, job: Dict[str, Any], due: float, params: Optional[List[str]] = None) -> str:
+        """Agenda un envío para el instante `due` (epoch). Retorna su id."""
+        record = {
+            'op': 'add',
+            'id': uuid.uuid4().hex,
+            'due': due,
+            'phone': phone,
+            'params': params or [],
+            'job': job,
+        }
+        with self._lock:
+            self._write(record)
+            self.pending[record['id']] = record
+            self.wheel.add(int(due), record['id'])
+        return record['id']
+
+    def add_local(self, phone: str, job: Dict[str, Any], at: str, params: Optional[List[str]] = None) -> str:
+        """Agenda un envío para la próxima vez que sean las `at` (HH:MM) en la hora del destinatario."""
+        return self.add(phone, job, local_send_time(phone, at), params)
+
+    def cancel(self, message_id: str) -> bool:
+        with self._lock:
+            if self.pending.pop(message_id, None) is None:
+                return False
+            self._write({'op': 'cancel', 'id': message_id})
+            return True
+
+    def due(self, now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Retorna los envíos vencidos (los cancelados se descartan)."""
+        with self._lock:
+            ids = self.wheel.advance(int(now if now is not None else time.time()))
+            return [self.pending[i] for i in ids if i in self.pending]
+
+    def mark_done(self, message_id: str, status: str, detail: str = '') -> None:
+        with self._lock:
+            if self.pending.pop(message_id, None) is not None:
+                self._write({'op': 'done', 'id': message_id, 'status': status, 'detail': detail})
+
+    def close(self) -> None:
+        self._journal.close()
+
+    # ===============================
+    # 🚀 LIBERACIÓN DE ENVÍOS
+    # ===============================
+    def run(self, sender, rate: float = 80, workers: int = 8, stop: Optional[threading.Event] = None) -> None:
+        """
+        Libera los envíos vencidos hacia el sender en ráfagas limitadas a `rate`
+        mensajes por segundo, hasta que se active `stop`.
+        """
+        from bulk_send import send_one
+        from send_result import message_id_of
+        from rate_limit import TokenBucket
+
+        stop = stop or threading.Event()
+        bucket = TokenBucket(rate)
+
+        def deliver(record):
+            try:
+                result = send_one(sender, record['job'], record['phone'], record['params'])
+                message_id = message_id_of(result, '')
+                self.mark_done(record['id'], 'ok', message_id)
+                print(f"✅ {record['phone']} - ID: {message_id}")
+            except Exception as e:
+                self.mark_done(record['id'], 'error', str(e))
+                print(f"❌ {record['phone']} - {e}")
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while not stop.is_set():
+                self.poll_journal()
+                for record in self.due():
+                    bucket.acquire()
+                    executor.submit(deliver, record)
+                stop.wait(max(0.0, 1.0 - (time.time() % 1.0)))
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Agenda envíos de WhatsApp para más tarde (hora local del destinatario)',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python scheduled_delivery.py add --phone=56912345678 --tipo=utility --template=aviso --at=10:00
+  python scheduled_delivery.py add-csv clientes.csv --tipo=marketing --template=promo --at=10:00
+  python scheduled_delivery.py list
+  python scheduled_delivery.py run --rate=20
+
+--at es la hora local del destinatario (según el código de país del teléfono).
+        """
+    )
+
+    parser.add_argument('comando', choices=['add', 'add-csv', 'list', 'run'], help='Acción a realizar')
+    parser.add_argument('recipients', nargs='?', default=None, help='CSV de destinatarios (solo add-csv)')
+    parser.add_argument('--phone', type=str, default=None, help='Teléfono del destinatario (solo add)')
+    parser.add_argument('--params', nargs='*', default=None, help='Parámetros de la plantilla (solo add)')
+    parser.add_argument('--tipo', choices=['text', 'auth', 'utility', 'marketing', 'service'], default='utility')
+    parser.add_argument('--template', type=str, default=None, help='Nombre de la plantilla')
+    parser.add_argument('--lang', type=str, default='es', help='Código de idioma (por defecto: es)')
+    parser.add_argument('--message', type=str, default=None, help='Texto para --tipo=text')
+    parser.add_argument('--image', type=str, default=None, help='URL pública de la imagen del header (marketing)')
+    parser.add_argument('--at', type=str, default=None, help='Hora local del destinatario (HH:MM)')
+    parser.add_argument('--rate', type=float, default=80, help='Mensajes por segundo al liberar (solo run)')
+    parser.add_argument('--journal', type=str, default=DEFAULT_JOURNAL_PATH, help='Archivo del journal')
+
+    args = parser.parse_args()
+    schedule = ScheduledDelivery(args.journal, compact=args.comando == 'run')
+
+    job = {
+        'tipo': args.tipo,
+        'template': args.template,
+        'language': args.lang,
+        'image': args.image,
+        'message': args.message,
+    }
+
+    try:
+        if args.comando in ('add', 'add-csv') and not args.at:
+            parser.error(f"{args.comando} requiere --at=HH:MM")
+
+        if args.comando == 'add':
+            if not args.phone:
+                parser.error("add requiere --phone")
+            message_id = schedule.add_local(args.phone, job, args.at, args.params)
+            due = schedule.pending[message_id]['due']
+            print(f"📅 Agendado {message_id} para {datetime.fromtimestamp(due):%Y-%m-%d %H:%M} (hora de este equipo)")
+
+        elif args.comando == 'add-csv':
+            from bulk_send import load_recipients
+            if not args.recipients:
+                parser.error("add-csv requiere el archivo CSV")
+            count = 0
+            for phone, params in load_recipients(args.recipients):
+                schedule.add_local(phone, job, args.at, params)
+                count += 1
+            print(f"📅 {count} envíos agendados para las {args.at} hora local de cada destinatario")
+
+        elif args.comando == 'list':
+            print(f"📋 Envíos pendientes: {len(schedule.pending)}")
+            for record in sorted(schedule.pending.values(), key=lambda r: r['due'])[:50]:
+                when = datetime.fromtimestamp(record['due'])
+                print(f"  {when:%Y-%m-%d %H:%M}  {record['phone']}  {record['job'].get('template') or record['job']['tipo']}")
+
+        elif args.comando == 'run':
+            from sender_pool import SenderPool
+            print(f"🚀 Liberando envíos programados ({len(schedule.pending)} pendientes)")
+            print("🛑 Presiona Ctrl+C para detener")
+            try:
+                schedule.run(SenderPool.from_env(), rate=args.rate)
+            except KeyboardInterrupt:
+                print("\n⏹️  Detenido")
+    finally:
+        schedule.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Resultado compacto de un envío a WhatsApp Business API
+Evita decodificar y guardar la respuesta JSON completa de cada mensaje: los
+campos útiles se leen directamente de los bytes de la respuesta.
+"""
+
+import re
+import json
+from typing import Optional, Dict, Any, Union
+
+# Campos de la respuesta de /messages que se leen directo de los bytes
+_MESSAGE_ID_RE = re.compile(rb'"messages"\s*:\s*\[\s*\{[^}]*?"id"\s*:\s*"([^"]+)"')
+_WA_ID_RE = re.compile(rb'"wa_id"\s*:\s*"([^"]+)"')
+_MESSAGE_STATUS_RE = re.compile(rb'"message_status"\s*:\s*"([^"]+)"')
+
+
+class SendResult:
+    """
+    Resultado compacto de un envío: wamid, wa_id, message_status y latencia (s).
+    La respuesta completa solo se guarda con keep_raw=True; si no, .raw es None y
+    .get() falla con ValueError.
+    """
+
+    __slots__ = ('message_id', 'wa_id', 'message_status', 'latency', '_raw')
+
+    def __init__(
+        self,
+        message_id: Optional[str],
+        wa_id: Optional[str] = None,
+        message_status: Optional[str] = None,
+        latency: float = 0.0,
+        raw: Union[bytes, Dict[str, Any], None] = None
+    ):
+        self.message_id = message_id
+        self.wa_id = wa_id
+        self.message_status = message_status
+        self.latency = latency
+        self._raw = raw
+
+    @classmethod
+    def from_bytes(cls, body: bytes, latency: float = 0.0, keep_raw: bool = False) -> 'SendResult':
+        """
+        Lee los campos directamente del cuerpo de la respuesta, sin decodificar el JSON.
+        keep_raw=True guarda el cuerpo para decodificarlo si se pide .raw.
+        """
+        message_id = _MESSAGE_ID_RE.search(body)
+        if message_id is None:
+            return cls.from_dict(json.loads(body), latency, keep_raw)
+
+        wa_id = _WA_ID_RE.search(body)
+        status = _MESSAGE_STATUS_RE.search(body)
+        return cls(
+            message_id.group(1).decode('ascii'),
+            wa_id.group(1).decode('ascii') if wa_id else None,
+            status.group(1).decode('ascii') if status else None,
+            latency,
+            body if keep_raw else None
+        )
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], latency: float = 0.0, keep_raw: bool = False) -> 'SendResult':
+        """Crea el resultado desde una respuesta ya decodificada (ej. de un transporte)."""
+        message = (data.get('messages') or [{}])[0]
+        contact = (data.get('contacts') or [{}])[0]
+        return cls(
+            message.get('id'), contact.get('wa_id'), message.get('message_status'), latency,
+            data if keep_raw else None
+        )
+
+    @property
+    def raw(self) -> Optional[Dict[str, Any]]:
+        """Respuesta completa de la API, o None si no se guardó (keep_raw=False)."""
+        if isinstance(self._raw, (bytes, bytearray)):
+            self._raw = json.loads(self._raw)
+        return self._raw
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Campo de la respuesta completa, como en el dict; requiere keep_raw=True."""
+        raw = self.raw
+        if raw is None:
+            raise ValueError("La respuesta completa no se guardó: crea el sender con keep_raw=True")
+        return raw.get(key, default)
+
+    def __repr__(self) -> str:
+        return (
+            f"SendResult(message_id={self.message_id!r}, wa_id={self.wa_id!r}, "
+            f"message_status={self.message_status!r}, latency={self.latency:.3f})"
+        )
+
+
+def message_id_of(result: Union[SendResult, Dict[str, Any]], default: str = 'N/A') -> str:
+    """wamid de un envío, sea un SendResult o la respuesta JSON como dict."""
+    if isinstance(result, SendResult):
+        return result.message_id or default
+    return (result.get('messages') or [{}])[0].get('id', default)
@@ -0,0 +1,123 @@
+"""
+Base de los planificadores de envíos (priority_scheduler.py, tenant_scheduler.py)
+Los dos ponen colas delante de un WhatsAppSender (o SenderPool) y solo difieren
+en cómo eligen el próximo envío. Lo común vive aquí:
+
+- Hilos de envío, Futures, cierre y límite de tasa global (TokenBucket).
+- Un envío cancelado se descarta antes de tomar su token: no gasta cupo.
+- Los métodos send_* de WhatsAppSender, que encolan y esperan el resultado.
+
+Una subclase guarda sus colas bajo self._cond e implementa _pick(); puede
+además reservar parte del límite de tasa (_reserve) y llevar métricas (_record).
+"""
+
+import time
+import threading
+from concurrent.futures import Future
+from typing import Optional, Any, Tuple, List, Callable
+from rate_limit import TokenBucket
+
+
+class SendScheduler:
+    """
+    Hilos que despachan los envíos encolados por una subclase.
+
+    Args:
+        sender: Objeto con los métodos send_* de WhatsAppSender
+        rate: Mensajes por segundo permitidos (todos los envíos)
+    """
+
+    def __init__(self, sender, rate: float):
+        self.sender = sender
+        self.bucket = TokenBucket(rate)
+        self._cond = threading.Condition()
+        self._closed = False
+        self._threads: List[threading.Thread] = []
+
+    def _start_workers(self, groups: List[tuple]) -> None:
+        """Un hilo por elemento de groups; cada hilo pasa su tupla a _pick()."""
+        self._threads = [threading.Thread(target=self._worker, args=group, daemon=True) for group in groups]
+        for thread in self._threads:
+            thread.start()
+
+    @staticmethod
+    def _item(method: str, args: tuple, kwargs: dict) -> Tuple[str, tuple, dict, Future, float]:
+        """Envío encolado: (método, args, kwargs, Future, instante en que se encoló)."""
+        return method, args, kwargs, Future(), time.monotonic()
+
+    def close(self, wait: bool = True) -> None:
+        """Deja de aceptar envíos; con wait=True espera a que se vacíen las colas."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    # ===============================
+    # ⚙️ DESPACHO
+    # ===============================
+    def _pick(self, *group) -> Tuple[Any, Optional[tuple], Optional[float]]:
+        """
+        (cola, envío, None) con el próximo envío, o (None, None, espera): segundos a
+        esperar antes de volver a intentar, o None si no hay trabajo. Se llama con
+        self._cond tomado.
+        """
+        raise NotImplementedError
+
+    def _reserve(self, queue: Any) -> float:
+        """Tokens que el envío de esta cola debe dejar libres en el límite de tasa."""
+        return 0.0
+
+    def _record(self, queue: Any, ok: bool, latency: float, now: float) -> None:
+        """Métricas de un envío terminado (con self._cond tomado)."""
+
+    def _worker(self, *group) -> None:
+        while True:
+            with self._cond:
+                queue, item, wait = self._pick(*group)
+                while queue is None:
+                    if self._closed and wait is None:
+                        return
+                    self._cond.wait(wait)
+                    queue, item, wait = self._pick(*group)
+            method, args, kwargs, future, enqueued = item
+
+            # Se marca en curso antes de tomar el token: un envío cancelado no gasta cupo
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.bucket.acquire(reserve=self._reserve(queue))
+            try:
+                result = getattr(self.sender, method)(*args, **kwargs)
+                ok = True
+            except Exception as e:
+                result = e
+                ok = False
+
+            now = time.monotonic()
+            with self._cond:
+                self._record(queue, ok, now - enqueued, now)
+
+            if ok:
+                future.set_result(result)
+            else:
+                future.set_exception(result)
+
+
+class SchedulerSender:
+    """
+    Métodos send_* de WhatsAppSender que encolan con submit(name, *args, **kwargs)
+    y esperan el resultado.
+    """
+
+    def __init__(self, submit: Callable[..., Future]):
+        self._submit = submit
+
+    def __getattr__(self, name: str):
+        if not name.startswith('send_'):
+            raise AttributeError(name)
+
+        def method(*args, **kwargs):
+            return self._submit(name, *args, **kwargs).result()
+
+        return method
@@ -0,0 +1,523 @@
+"""
+Servicio HTTP local de envío de WhatsApp
+Permite que servicios en otros lenguajes envíen mensajes sin ejecutar
+mandar_msg_v2.py: los envíos se encolan por HTTP y un grupo de hilos los manda
+con el SenderPool (conexiones calientes, límite de tasa por número).
+
+Endpoints (JSON compacto):
+    POST /messages            Un envío: {"method": "send_utility_template",
+                              "args": ["569...", "aviso", ["Ana"]], "kwargs": {},
+                              "ref": "pedido-1", "callback_url": "http://..."}
+                              -> 202 {"id": ...}; con ?wait=1 espera y responde
+                              200 con el message_id (o 502 con el error)
+    POST /messages/batch      Arreglo JSON o NDJSON (Content-Type:
+                              application/x-ndjson, se lee línea a línea, también
+                              con Transfer-Encoding: chunked); ?callback=url se
+                              aplica a todos -> 202 {"accepted", "ids", "rejected"}
+    GET  /messages/<id>       Estado: queued | sent (message_id) | failed (error)
+    GET  /health              Cola, contadores y latencia p50/p95/p99
+
+- Prioridad: la cola se atiende por los carriles de priority_scheduler.py. Los
+  OTP (send_authentication_template) pasan antes que los textos y plantillas
+  utility/service, y estos antes que marketing, aunque haya un lote grande en
+  cola; dentro de un carril, en orden de llegada.
+- Contrapresión: si la cola interna está llena se responde 429 con Retry-After.
+  En un lote se aceptan los envíos hasta llenar la cola; la respuesta indica
+  cuántos se aceptaron ("accepted") y el cliente reintenta desde ahí.
+- Los message_id se consultan con GET /messages/<id> o llegan por callback (un
+  POST con {"id", "ref", "status", "message_id", "error"}).
+- Escucha en 127.0.0.1; con WHATSAPP_SERVICE_TOKEN se exige
+  "Authorization: Bearer <token>".
+
+Uso: python send_service.py [--port=8088] [--workers=32] [--queue-size=100000]
+"""
+
+import os
+import sys
+import hmac
+import json
+import time
+import queue
+import argparse
+import threading
+import requests
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+from typing import Optional, Dict, Any, List, Tuple, Iterator
+from dotenv import load_dotenv
+from sender_daemon import ALLOWED_METHODS
+from priority_scheduler import LANES, METHOD_LANES
+from send_result import message_id_of
+from metrics import LatencyWindow
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Cargar variables de entorno
+load_dotenv()
+
+DEFAULT_HOST = os.getenv('WHATSAPP_SERVICE_HOST', '127.0.0.1')
+DEFAULT_PORT = int(os.getenv('WHATSAPP_SERVICE_PORT', '8088'))
+
+# Métodos que se pueden encolar (solo envíos)
+SEND_METHODS = frozenset(method for method in ALLOWED_METHODS if method.startswith('send_'))
+
+# Envíos encolados como máximo antes de responder 429
+DEFAULT_QUEUE_SIZE = 100000
+
+# Estados de envío que se recuerdan para GET /messages/<id> (los más recientes)
+MAX_RESULTS = 1 << 20
+
+# Tamaño máximo del cuerpo de un envío individual (bytes)
+MAX_BODY_BYTES = 1 << 20
+
+# Segundos que se sugiere esperar tras un 429
+RETRY_AFTER = 1
+
+# Orden de atención de cada carril (0 = primero)
+_LANE_RANK = {lane: rank for rank, lane in enumerate(LANES)}
+
+_encoder = json.JSONEncoder(ensure_ascii=False, check_circular=False, separators=(',', ':'))
+
+
+class _Job:
+    """Un envío encolado."""
+
+    __slots__ = ('id', 'method', 'args', 'kwargs', 'ref', 'callback_url', 'future', 'enqueued')
+
+    def __init__(self, job_id: str, method: str, args: list, kwargs: dict,
+                 ref: Any, callback_url: Optional[str], future: Optional[Future]):
+        self.id = job_id
+        self.method = method
+        self.args = args
+        self.kwargs = kwargs
+        self.ref = ref
+        self.callback_url = callback_url
+        self.future = future
+        self.enqueued = time.monotonic()
+
+
+def parse_item(item: Any) -> Tuple[str, list, dict]:
+    """Valida un envío {"method", "args", "kwargs"} y retorna sus partes."""
+    if not isinstance(item, dict):
+        raise ValueError("cada envío debe ser un objeto JSON")
+    method = item.get('method')
+    if method not in SEND_METHODS:
+        raise ValueError(f"Método no permitido: {method}")
+    args = item.get('args') or []
+    kwargs = item.get('kwargs') or {}
+    if not isinstance(args, list) or not isinstance(kwargs, dict):
+        raise ValueError("args debe ser un arreglo y kwargs un objeto")
+    if not args and 'to' not in kwargs:
+        raise ValueError("falta el destinatario (primer elemento de args)")
+    return method, args, kwargs
+
+
+class SendService:
+    """
+    Cola acotada de envíos atendida por hilos, con estados y callbacks.
+
+    Args:
+        sender: Objeto con los métodos send_* (por defecto SenderPool.from_env() con
+            validate='reject': los payloads inválidos fallan sin llegar a la API)
+        workers: Hilos de envío
+        queue_size: Envíos encolados como máximo (contrapresión)
+        max_results: Estados de envío que se recuerdan
+    """
+
+    def __init__(self, sender=None, workers: int = 32, queue_size: int = DEFAULT_QUEUE_SIZE,
+                 max_results: int = MAX_RESULTS):
+        if sender is None:
+            from sender_pool import SenderPool
+            sender = SenderPool.from_env(typed_results=True, validate='reject')
+
+        self.sender = sender
+        self.max_results = max_results
+        # (carril, orden de llegada, envío): los carriles prioritarios salen primero
+        self._queue: "queue.PriorityQueue[Tuple[int, int, Optional[_Job]]]" = queue.PriorityQueue(maxsize=queue_size)
+        self._results: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # Prefijo por arranque: los ids no se repiten entre reinicios
+        self._prefix = os.urandom(4).hex()
+        self._counter = 0
+
+        self._callbacks = ThreadPoolExecutor(max_workers=4)
+        self._callback_session = requests.Session()
+
+        self.latency = LatencyWindow()
+        self.accepted = 0
+        self.throttled = 0
+        self.sent = 0
+        self.failed = 0
+        self.callback_errors = 0
+
+        self._threads = [threading.Thread(target=self._worker, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    # ===============================
+    # 📥 ENCOLAR
+    # ===============================
+    def submit(self, method: str, args: list, kwargs: dict, ref: Any = None,
+               callback_url: Optional[str] = None, wait: bool = False) -> _Job:
+        """Encola un envío; lanza queue.Full si la cola está llena."""
+        with self._lock:
+            self._counter += 1
+            number = self._counter
+            job_id = f"{self._prefix}-{number}"
+            # Antes de encolar: un hilo puede terminar el envío antes de que submit retorne
+            self._remember(job_id, {'id': job_id, 'ref': ref, 'status': 'queued'})
+        job = _Job(job_id, method, args, kwargs, ref, callback_url, Future() if wait else None)
+
+        try:
+            self._queue.put_nowait((_LANE_RANK[METHOD_LANES[method]], number, job))
+        except queue.Full:
+            with self._lock:
+                self.throttled += 1
+                self._results.pop(job_id, None)
+            raise
+
+        with self._lock:
+            self.accepted += 1
+        return job
+
+    def _remember(self, job_id: str, state: Dict[str, Any]) -> None:
+        self._results[job_id] = state
+        self._results.move_to_end(job_id)
+        if len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Estado del envío, o None si no existe (o ya se olvidó)."""
+        with self._lock:
+            return self._results.get(job_id)
+
+    # ===============================
+    # ⚙️ ENVÍO
+    # ===============================
+    def _worker(self) -> None:
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                return
+
+            state = {'id': job.id, 'ref': job.ref}
+            try:
+                result = getattr(self.sender, job.method)(*job.args, **job.kwargs)
+                state.update(status='sent', message_id=message_id_of(result, None))
+            except Exception as e:
+                state.update(status='failed', error=str(e))
+            self.latency.record(time.monotonic() - job.enqueued)
+
+            with self._lock:
+                if state['status'] == 'sent':
+                    self.sent += 1
+                else:
+                    self.failed += 1
+                self._remember(job.id, state)
+
+            if job.future is not None:
+                job.future.set_result(state)
+            if job.callback_url:
+                self._callbacks.submit(self._callback, job.callback_url, state)
+
+    def _callback(self, url: str, state: Dict[str, Any]) -> None:
+        try:
+            self._callback_session.post(url, json=state, timeout=10).raise_for_status()
+        except requests.exceptions.RequestException as e:
+            with self._lock:
+                self.callback_errors += 1
+            print(f"⚠️  No se pudo avisar a {url}: {e}")
+
+    def close(self) -> None:
+        """Envía lo encolado, detiene los hilos y espera los callbacks pendientes."""
+        # Después de todos los carriles: primero se envía lo encolado
+        for number, _ in enumerate(self._threads):
+            self._queue.put((len(LANES), number, None))
+        for thread in self._threads:
+            thread.join()
+        self._callbacks.shutdown(wait=True)
+
+    def health(self) -> Dict[str, Any]:
+        """Cola, contadores y latencia desde que se encola hasta que responde la API."""
+        with self._lock:
+            result = {
+                'queued': self._queue.qsize(),
+                'queue_size': self._queue.maxsize,
+                'accepted': self.accepted,
+                'throttled': self.throttled,
+                'sent': self.sent,
+                'failed': self.failed,
+                'callback_errors': self.callback_errors,
+            }
+        result.update(self.latency.snapshot())
+        return result
+
+
+# ===============================
+# 🌐 HTTP
+# ===============================
+class _Handler(BaseHTTPRequestHandler):
+    """Endpoints del servicio (HTTP/1.1 con keep-alive)."""
+
+    protocol_version = 'HTTP/1.1'
+    server_version = 'WhatsAppSendService/1.0'
+    # Cabeceras y cuerpo salen en escrituras separadas: sin Nagle no esperan el ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        # Miles de peticiones por segundo: sin una línea de log por petición
+        pass
+
+    def _reply(self, status: int, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        data = _encoder.encode(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _throttled(self, extra: Optional[Dict[str, Any]] = None) -> None:
+        body = {'error': 'cola llena, reintentar más tarde', 'retry_after': RETRY_AFTER}
+        body.update(extra or {})
+        self._reply(429, body, {'Retry-After': str(RETRY_AFTER)})
+
+    def _authorized(self) -> bool:
+        token = self.server.token
+        if not token:
+            return True
+        header = self.headers.get('Authorization', '')
+        if hmac.compare_digest(header.encode('utf-8'), f'Bearer {token}'.encode('utf-8')):
+            return True
+        self._reply(401, {'error': 'token inválido'})
+        return False
+
+    def _body_chunks(self) -> Iterator[bytes]:
+        """Cuerpo de la petición en trozos (Content-Length o chunked)."""
+        if 'chunked' in self.headers.get('Transfer-Encoding', '').lower():
+            while True:
+                size = int(self.rfile.readline().split(b';', 1)[0].strip() or b'0', 16)
+                if size == 0:
+                    # Trailers opcionales hasta la línea vacía
+                    while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    return
+                # Un trozo enorme también se lee de a poco: quien consume puede cortar antes
+                while size > 0:
+                    chunk = self.rfile.read(min(size, 1 << 16))
+                    if not chunk:
+                        return
+                    size -= len(chunk)
+                    yield chunk
+                self.rfile.readline()
+        else:
+            remaining = int(self.headers.get('Content-Length') or 0)
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining, 1 << 16))
+                if not chunk:
+                    return
+                remaining -= len(chunk)
+                yield chunk
+
+    def _read_body(self, limit: int) -> Optional[bytes]:
+        """Cuerpo completo, o None apenas supera limit bytes (también con chunked)."""
+        chunks = []
+        size = 0
+        for chunk in self._body_chunks():
+            size += len(chunk)
+            if size > limit:
+                return None
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def _body_lines(self) -> Iterator[bytes]:
+        """Líneas NDJSON del cuerpo, a medida que llegan."""
+        pending = b''
+        for chunk in self._body_chunks():
+            pending += chunk
+            *lines, pending = pending.split(b'\n')
+            yield from lines
+        yield pending
+
+    def do_GET(self):
+        if not self._authorized():
+            return
+        path = urlsplit(self.path).path
+        if path == '/health':
+            self._reply(200, self.server.service.health())
+        elif path.startswith('/messages/'):
+            state = self.server.service.status(path[len('/messages/'):])
+            if state is None:
+                self._reply(404, {'error': 'envío no encontrado'})
+            else:
+                self._reply(200, state)
+        else:
+            self._reply(404, {'error': 'ruta no encontrada'})
+
+    def do_POST(self):
+        if not self._authorized():
+            self.close_connection = True
+            return
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        if url.path == '/messages':
+            self._post_single(query)
+        elif url.path == '/messages/batch':
+            self._post_batch(query)
+        else:
+            self.close_connection = True
+            self._reply(404, {'error': 'ruta no encontrada'})
+
+    def _post_single(self, query: Dict[str, List[str]]) -> None:
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self._read_body(MAX_BODY_BYTES) if length <= MAX_BODY_BYTES else None
+        if body is None:
+            # El resto del cuerpo no se lee: se cierra la conexión
+            self.close_connection = True
+            self._reply(413, {'error': f'el cuerpo supera {MAX_BODY_BYTES} bytes'})
+            return
+        try:
+            item = json.loads(body or b'null')
+            method, args, kwargs = parse_item(item)
+        except ValueError as e:
+            self._reply(400, {'error': str(e)})
+            return
+
+        wait = query.get('wait', ['0'])[0] not in ('0', 'false', '')
+        try:
+            job = self.server.service.submit(
+                method, args, kwargs, item.get('ref'), item.get('callback_url'), wait=wait
+            )
+        except queue.Full:
+            self._throttled()
+            return
+
+        if not wait:
+            self._reply(202, {'id': job.id})
+            return
+        state = job.future.result()
+        self._reply(200 if state['status'] == 'sent' else 502, state)
+
+    def _post_batch(self, query: Dict[str, List[str]]) -> None:
+        service = self.server.service
+        callback_url = query.get('callback', [None])[0]
+        content_type = self.headers.get('Content-Type', '')
+
+        if 'ndjson' in content_type or 'jsonl' in content_type:
+            items = (json.loads(line) for line in self._body_lines() if line.strip())
+        else:
+            try:
+                items = json.loads(b''.join(self._body_chunks()) or b'[]')
+            except ValueError as e:
+                self._reply(400, {'error': f'JSON inválido: {e}'})
+                return
+            if not isinstance(items, list):
+                self._reply(400, {'error': 'el lote debe ser un arreglo JSON o NDJSON'})
+                return
+
+        ids: List[str] = []
+        rejected: List[Dict[str, Any]] = []
+        # Envíos leídos del lote (aceptados o rechazados); el cliente reintenta desde aquí
+        count = 0
+        full = False
+        try:
+            for item in items:
+                try:
+                    method, args, kwargs = parse_item(item)
+                except ValueError as e:
+                    rejected.append({'index': count, 'error': str(e)})
+                    count += 1
+                    continue
+                try:
+                    job = service.submit(method, args, kwargs, item.get('ref'),
+                                         item.get('callback_url') or callback_url)
+                except queue.Full:
+                    full = True
+                    break
+                ids.append(job.id)
+                count += 1
+        except ValueError as e:
+            # NDJSON con una línea inválida: lo anterior ya quedó encolado
+            self.close_connection = True
+            self._reply(400, {'error': f'JSON inválido en el envío {count}: {e}',
+                              'accepted': count, 'ids': ids, 'rejected': rejected})
+            return
+
+        if full:
+            # El resto del cuerpo no se lee: se cierra la conexión
+            self.close_connection = True
+            self._throttled({'accepted': count, 'ids': ids, 'rejected': rejected})
+            return
+        self._reply(202, {'accepted': count, 'ids': ids, 'rejected': rejected})
+
+
+class SendServiceServer(ThreadingHTTPServer):
+    """Servidor HTTP (un hilo por conexión) delante de un SendService."""
+
+    daemon_threads = True
+    # Conexiones que esperan ser aceptadas en ráfagas de envíos
+    request_queue_size = 1024
+
+    def __init__(self, service: SendService, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT,
+                 token: Optional[str] = None):
+        self.service = service
+        self.token = token if token is not None else os.getenv('WHATSAPP_SERVICE_TOKEN')
+        super().__init__((host, port), _Handler)
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Servicio HTTP local para enviar mensajes de WhatsApp desde otros servicios',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python send_service.py                           # http://127.0.0.1:8088
+  python send_service.py --port=9000 --workers=64
+
+  curl -X POST localhost:8088/messages -d '{"method": "send_text_message", "args": ["56912345678", "Hola"]}'
+  curl -X POST 'localhost:8088/messages/batch?callback=http://localhost:3000/wsp' \\
+       -H 'Content-Type: application/x-ndjson' --data-binary @envios.ndjson
+  curl localhost:8088/messages/<id>
+
+Con la cola llena responde 429 (Retry-After). Presiona Ctrl+C para detener.
+        """
+    )
+    parser.add_argument('--host', type=str, default=DEFAULT_HOST, help=f'Interfaz (por defecto: {DEFAULT_HOST})')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'Puerto (por defecto: {DEFAULT_PORT})')
+    parser.add_argument('--workers', type=int, default=32, help='Hilos de envío (por defecto: 32)')
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help=f'Envíos encolados antes de responder 429 (por defecto: {DEFAULT_QUEUE_SIZE})')
+    args = parser.parse_args()
+
+    try:
+        service = SendService(workers=args.workers, queue_size=args.queue_size)
+        server = SendServiceServer(service, args.host, args.port)
+    except Exception as e:
+        print(f"❌ Error al iniciar el servicio: {e}")
+        sys.exit(1)
+
+    print(f"🚀 Servicio de envío escuchando en http://{args.host}:{args.port}")
+    if not server.token:
+        print("⚠️  Sin WHATSAPP_SERVICE_TOKEN: cualquier proceso local puede enviar")
+    print("🛑 Presiona Ctrl+C para detener")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\n⏹️  Deteniendo: enviando lo que quedó en cola...")
+    finally:
+        server.server_close()
+        service.close()
+        print(f"📊 {service.health()}")
+
+
+if __name__ == "__main__":
+    main()
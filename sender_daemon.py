@@ -0,0 +1,284 @@
+"""
+Daemon del enviador de WhatsApp (conexiones calientes)
+Mantiene un WhatsAppSender vivo con su sesión HTTP (keep-alive), el catálogo de
+plantillas y la caché de medios, y atiende peticiones por un socket Unix local.
+
+Los scripts de terminal (ej. mandar_msg_v2.py) usan get_sender(): si hay un daemon
+corriendo le reenvían la petición, y si no, envían directamente como siempre.
+
+Uso: python sender_daemon.py [--socket=/ruta/al/socket]
+"""
+
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import socketserver
+from typing import Any, Optional
+from dotenv import load_dotenv
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Socket por defecto (se puede cambiar con WHATSAPP_DAEMON_SOCKET)
+DEFAULT_SOCKET_PATH = os.getenv(
+    'WHATSAPP_DAEMON_SOCKET',
+    os.path.join(tempfile.gettempdir(), 'wsp_sender.sock')
+)
+
+# Métodos de WhatsAppSender que el daemon acepta ejecutar
+ALLOWED_METHODS = {
+    'send_text_message',
+    'send_template_message',
+    'send_authentication_template',
+    'send_utility_template',
+    'send_marketing_template',
+    'send_service_template',
+    'upload_media',
+    'list_templates',
+    'get_message_status',
+}
+
+# Cada cuánto se re-calienta la conexión para que Graph no la cierre por inactividad
+KEEPALIVE_INTERVAL = 60
+
+# Tiempo máximo para conectar con el daemon antes de enviar directamente
+CONNECT_TIMEOUT = 0.2
+
+
+def daemon_supported() -> bool:
+    """Los sockets Unix no están disponibles en todas las plataformas."""
+    return hasattr(socket, 'AF_UNIX')
+
+
+# ===============================
+# 🖥️ SERVIDOR
+# ===============================
+class _RequestHandler(socketserver.StreamRequestHandler):
+    """Atiende una petición JSON por conexión: {"method": ..., "args": [...], "kwargs": {...}}."""
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            return
+
+        try:
+            request = json.loads(line)
+            method = request.get('method')
+            args = request.get('args') or []
+            kwargs = request.get('kwargs') or {}
+
+            if method not in ALLOWED_METHODS:
+                raise ValueError(f"Método no permitido: {method}")
+
+            result = getattr(self.server.sender, method)(*args, **kwargs)
+            response = {'ok': True, 'result': result}
+        except Exception as e:
+            response = {'ok': False, 'error': str(e)}
+
+        self.wfile.write(json.dumps(response).encode('utf-8') + b'\n')
+
+
+class SenderDaemon(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Servidor por socket Unix que comparte un único WhatsAppSender entre peticiones."""
+
+    daemon_threads = True
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH, sender=None):
+        if sender is None:
+            from whatsapp_sender_v2 import WhatsAppSender
+            sender = WhatsAppSender()
+
+        self.sender = sender
+        self.socket_path = socket_path
+
+        _remove_stale_socket(socket_path)
+        super().__init__(socket_path, _RequestHandler)
+        os.chmod(socket_path, 0o600)
+
+    def warm_up(self) -> None:
+        """Calienta la conexión TLS y carga el catálogo de plantillas si hay WABA."""
+        self.sender.warm_up()
+        if self.sender.waba_id:
+            try:
+                self.sender.list_templates(refresh=True)
+            except Exception as e:
+                print(f"⚠️  No se pudo precargar el catálogo de plantillas: {e}")
+
+    def _keepalive_loop(self):
+        while True:
+            time.sleep(KEEPALIVE_INTERVAL)
+            self.sender.warm_up()
+
+    def serve(self) -> None:
+        """Calienta conexiones y atiende peticiones hasta Ctrl+C."""
+        self.warm_up()
+        threading.Thread(target=self._keepalive_loop, daemon=True).start()
+        try:
+            self.serve_forever()
+        finally:
+            self.server_close()
+            try:
+                os.unlink(self.socket_path)
+            except FileNotFoundError:
+                pass
+
+
+def _remove_stale_socket(socket_path: str) -> None:
+    """Elimina el archivo de socket si quedó de un daemon que ya no está corriendo."""
+    if not os.path.exists(socket_path):
+        return
+
+    sock = _connect(socket_path)
+    if sock is not None:
+        sock.close()
+        raise RuntimeError(f"Ya hay un daemon escuchando en {socket_path}")
+
+    os.unlink(socket_path)
+
+
+# ===============================
+# 📡 CLIENTE
+# ===============================
+def _connect(socket_path: str) -> Optional[socket.socket]:
+    """Intenta conectar con el daemon; retorna None si no está corriendo."""
+    if not daemon_supported() or not os.path.exists(socket_path):
+        return None
+
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT)
+    try:
+        sock.connect(socket_path)
+    except OSError:
+        sock.close()
+        return None
+
+    sock.settimeout(None)
+    return sock
+
+
+class DaemonSender:
+    """
+    Proxy con la misma interfaz que WhatsAppSender que reenvía cada llamada al daemon.
+    Los errores del daemon se relanzan como Exception con el mismo mensaje.
+    """
+
+    def __init__(self, socket_path: str = DEFAULT_SOCKET_PATH):
+        self.socket_path = socket_path
+
+    def _call(self, method: str, *args, **kwargs) -> Any:
+        sock = _connect(self.socket_path)
+        if sock is None:
+            raise ConnectionError(f"No hay un daemon escuchando en {self.socket_path}")
+
+        with sock:
+            request = json.dumps({'method': method, 'args': args, 'kwargs': kwargs}).encode('utf-8') + b'\n'
+            sock.sendall(request)
+            with sock.makefile('rb') as reader:
+                line = reader.readline()
+
+        if not line:
+            raise ConnectionError("El daemon cerró la conexión sin responder")
+
+        response = json.loads(line)
+        if not response.get('ok'):
+            raise Exception(response.get('error'))
+        return response.get('result')
+
+    def upload_media(self, file_path: str, *args, **kwargs) -> str:
+        # El daemon tiene otro directorio de trabajo: la ruta se resuelve aquí
+        return self._call('upload_media', os.path.abspath(os.path.expanduser(file_path)), *args, **kwargs)
+
+    def __getattr__(self, name: str):
+        if name not in ALLOWED_METHODS:
+            raise AttributeError(name)
+
+        def method(*args, **kwargs):
+            return self._call(name, *args, **kwargs)
+
+        return method
+
+
+def daemon_running(socket_path: str = DEFAULT_SOCKET_PATH) -> bool:
+    """Indica si hay un daemon atendiendo en el socket."""
+    sock = _connect(socket_path)
+    if sock is None:
+        return False
+    sock.close()
+    return True
+
+
+def get_sender(use_daemon: bool = True, socket_path: str = DEFAULT_SOCKET_PATH):
+    """
+    Retorna un DaemonSender si hay un daemon corriendo; si no, un WhatsAppSender directo.
+    Con WHATSAPP_RECORD o WHATSAPP_REPLAY el envío es directo y pasa por el
+    transporte de grabación/reproducción (ver record_replay.py).
+    """
+    from record_replay import transport_from_env, ReplayTransport
+    transport = transport_from_env()
+    if transport is not None:
+        from whatsapp_sender_v2 import WhatsAppSender
+        credentials = transport.credentials() if isinstance(transport, ReplayTransport) else {}
+        return WhatsAppSender(transport=transport, **credentials)
+
+    if use_daemon and daemon_running(socket_path):
+        return DaemonSender(socket_path)
+
+    from whatsapp_sender_v2 import WhatsAppSender
+    return WhatsAppSender()
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Mantiene conexiones calientes con WhatsApp Business API en un socket local',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python sender_daemon.py                          # Socket por defecto
+  python sender_daemon.py --socket=/tmp/wsp.sock   # Socket específico
+
+Con el daemon corriendo, mandar_msg_v2.py le reenvía los envíos automáticamente.
+Presiona Ctrl+C para detener el daemon.
+        """
+    )
+
+    parser.add_argument(
+        '--socket',
+        type=str,
+        default=DEFAULT_SOCKET_PATH,
+        help=f'Ruta del socket Unix (por defecto: {DEFAULT_SOCKET_PATH})'
+    )
+
+    args = parser.parse_args()
+
+    if not daemon_supported():
+        print("❌ Esta plataforma no soporta sockets Unix")
+        sys.exit(1)
+
+    try:
+        server = SenderDaemon(args.socket)
+    except Exception as e:
+        print(f"❌ Error al iniciar el daemon: {e}")
+        sys.exit(1)
+
+    print(f"🚀 Daemon escuchando en {args.socket}")
+    print("🛑 Presiona Ctrl+C para detener")
+
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        print("\n⏹️  Daemon detenido")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,307 @@
+"""
+Pool de números de WhatsApp (sharding por destinatario)
+Reparte los envíos entre varios phone_number_id para sumar su throughput.
+Cada destinatario se asigna a un número por hashing consistente, así la
+conversación queda siempre en el mismo número, y cada número tiene su propio
+límite de tasa y estado de salud.
+
+Configuración en .env:
+    WHATSAPP_PHONE_NUMBER_IDS=111,222,333
+    WHATSAPP_ACCESS_TOKENS=token_a,token_b,token_c        # opcional (uno o uno por número)
+    WHATSAPP_BUSINESS_ACCOUNT_IDS=waba_a,waba_b,waba_c    # opcional (uno o uno por número)
+    WHATSAPP_RATE_PER_NUMBER=80                           # mensajes/segundo por número
+"""
+
+import os
+import time
+import bisect
+import hashlib
+import threading
+from typing import Optional, Dict, Any, List, Callable
+from dotenv import load_dotenv
+from rate_limit import TokenBucket
+from circuit_breaker import CircuitOpenError
+from payload_validation import PayloadError
+from graph_errors import is_throttling_error, is_server_error, http_status
+from whatsapp_sender_v2 import WhatsAppSender
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Límite por defecto de Meta para un número (mensajes por segundo)
+DEFAULT_RATE_PER_NUMBER = 80
+
+# Nodos virtuales por número en el anillo (más nodos = reparto más parejo)
+VIRTUAL_NODES = 100
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _split_env(name: str) -> List[str]:
+    return [v.strip() for v in os.getenv(name, '').split(',') if v.strip()]
+
+
+def is_member_failure(error: BaseException) -> bool:
+    """
+    True si el error indica un problema del número y no del mensaje: errores de
+    red, timeouts, 5xx, circuito abierto, 429 y códigos de throttling de Meta
+    (ver graph_errors.py). 131056 (demasiado seguido al mismo destinatario) y los
+    demás 4xx (número inválido, plantilla inexistente) son del mensaje: no cuentan
+    como fallos del número, igual que los payloads inválidos.
+    """
+    if isinstance(error, PayloadError):
+        return False
+    if isinstance(error, CircuitOpenError) or is_throttling_error(error) or is_server_error(error):
+        return True
+    if http_status(error):
+        return False
+
+    # Sin respuesta de la API: errores de red y timeouts (OSError) del envío
+    for candidate in (error, error.__cause__ or error.__context__):
+        if isinstance(candidate, OSError):
+            return True
+    return False
+
+
+class PoolMember:
+    """Un número del pool con su límite de tasa y su estado de salud."""
+
+    def __init__(self, sender: WhatsAppSender, bucket):
+        self.sender = sender
+        self.bucket = bucket
+        self.sent = 0
+        self.failed = 0
+        self.consecutive_failures = 0
+        self.unhealthy_until = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def phone_number_id(self) -> str:
+        return self.sender.phone_number_id
+
+    def is_healthy(self, now: Optional[float] = None) -> bool:
+        return (now if now is not None else time.monotonic()) >= self.unhealthy_until
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.sent += 1
+            self.consecutive_failures = 0
+
+    def record_failure(self, threshold: int, cooldown: float) -> None:
+        with self._lock:
+            self.failed += 1
+            self.consecutive_failures += 1
+            if self.consecutive_failures >= threshold:
+                self.unhealthy_until = time.monotonic() + cooldown
+                self.consecutive_failures = 0
+
+
+class SenderPool:
+    """
+    Expone la misma interfaz de envío que WhatsAppSender, repartiendo los
+    destinatarios entre varios números.
+
+    Args:
+        senders: Un WhatsAppSender por phone_number_id
+        rate_per_number: Mensajes por segundo permitidos a cada número
+        failure_threshold: Fallos consecutivos para marcar un número como no sano
+            (solo caídas y límites de tasa, ver is_member_failure)
+        cooldown: Segundos que un número no sano queda fuera del reparto
+        buckets: Limitadores por phone_number_id que reemplazan a los propios del pool
+            (ej. SharedTokenBucket para compartir el límite entre procesos)
+    """
+
+    def __init__(
+        self,
+        senders: List[WhatsAppSender],
+        rate_per_number: float = DEFAULT_RATE_PER_NUMBER,
+        failure_threshold: int = 5,
+        cooldown: float = 30.0,
+        buckets: Optional[Dict[str, Any]] = None
+    ):
+        if not senders:
+            raise ValueError("El pool necesita al menos un WhatsAppSender")
+
+        buckets = buckets or {}
+        self.members = [
+            PoolMember(sender, buckets.get(sender.phone_number_id) or TokenBucket(rate_per_number))
+            for sender in senders
+        ]
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        # Se llama en el hilo del envío justo después de tomar el token y antes de
+        # llamar a la API (ej. AdaptiveSender mide la latencia desde ahí)
+        self.on_acquire: Optional[Callable[[], None]] = None
+
+        # Anillo de hashing consistente: (hash, índice del miembro)
+        ring = []
+        for index, member in enumerate(self.members):
+            for vnode in range(VIRTUAL_NODES):
+                ring.append((_hash(f"{member.phone_number_id}#{vnode}"), index))
+        ring.sort()
+        self._ring_hashes = [h for h, _ in ring]
+        self._ring_members = [i for _, i in ring]
+
+    @staticmethod
+    def phone_number_ids_from_env() -> List[str]:
+        """phone_number_id configurados en .env (WHATSAPP_PHONE_NUMBER_IDS o el único)."""
+        return _split_env('WHATSAPP_PHONE_NUMBER_IDS') or _split_env('WHATSAPP_PHONE_NUMBER_ID')
+
+    @classmethod
+    def from_env(
+        cls,
+        transport=None,
+        typed_results: bool = False,
+        validate: Optional[str] = None,
+        keep_raw: bool = False,
+        **kwargs
+    ) -> 'SenderPool':
+        """
+        Crea el pool desde WHATSAPP_PHONE_NUMBER_IDS (y opcionalmente tokens/WABAs).
+        transport, typed_results, keep_raw y validate se aplican a todos los números
+        (ver WhatsAppSender).
+        """
+        phone_ids = cls.phone_number_ids_from_env()
+        tokens = _split_env('WHATSAPP_ACCESS_TOKENS') or _split_env('WHATSAPP_ACCESS_TOKEN')
+        waba_ids = _split_env('WHATSAPP_BUSINESS_ACCOUNT_IDS') or _split_env('WHATSAPP_BUSINESS_ACCOUNT_ID')
+
+        if not phone_ids:
+            raise ValueError("Faltan números. Configura WHATSAPP_PHONE_NUMBER_IDS en .env")
+
+        for name, values in (('WHATSAPP_ACCESS_TOKENS', tokens), ('WHATSAPP_BUSINESS_ACCOUNT_IDS', waba_ids)):
+            if len(values) > 1 and len(values) != len(phone_ids):
+                raise ValueError(f"{name} debe tener un valor o uno por cada número")
+
+        def pick(values: List[str], i: int) -> Optional[str]:
+            if not values:
+                return None
+            return values[i] if len(values) > 1 else values[0]
+
+        senders = [
+            WhatsAppSender(
+                access_token=pick(tokens, i),
+                phone_number_id=phone_id,
+                waba_id=pick(waba_ids, i),
+                transport=transport,
+                typed_results=typed_results,
+                keep_raw=keep_raw,
+                validate=validate
+            )
+            for i, phone_id in enumerate(phone_ids)
+        ]
+
+        kwargs.setdefault('rate_per_number', float(os.getenv('WHATSAPP_RATE_PER_NUMBER', DEFAULT_RATE_PER_NUMBER)))
+        return cls(senders, **kwargs)
+
+    # ===============================
+    # 🧭 RUTEO
+    # ===============================
+    def route(self, to: str) -> PoolMember:
+        """
+        Retorna el número asignado a un destinatario. Si ese número no está sano,
+        se usa el siguiente sano del anillo; si ninguno lo está, el asignado.
+        """
+        key = _hash(self.members[0].sender._format_phone_number(to))
+        start = bisect.bisect(self._ring_hashes, key) % len(self._ring_hashes)
+        primary = self.members[self._ring_members[start]]
+
+        if primary.is_healthy():
+            return primary
+
+        now = time.monotonic()
+        seen = {self._ring_members[start]}
+        for offset in range(1, len(self._ring_members)):
+            index = self._ring_members[(start + offset) % len(self._ring_members)]
+            if index in seen:
+                continue
+            seen.add(index)
+            if self.members[index].is_healthy(now):
+                return self.members[index]
+            if len(seen) == len(self.members):
+                break
+
+        return primary
+
+    def _send(self, method: str, to: str, *args, **kwargs) -> Dict[str, Any]:
+        member = self.route(to)
+        member.bucket.acquire()
+        if self.on_acquire is not None:
+            self.on_acquire()
+        try:
+            result = getattr(member.sender, method)(to, *args, **kwargs)
+        except Exception as e:
+            if is_member_failure(e):
+                member.record_failure(self.failure_threshold, self.cooldown)
+            raise
+        member.record_success()
+        return result
+
+    # ===============================
+    # 📤 ENVÍOS (misma interfaz que WhatsAppSender)
+    # ===============================
+    def send_text_message(self, to: str, message: str) -> Dict[str, Any]:
+        return self._send('send_text_message', to, message)
+
+    def send_template_message(
+        self,
+        to: str,
+        template_name: str,
+        language_code: str = "es",
+        components: Optional[List] = None
+    ) -> Dict[str, Any]:
+        return self._send('send_template_message', to, template_name, language_code, components)
+
+    def send_authentication_template(
+        self,
+        to: str,
+        template_name: str,
+        code: str,
+        language_code: str = "es"
+    ) -> Dict[str, Any]:
+        return self._send('send_authentication_template', to, template_name, code, language_code)
+
+    def send_utility_template(
+        self,
+        to: str,
+        template_name: str,
+        parameters: List[str] = None,
+        language_code: str = "es"
+    ) -> Dict[str, Any]:
+        return self._send('send_utility_template', to, template_name, parameters, language_code)
+
+    def send_marketing_template(
+        self,
+        to: str,
+        template_name: str,
+        parameters: List[str],
+        header_image_url: Optional[str] = None,
+        language_code: str = "es"
+    ) -> Dict[str, Any]:
+        return self._send('send_marketing_template', to, template_name, parameters, header_image_url, language_code)
+
+    def send_service_template(
+        self,
+        to: str,
+        template_name: str,
+        parameters: List[str],
+        language_code: str = "es"
+    ) -> Dict[str, Any]:
+        return self._send('send_service_template', to, template_name, parameters, language_code)
+
+    # ===============================
+    # 📊 ESTADO
+    # ===============================
+    def stats(self) -> List[Dict[str, Any]]:
+        """Enviados, fallidos y salud de cada número del pool."""
+        now = time.monotonic()
+        return [
+            {
+                'phone_number_id': member.phone_number_id,
+                'sent': member.sent,
+                'failed': member.failed,
+                'healthy': member.is_healthy(now),
+            }
+            for member in self.members
+        ]
@@ -0,0 +1,576 @@
+"""
+Campañas repartidas entre varios hosts (shards con leases)
+Divide el archivo de destinatarios en shards (rangos de filas) que varios hosts
+reclaman con un lease de duración limitada, a través de una base SQLite en un
+directorio compartido (NFS, SMB, ...). Cada host envía su shard con el mismo
+motor que bulk_send.py y renueva el lease con un heartbeat.
+
+- Si un host muere o pierde la conexión, su lease vence y otro host retoma el
+  shard desde su checkpoint: las filas enviadas no se reenvían y las que
+  estaban en vuelo se reportan como desconocidas (igual que --resume).
+- Un host deja de tomar filas nuevas LEASE_MARGIN segundos antes de que su lease
+  pueda vencer (aunque el heartbeat no haya llegado a fallar): el margen cubre
+  el timeout de lectura del último envío, el flush del checkpoint y la diferencia
+  entre relojes, así dos hosts nunca envían el mismo shard a la vez. Los relojes
+  de los hosts deben estar sincronizados (NTP) con menos de CLOCK_SKEW segundos
+  de diferencia.
+- Cada fila en vuelo se escribe a disco antes de enviarla: si el host muere, quien
+  retome el shard la ve y no la reenvía.
+- Todos los hosts verifican que su archivo de destinatarios tenga el mismo
+  contenido que el de init (RecipientStore.digest), no solo las mismas filas.
+- Cada intento escribe su propio CSV de resultados en <base>_shards/; merge los
+  une en un solo CSV (una línea por fila, la del último intento que la resolvió)
+  y arma el checkpoint de la campaña completa.
+
+El límite de mensajes por segundo es por host: con varios hosts sobre los mismos
+números, usar --rate = límite / hosts. La supresión de duplicados (--suppress)
+no se comparte entre hosts y no está disponible en este modo.
+
+Uso:
+    python shard_coordinator.py init clientes.rcp --db=/compartido/campania.db --tipo=utility --template=aviso
+    python shard_coordinator.py work --db=/compartido/campania.db      # en cada host
+    python shard_coordinator.py status --db=/compartido/campania.db
+    python shard_coordinator.py merge --db=/compartido/campania.db --output=resultados.csv
+"""
+
+import os
+import sys
+import csv
+import glob
+import json
+import math
+import time
+import socket
+import sqlite3
+import argparse
+import threading
+from typing import Optional, Dict, Any, List
+from dotenv import load_dotenv
+from campaign_checkpoint import CampaignCheckpoint, campaign_fingerprint, IN_FLIGHT, FLUSH_INTERVAL
+from http_transport import default_timeout
+from pair_pacing import PairPacer, DEFAULT_PAIR_INTERVAL
+from payload_validation import PayloadValidator
+from sender_pool import DEFAULT_RATE_PER_NUMBER
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Cargar variables de entorno
+load_dotenv()
+
+# Filas por shard
+DEFAULT_SHARD_SIZE = 50000
+
+# Diferencia máxima aceptada entre los relojes de los hosts (segundos)
+CLOCK_SKEW = 5
+
+# Segundos antes del vencimiento en que un host deja de tomar filas nuevas: la
+# última fila tomada puede tardar hasta el timeout de lectura (WHATSAPP_READ_TIMEOUT)
+# y su estado hasta FLUSH_INTERVAL más en llegar al checkpoint
+LEASE_MARGIN = default_timeout()[1] + FLUSH_INTERVAL + CLOCK_SKEW
+
+# Duración de un lease en segundos (se renueva cada LEASE / 3)
+DEFAULT_LEASE = max(60, math.ceil(4 * LEASE_MARGIN))
+
+# Espera máxima entre intentos de tomar un shard cuando todos están tomados
+POLL_INTERVAL = 5
+
+# Prioridad de los resultados de una fila al unir intentos (gana el mayor)
+_STATUS_PRIORITY = {'error': 0, 'suppressed': 1, 'ok': 2}
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS shards (
+    id INTEGER PRIMARY KEY,
+    start INTEGER NOT NULL,
+    stop INTEGER NOT NULL,
+    state TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    token TEXT,
+    lease_until REAL NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    sent INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    suppressed INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class Lease:
+    """Un shard tomado por este host hasta que venza (o se pierda) su lease."""
+
+    def __init__(self, shard: int, start: int, stop: int, attempt: int, token: str, deadline: float):
+        self.shard = shard
+        self.start = start
+        self.stop = stop
+        self.attempt = attempt
+        self.token = token
+        # Instante (reloj local monotónico) hasta el que se pueden tomar filas
+        self.deadline = deadline
+        self.lost = False
+
+    def valid(self) -> bool:
+        return not self.lost and time.monotonic() < self.deadline
+
+
+class ShardCoordinator:
+    """
+    Shards de una campaña y sus leases en una base SQLite compartida.
+
+    Args:
+        path: Archivo de la base (en un directorio que vean todos los hosts)
+    """
+
+    def __init__(self, path: str):
+        if not os.path.exists(path):
+            error_msg = f"❌ Error al abrir la campaña repartida\nDetalles: no existe {path} (crearla con init)"
+            raise Exception(error_msg)
+        self.path = path
+        # Sin WAL: el journal clásico funciona en directorios de red
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.meta = {key: json.loads(value) for key, value in self._conn.execute("SELECT key, value FROM meta")}
+
+    @classmethod
+    def create(
+        cls,
+        path: str,
+        recipients: str,
+        count: int,
+        job: Dict[str, Any],
+        shard_size: int = DEFAULT_SHARD_SIZE,
+        lease: float = DEFAULT_LEASE,
+        digest: bytes = b''
+    ) -> 'ShardCoordinator':
+        """
+        Crea la base con la campaña y sus shards, todos pendientes. digest es la
+        huella del contenido de los destinatarios (RecipientStore.digest).
+        """
+        if os.path.exists(path):
+            error_msg = f"❌ Error al crear la campaña repartida\nDetalles: {path} ya existe"
+            raise Exception(error_msg)
+        if lease <= 3 * LEASE_MARGIN:
+            raise ValueError(f"El lease debe durar más de {3 * LEASE_MARGIN:g} segundos (3 veces LEASE_MARGIN)")
+
+        meta = {
+            'recipients': recipients,
+            'count': count,
+            'digest': digest.hex(),
+            'job': job,
+            'fingerprint': campaign_fingerprint(job, count, digest).hex(),
+            'shard_size': shard_size,
+            'lease': lease,
+        }
+        conn = sqlite3.connect(path, isolation_level=None)
+        try:
+            conn.executescript(_SCHEMA)
+            conn.execute("BEGIN")
+            conn.executemany("INSERT INTO meta VALUES (?, ?)", [(k, json.dumps(v)) for k, v in meta.items()])
+            conn.executemany(
+                "INSERT INTO shards (id, start, stop) VALUES (?, ?, ?)",
+                [(k, start, min(start + shard_size, count)) for k, start in enumerate(range(0, count, shard_size))]
+            )
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+        return cls(path)
+
+    @property
+    def shards_dir(self) -> str:
+        """Directorio (junto a la base) con los checkpoints y resultados de cada shard."""
+        return f"{os.path.splitext(self.path)[0]}_shards"
+
+    def shard_path(self, shard: int, suffix: str) -> str:
+        return os.path.join(self.shards_dir, f"shard_{shard:05d}{suffix}")
+
+    def check_recipients(self, store) -> None:
+        """Lanza un error si el store no tiene las mismas filas y contenido que en init."""
+        if len(store) != self.meta['count']:
+            detail = f"tiene {len(store)} filas y la campaña {self.meta['count']}"
+        elif store.digest().hex() != self.meta['digest']:
+            detail = "tiene las mismas filas pero otro contenido"
+        else:
+            return
+        error_msg = f"❌ Error: el archivo de destinatarios no corresponde a la campaña\nDetalles: {detail}"
+        raise Exception(error_msg)
+
+    # ===============================
+    # 🔒 LEASES
+    # ===============================
+    def claim(self, owner: str) -> Optional[Lease]:
+        """Toma el primer shard pendiente o con el lease vencido. None si no hay."""
+        lease = self.meta['lease']
+        token = os.urandom(8).hex()
+        with self._lock:
+            started = time.monotonic()
+            now = time.time()
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id, start, stop, attempts FROM shards "
+                    "WHERE state = 'pending' OR (state = 'leased' AND lease_until < ?) "
+                    "ORDER BY id LIMIT 1",
+                    (now,)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                shard, start, stop, attempts = row
+                self._conn.execute(
+                    "UPDATE shards SET state = 'leased', owner = ?, token = ?, lease_until = ?, attempts = ? WHERE id = ?",
+                    (owner, token, now + lease, attempts + 1, shard)
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return Lease(shard, start, stop, attempts + 1, token, started + lease - LEASE_MARGIN)
+
+    def renew(self, lease: Lease) -> bool:
+        """Extiende el lease. False si otro host ya tomó el shard (hay que dejarlo)."""
+        duration = self.meta['lease']
+        with self._lock:
+            started = time.monotonic()
+            cursor = self._conn.execute(
+                "UPDATE shards SET lease_until = ? WHERE id = ? AND token = ? AND state = 'leased'",
+                (time.time() + duration, lease.shard, lease.token)
+            )
+        if cursor.rowcount != 1:
+            lease.lost = True
+            return False
+        lease.deadline = started + duration - LEASE_MARGIN
+        return True
+
+    def complete(self, lease: Lease, counts: Dict[str, int]) -> bool:
+        """Marca el shard terminado con sus conteos. False si el lease se había perdido."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE shards SET state = 'done', lease_until = 0, sent = ?, failed = ?, suppressed = ? "
+                "WHERE id = ? AND token = ? AND state = 'leased'",
+                (counts['sent'], counts['failed'] + counts['unknown'], counts['suppressed'], lease.shard, lease.token)
+            )
+        return cursor.rowcount == 1
+
+    def release(self, lease: Lease) -> None:
+        """Devuelve el shard sin terminar para que otro host lo retome ya."""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE shards SET state = 'pending', owner = NULL, lease_until = 0 WHERE id = ? AND token = ? AND state = 'leased'",
+                (lease.shard, lease.token)
+            )
+
+    def next_expiry(self) -> Optional[float]:
+        """Segundos hasta que vence el próximo lease ajeno, o None si todo terminó."""
+        with self._lock:
+            pending, until = self._conn.execute(
+                "SELECT SUM(state = 'pending'), MIN(CASE WHEN state = 'leased' THEN lease_until END) FROM shards"
+            ).fetchone()
+        if pending:
+            return 0.0
+        if until is None:
+            return None
+        return max(0.0, until - time.time())
+
+    def shards(self) -> List[Dict[str, Any]]:
+        """Estado de cada shard."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "SELECT id, start, stop, state, owner, lease_until, attempts, sent, failed, suppressed FROM shards ORDER BY id"
+            )
+            names = [column[0] for column in cursor.description]
+            return [dict(zip(names, row)) for row in cursor]
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+# ===============================
+# 📤 ENVÍO DE UN SHARD
+# ===============================
+class _ShardCheckpoint:
+    """Checkpoint de un shard indexado con los números de fila de la campaña."""
+
+    def __init__(self, checkpoint: CampaignCheckpoint, start: int):
+        self.checkpoint = checkpoint
+        self.start = start
+
+    def mark(self, index: int, state: int) -> None:
+        self.checkpoint.mark(index - self.start, state)
+        if state == IN_FLIGHT:
+            # Antes de enviar: si el host muere, quien retome el shard no la reenvía
+            self.checkpoint.flush()
+
+    def should_skip(self, index: int) -> bool:
+        return self.checkpoint.should_skip(index - self.start)
+
+
+def run_shard(coordinator: ShardCoordinator, lease: Lease, store, workers: int, rate: float) -> bool:
+    """
+    Envía las filas del shard con run_rows mientras el lease siga vigente.
+    Retorna True si el shard quedó terminado.
+    """
+    from bulk_send import make_sender, run_rows, RESULT_FIELDS, UNKNOWN_ERROR
+
+    job = coordinator.meta['job']
+    size = lease.stop - lease.start
+    fingerprint = campaign_fingerprint(job, size, bytes.fromhex(coordinator.meta['digest']))
+    os.makedirs(coordinator.shards_dir, exist_ok=True)
+
+    checkpoint_path = coordinator.shard_path(lease.shard, '.ckpt')
+    unknown: List[int] = []
+    if os.path.exists(checkpoint_path):
+        # Otro intento (de este u otro host) quedó a medias: se retoma
+        checkpoint, unknown = CampaignCheckpoint.resume(checkpoint_path, size, fingerprint)
+    else:
+        checkpoint = CampaignCheckpoint.create(checkpoint_path, size, fingerprint)
+    shard_checkpoint = _ShardCheckpoint(checkpoint, lease.start)
+
+    stop = threading.Event()
+
+    def heartbeat():
+        interval = coordinator.meta['lease'] / 3
+        while not stop.wait(interval):
+            # Lo marcado hasta ahora queda en disco para quien retome el shard
+            checkpoint.flush()
+            try:
+                if not coordinator.renew(lease):
+                    print(f"⚠️  Shard {lease.shard}: otro host tomó el lease, se deja de enviar")
+                    return
+            except sqlite3.Error as e:
+                # Sin base no se puede renovar: el lease vence solo y se deja de enviar
+                print(f"⚠️  Shard {lease.shard}: no se pudo renovar el lease: {e}")
+
+    results_path = coordinator.shard_path(lease.shard, f".a{lease.attempt}.csv")
+    lock = threading.Lock()
+    beat = threading.Thread(target=heartbeat, daemon=True)
+    beat.start()
+    transport = None
+    try:
+        with open(results_path, 'w', newline='', encoding='utf-8') as out:
+            writer = csv.writer(out)
+            writer.writerow(RESULT_FIELDS)
+
+            def emit(result):
+                with lock:
+                    writer.writerow(result)
+
+            for index in unknown:
+                index += lease.start
+                emit((index, store.phone(index), 'error', '', UNKNOWN_ERROR))
+
+            sender, transport = make_sender(job, rate_per_number=rate)
+            pacer = PairPacer(job['pair_interval']) if job.get('pair_interval') else None
+            rows = store.rows(lease.start, 1, shard_checkpoint.should_skip, lease.stop)
+            # Con el lease vencido no se toman filas nuevas ni diferidas: quedan pendientes
+            run_rows(sender, job, rows, workers, emit, shard_checkpoint, None, pacer, lease.valid)
+    except BaseException:
+        stop.set()
+        checkpoint.close()
+        coordinator.release(lease)
+        raise
+    finally:
+        stop.set()
+        if transport is not None:
+            transport.close()
+
+    counts = checkpoint.counts()
+    checkpoint.close()
+    beat.join()
+    if lease.lost or counts['pending']:
+        # Lease perdido o vencido a mitad del shard: lo que falta lo retoma otro host
+        coordinator.release(lease)
+        return False
+    return coordinator.complete(lease, counts)
+
+
+def work(coordinator: ShardCoordinator, store, workers: int, rate: float, owner: str) -> int:
+    """Toma y envía shards hasta que no quede ninguno. Retorna cuántos terminó este host."""
+    completed = 0
+    while True:
+        lease = coordinator.claim(owner)
+        if lease is None:
+            wait = coordinator.next_expiry()
+            if wait is None:
+                return completed
+            time.sleep(min(wait + 0.5, POLL_INTERVAL))
+            continue
+
+        retry = f" (intento {lease.attempt})" if lease.attempt > 1 else ''
+        print(f"📦 Shard {lease.shard}: filas {lease.start}-{lease.stop - 1}{retry}")
+        start = time.monotonic()
+        if run_shard(coordinator, lease, store, workers, rate):
+            completed += 1
+            print(f"✅ Shard {lease.shard} terminado en {time.monotonic() - start:.1f}s")
+
+
+# ===============================
+# 🧩 UNIÓN DE RESULTADOS
+# ===============================
+def merge(coordinator: ShardCoordinator, output_path: str, force: bool = False) -> Dict[str, int]:
+    """
+    Une los CSV de todos los intentos en output_path (una línea por fila, en orden)
+    y arma <output>.ckpt con el estado de toda la campaña (sirve para
+    bulk_send.py --resume). Retorna el conteo por estado.
+    """
+    from bulk_send import RESULT_FIELDS
+
+    shards = coordinator.shards()
+    unfinished = [shard['id'] for shard in shards if shard['state'] != 'done']
+    if unfinished and not force:
+        error_msg = f"❌ Error al unir los resultados\nDetalles: faltan {len(unfinished)} shards por terminar (ej. {unfinished[:5]})"
+        raise Exception(error_msg)
+
+    meta = coordinator.meta
+    checkpoint = CampaignCheckpoint.create(f"{output_path}.ckpt", meta['count'], bytes.fromhex(meta['fingerprint']))
+    counts = {'ok': 0, 'error': 0, 'suppressed': 0}
+    try:
+        with open(output_path, 'w', newline='', encoding='utf-8') as out:
+            writer = csv.writer(out)
+            writer.writerow(RESULT_FIELDS)
+            for shard in shards:
+                results: Dict[int, List[str]] = {}
+                attempts = glob.glob(coordinator.shard_path(shard['id'], '.a*.csv'))
+                attempts.sort(key=lambda path: int(path.rsplit('.a', 1)[1][:-4]))
+                for path in attempts:
+                    with open(path, newline='', encoding='utf-8') as file:
+                        reader = csv.reader(file)
+                        next(reader, None)
+                        for record in reader:
+                            row = int(record[0])
+                            previous = results.get(row)
+                            # Un intento posterior reemplaza al anterior salvo que baje de categoría
+                            if previous is None or _STATUS_PRIORITY[record[2]] >= _STATUS_PRIORITY[previous[2]]:
+                                results[row] = record
+                for row in sorted(results):
+                    writer.writerow(results[row])
+                    counts[results[row][2]] += 1
+
+                shard_checkpoint_path = coordinator.shard_path(shard['id'], '.ckpt')
+                if os.path.exists(shard_checkpoint_path):
+                    part = CampaignCheckpoint(shard_checkpoint_path)
+                    checkpoint._states[shard['start']:shard['stop']] = part._states
+                    part.close()
+    finally:
+        checkpoint.close()
+    return counts
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Reparte una campaña masiva entre varios hosts con shards y leases',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python shard_coordinator.py init clientes.rcp --db=/compartido/campania.db --tipo=utility --template=aviso
+  python shard_coordinator.py init clientes.rcp --db=/compartido/campania.db --tipo=text --message="Hola {0}" --shard-size=20000
+  python shard_coordinator.py work --db=/compartido/campania.db --workers=16 --rate=40
+  python shard_coordinator.py work --db=/compartido/campania.db --recipients=/local/clientes.rcp
+  python shard_coordinator.py status --db=/compartido/campania.db
+  python shard_coordinator.py merge --db=/compartido/campania.db --output=resultados.csv
+
+La base y el directorio <base>_shards deben estar en un directorio compartido.
+Cada host necesita el archivo de destinatarios (la ruta de init o --recipients).
+        """
+    )
+    parser.add_argument('command', choices=['init', 'work', 'status', 'merge'], help='Acción a realizar')
+    parser.add_argument('recipients_path', nargs='?', help='Archivo CSV (o .rcp) con los destinatarios (init)')
+    parser.add_argument('--db', type=str, required=True, help='Base SQLite compartida de la campaña')
+    parser.add_argument('--tipo', choices=['text', 'auth', 'utility', 'marketing', 'service'], help='Tipo de mensaje (init)')
+    parser.add_argument('--template', type=str, default=None, help='Nombre de la plantilla (init)')
+    parser.add_argument('--lang', type=str, default='es', help='Código de idioma (init, por defecto: es)')
+    parser.add_argument('--image', type=str, default=None, help='URL o ruta local de la imagen del header (init, marketing)')
+    parser.add_argument('--message', type=str, default=None, help='Texto del mensaje para --tipo=text (init)')
+    parser.add_argument('--shard-size', type=int, default=DEFAULT_SHARD_SIZE, help=f'Filas por shard (init, por defecto: {DEFAULT_SHARD_SIZE})')
+    parser.add_argument('--lease', type=float, default=DEFAULT_LEASE, help=f'Segundos de cada lease (init, por defecto: {DEFAULT_LEASE})')
+    parser.add_argument('--pair-interval', type=float, default=DEFAULT_PAIR_INTERVAL, help='Segundos mínimos entre mensajes al mismo teléfono (init)')
+    parser.add_argument('--validate', choices=['reject', 'fix', 'off'], default='reject', help='Validación de parámetros (init, por defecto: reject)')
+    parser.add_argument('--recipients', type=str, default=None, help='Ruta local del archivo de destinatarios (work)')
+    parser.add_argument('--workers', type=int, default=8, help='Hilos de envío (work, por defecto: 8)')
+    parser.add_argument(
+        '--rate',
+        type=float,
+        default=float(os.getenv('WHATSAPP_RATE_PER_NUMBER', DEFAULT_RATE_PER_NUMBER)),
+        help='Mensajes por segundo por número en este host (work)'
+    )
+    parser.add_argument('--output', type=str, default=None, help='CSV de resultados unidos (merge)')
+    parser.add_argument('--force', action='store_true', help='Unir aunque falten shards (merge)')
+    args = parser.parse_args()
+
+    from bulk_send import open_recipients, prepare_job
+
+    try:
+        if args.command == 'init':
+            if not args.recipients_path or not args.tipo:
+                parser.error("init requiere el archivo de destinatarios y --tipo")
+            if args.tipo == 'text' and not args.message:
+                parser.error("--tipo=text requiere --message")
+            if args.tipo != 'text' and not args.template:
+                parser.error(f"--tipo={args.tipo} requiere --template")
+
+            store = open_recipients(args.recipients_path)
+            validate = None if args.validate == 'off' else args.validate
+            job = {
+                'tipo': args.tipo,
+                'template': args.template,
+                'language': args.lang,
+                'image': args.image,
+                'message': args.message,
+                'pair_interval': args.pair_interval,
+                'validate': validate,
+            }
+            if validate and args.tipo != 'text':
+                job['language'] = PayloadValidator(fix=validate == 'fix').language(args.lang)
+            # La imagen local se sube una sola vez: todos los hosts usan el mismo media id
+            job = prepare_job(job)
+            coordinator = ShardCoordinator.create(
+                args.db, os.path.abspath(args.recipients_path), len(store), job, args.shard_size, args.lease,
+                store.digest()
+            )
+            shards = coordinator.shards()
+            print(f"✅ {len(store)} destinatarios en {len(shards)} shards de hasta {args.shard_size} filas: {args.db}")
+
+        elif args.command == 'work':
+            coordinator = ShardCoordinator(args.db)
+            store = open_recipients(args.recipients or coordinator.meta['recipients'])
+            coordinator.check_recipients(store)
+            owner = f"{socket.gethostname()}:{os.getpid()}"
+            print(f"🚀 {owner} tomando shards de {args.db}")
+            start = time.monotonic()
+            completed = work(coordinator, store, args.workers, args.rate, owner)
+            print(f"\n🏁 Sin shards pendientes: {completed} terminados por este host en {time.monotonic() - start:.1f}s")
+
+        elif args.command == 'status':
+            coordinator = ShardCoordinator(args.db)
+            shards = coordinator.shards()
+            now = time.time()
+            by_state = {'pending': 0, 'leased': 0, 'done': 0}
+            for shard in shards:
+                by_state[shard['state']] += 1
+            print(f"📊 {len(shards)} shards: {by_state['done']} terminados, {by_state['leased']} en curso, {by_state['pending']} pendientes")
+            print(f"   Enviados: {sum(s['sent'] for s in shards)}  Fallidos: {sum(s['failed'] for s in shards)}  "
+                  f"Omitidos: {sum(s['suppressed'] for s in shards)}  (solo shards terminados)")
+            for shard in shards:
+                if shard['state'] == 'leased':
+                    remaining = shard['lease_until'] - now
+                    lease = f"vence en {remaining:.0f}s" if remaining > 0 else "vencido"
+                    print(f"   🔒 Shard {shard['id']}: {shard['owner']} (intento {shard['attempts']}, lease {lease})")
+
+        else:
+            if not args.output:
+                parser.error("merge requiere --output")
+            counts = merge(ShardCoordinator(args.db), args.output, args.force)
+            print(f"✅ Resultados unidos en {args.output} (checkpoint: {args.output}.ckpt)")
+            print(f"   Enviados: {counts['ok']}  Fallidos: {counts['error']}  Omitidos: {counts['suppressed']}")
+
+    except KeyboardInterrupt:
+        print("\n⏹️  Detenido: el shard en curso quedó libre para otro host")
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Single-flight: una sola llamada en vuelo por clave
+Cuando muchos hilos (o tareas asyncio) piden lo mismo al mismo tiempo —el
+catálogo de plantillas, la subida de la misma imagen, el estado del mismo
+mensaje— solo el primero hace la petición a la Graph API; los demás esperan y
+reciben su mismo resultado (o su misma excepción).
+
+No es una caché: en cuanto la llamada termina, la clave se libera y la próxima
+petición vuelve a consultar (las cachés con TTL siguen en WhatsAppSender).
+
+Uso:
+    flight = SingleFlight()
+    templates = flight.do('templates', sender_fetch)                 # hilos
+    templates = await flight.do_async('templates', fetch_async)      # asyncio
+"""
+
+import asyncio
+import threading
+from typing import Callable, Dict, Any, Hashable, Tuple
+
+
+class _Call:
+    """Llamada en vuelo compartida por hilos."""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Agrupa las llamadas concurrentes con la misma clave en una sola."""
+
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._futures: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.shared = 0
+
+    # ===============================
+    # 🧵 HILOS
+    # ===============================
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Ejecuta fn(*args, **kwargs), salvo que ya haya una llamada en vuelo con la
+        misma clave: en ese caso espera y retorna su resultado (o lanza su excepción).
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.calls += 1
+            else:
+                self.shared += 1
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+    # ===============================
+    # ⚡ ASYNCIO
+    # ===============================
+    async def do_async(self, key: Hashable, fn: Callable, *args, **kwargs) -> Any:
+        """
+        Versión para asyncio. Si fn es una función async, las tareas del mismo event
+        loop comparten su resultado. Si fn es bloqueante (ej. un método del sender),
+        se ejecuta en un hilo a través de do(), así que también se comparte con los
+        hilos que pidan la misma clave.
+        """
+        is_async = asyncio.iscoroutinefunction(fn)
+        loop = asyncio.get_running_loop()
+        # Los futures pertenecen a un event loop: la clave incluye el loop
+        loop_key = (id(loop), key)
+        future = self._futures.get(loop_key)
+        if future is not None:
+            self.shared += 1
+            # shield: si esta tarea se cancela, la llamada sigue para las demás
+            return await asyncio.shield(future)
+
+        future = self._futures[loop_key] = loop.create_future()
+        if is_async:
+            self.calls += 1
+        try:
+            if is_async:
+                result = await fn(*args, **kwargs)
+            else:
+                result = await asyncio.to_thread(self.do, key, fn, *args, **kwargs)
+        except BaseException as e:
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # Evita el aviso "exception was never retrieved" si nadie más esperaba
+                future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            del self._futures[loop_key]
+
+    def stats(self) -> Dict[str, int]:
+        """Llamadas realmente ejecutadas y llamadas que se sumaron a una en vuelo."""
+        return {'calls': self.calls, 'shared': self.shared, 'in_flight': len(self._calls) + len(self._futures)}
@@ -0,0 +1,338 @@
+"""
+Supresión de duplicados entre campañas (filtro de Bloom rotativo)
+Evita enviar la misma plantilla al mismo teléfono dos veces dentro de los
+últimos N días, aunque los envíos vengan de campañas distintas.
+
+- Un filtro de Bloom por día (UTC) sobre (teléfono, plantilla), en un archivo
+  mapeado en memoria (mmap) de tamaño fijo: la memoria no crece con los envíos.
+- Filtro "por bloques": todos los bits de una entrada caen en el mismo bloque de
+  64 bytes y se toman de una tabla de patrones precalculados, así cada consulta
+  es un hash, una lectura de 64 bytes por día y una comparación de enteros.
+- Al empezar un día nuevo se limpia el filtro del día más antiguo.
+- Un filtro de Bloom no tiene falsos negativos: si dice "no enviado", seguro no
+  se envió. Con probabilidad fp_rate puede decir "ya enviado" sin que lo esté
+  (ese destinatario se omite).
+
+Uso:
+    suppression = SuppressionFilter(".suppression.bloom", days=1)
+    if not suppression.seen(phone, "promo_verano"):
+        sender.send_marketing_template(phone, "promo_verano", ...)
+        suppression.add(phone, "promo_verano")
+"""
+
+import os
+import sys
+import math
+import mmap
+import time
+import struct
+import hashlib
+import argparse
+import threading
+from typing import Optional, Dict, Any, List
+from dotenv import load_dotenv
+
+try:
+    import fcntl
+except ImportError:  # Windows: solo se protege entre hilos
+    fcntl = None
+
+# Configurar codificación UTF-8 para Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+    sys.stderr.reconfigure(encoding='utf-8')
+
+# Cargar variables de entorno
+load_dotenv()
+
+DEFAULT_PATH = os.getenv('WHATSAPP_SUPPRESSION_PATH', '.suppression.bloom')
+DEFAULT_DAYS = int(os.getenv('WHATSAPP_SUPPRESSION_DAYS', '1'))
+DEFAULT_CAPACITY = int(os.getenv('WHATSAPP_SUPPRESSION_CAPACITY', '10000000'))
+DEFAULT_FP_RATE = float(os.getenv('WHATSAPP_SUPPRESSION_FP_RATE', '0.001'))
+
+# Cabecera: firma, días, bits por filtro, funciones hash; luego el día de cada filtro
+MAGIC = b'WSPBLM1\n'
+_HEADER = struct.Struct('<8sQQQ')
+HEADER_SIZE = 4096
+MAX_DAYS = (HEADER_SIZE - _HEADER.size) // 8
+
+SECONDS_PER_DAY = 86400
+
+# Bits por bloque (64 bytes, una línea de caché)
+BLOCK_BITS = 512
+BLOCK_BYTES = BLOCK_BITS // 8
+
+# Máximo de funciones hash (bits encendidos por patrón)
+MAX_HASHES = 32
+
+# Cada máscara es la unión de dos patrones precalculados, elegidos con 12 bits
+# del hash cada uno (2^24 máscaras distintas con tablas de solo 4096 entradas)
+PATTERN_BITS = 12
+_PATTERN_MASK = (1 << PATTERN_BITS) - 1
+
+# Bloques en que se limpia un filtro al rotar (evita reservar todo el filtro en memoria)
+_CLEAR_CHUNK = 1 << 20
+
+
+def bloom_parameters(capacity: int, fp_rate: float, days: int):
+    """
+    Bits y funciones hash por filtro diario para `capacity` envíos por día.
+    Al consultar se revisan `days` filtros, así que cada uno se dimensiona con
+    fp_rate / days para que la tasa total de falsos positivos sea fp_rate.
+    Los filtros por bloques necesitan ~30% más bits para la misma tasa.
+    """
+    p = fp_rate / days
+    bits = 1.3 * -capacity * math.log(p) / (math.log(2) ** 2)
+    bits = max(1, int(math.ceil(bits / BLOCK_BITS))) * BLOCK_BITS
+    hashes = min(MAX_HASHES, max(1, int(round(-math.log(p) / math.log(2)))))
+    return bits, hashes
+
+
+class SuppressionFilter:
+    """
+    Filtros de Bloom diarios persistidos en un archivo con mmap.
+
+    Si el archivo ya existe se usan su tamaño y parámetros (days, capacity y
+    fp_rate solo aplican al crearlo). Es seguro entre hilos y, en Linux/macOS,
+    entre procesos que abren el mismo archivo.
+    """
+
+    def __init__(
+        self,
+        path: str = DEFAULT_PATH,
+        days: int = DEFAULT_DAYS,
+        capacity: int = DEFAULT_CAPACITY,
+        fp_rate: float = DEFAULT_FP_RATE
+    ):
+        if not 1 <= days <= MAX_DAYS:
+            raise ValueError(f"days debe estar entre 1 y {MAX_DAYS}")
+
+        if not os.path.exists(path):
+            self._create(path, days, *bloom_parameters(capacity, fp_rate, days))
+
+        self._file = open(path, 'r+b')
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        magic, days, bits, hashes = _HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} no es un archivo de supresión válido")
+
+        self.path = path
+        self.days = days
+        self.bits = bits
+        self.hashes = hashes
+        self._slot_bytes = bits // 8
+        self._blocks = bits // BLOCK_BITS
+        self._patterns_low = _patterns(hashes - hashes // 2, seed=0)
+        self._patterns_high = _patterns(max(1, hashes // 2), seed=1)
+        self._slot_days = memoryview(self._mmap)[_HEADER.size:_HEADER.size + days * 8].cast('q')
+        self._lock = threading.Lock()
+        self._today = None
+        self._active = []
+        self._current = HEADER_SIZE
+
+    @staticmethod
+    def _create(path: str, days: int, bits: int, hashes: int) -> None:
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as file:
+            header = _HEADER.pack(MAGIC, days, bits, hashes) + struct.pack(f'<{days}q', *([-1] * days))
+            file.write(header.ljust(HEADER_SIZE, b'\0'))
+            # Los filtros quedan en ceros sin escribirlos (archivo disperso)
+            file.truncate(HEADER_SIZE + days * (bits // 8))
+        os.replace(tmp_path, path)
+
+    # ===============================
+    # 🔄 ROTACIÓN
+    # ===============================
+    def _locked(self):
+        """Lock entre procesos (flock) para escrituras; no hace nada en Windows."""
+        return _FileLock(self._file) if fcntl is not None else _NO_LOCK
+
+    def _refresh(self) -> None:
+        """Limpia el filtro del día más antiguo si cambió el día y calcula los vigentes."""
+        today = int(time.time() // SECONDS_PER_DAY)
+        if today == self._today:
+            return
+
+        with self._lock:
+            if today != self._today:
+                self._rotate(today)
+
+    def _rotate(self, today: int) -> None:
+        slot = today % self.days
+        if self._slot_days[slot] != today:
+            with self._locked():
+                if self._slot_days[slot] != today:
+                    start = HEADER_SIZE + slot * self._slot_bytes
+                    end = start + self._slot_bytes
+                    zeros = bytes(min(_CLEAR_CHUNK, self._slot_bytes))
+                    for offset in range(start, end, len(zeros)):
+                        size = min(len(zeros), end - offset)
+                        self._mmap[offset:offset + size] = zeros[:size]
+                    self._slot_days[slot] = today
+
+        oldest = today - self.days + 1
+        self._active = [
+            HEADER_SIZE + k * self._slot_bytes
+            for k in range(self.days)
+            if oldest <= self._slot_days[k] <= today
+        ]
+        self._current = HEADER_SIZE + slot * self._slot_bytes
+        self._today = today
+
+    # ===============================
+    # 🔍 CONSULTA
+    # ===============================
+    def _key(self, phone: str, template: str):
+        """Offset del bloque dentro de cada filtro y máscara con los bits de la entrada."""
+        phone = phone.replace(' ', '').replace('-', '').replace('+', '')
+        digest = hashlib.blake2b(f"{phone}\0{template}".encode('utf-8'), digest_size=16).digest()
+        h = int.from_bytes(digest, 'little')
+        offset = ((h >> (2 * PATTERN_BITS)) % self._blocks) * BLOCK_BYTES
+        mask = self._patterns_low[h & _PATTERN_MASK] | self._patterns_high[(h >> PATTERN_BITS) & _PATTERN_MASK]
+        return offset, mask
+
+    def seen(self, phone: str, template: str) -> bool:
+        """True si la plantilla (probablemente) ya se envió al teléfono en los últimos N días."""
+        offset, mask = self._key(phone, template)
+        self._refresh()
+        data = self._mmap
+        for base in self._active:
+            start = base + offset
+            if int.from_bytes(data[start:start + BLOCK_BYTES], 'little') & mask == mask:
+                return True
+        return False
+
+    def add(self, phone: str, template: str) -> None:
+        """Registra que la plantilla se envió hoy al teléfono."""
+        offset, mask = self._key(phone, template)
+        self._refresh()
+        data = self._mmap
+        with self._lock:
+            start = self._current + offset
+            end = start + BLOCK_BYTES
+            with self._locked():
+                block = int.from_bytes(data[start:end], 'little') | mask
+                data[start:end] = block.to_bytes(BLOCK_BYTES, 'little')
+
+    def check_and_add(self, phone: str, template: str) -> bool:
+        """Registra el envío y retorna True si ya estaba registrado (duplicado)."""
+        if self.seen(phone, template):
+            return True
+        self.add(phone, template)
+        return False
+
+    def stats(self) -> Dict[str, Any]:
+        """Parámetros del filtro y ocupación de cada día vigente."""
+        self._refresh()
+        with self._lock:
+            fill = {}
+            for k in range(self.days):
+                day = self._slot_days[k]
+                if any(day == self._today - d for d in range(self.days)):
+                    start = HEADER_SIZE + k * self._slot_bytes
+                    ones = int.from_bytes(self._mmap[start:start + self._slot_bytes], 'little').bit_count()
+                    fill[time.strftime('%Y-%m-%d', time.gmtime(day * SECONDS_PER_DAY))] = round(ones / self.bits, 4)
+
+        return {
+            'days': self.days,
+            'bits_per_day': self.bits,
+            'hashes': self.hashes,
+            'size_mb': round(os.path.getsize(self.path) / 1e6, 1),
+            'fill': fill,
+        }
+
+    def close(self) -> None:
+        self._slot_days = None
+        self._mmap.flush()
+        self._mmap.close()
+        self._file.close()
+
+
+def _patterns(hashes: int, seed: int) -> List[int]:
+    """
+    Tabla determinística de máscaras de 512 bits con `hashes` bits encendidos.
+    Es la misma en todos los procesos porque sale de blake2b, no de random.
+    """
+    patterns = []
+    for n in range(1 << PATTERN_BITS):
+        mask = 0
+        counter = 0
+        while bin(mask).count('1') < hashes:
+            digest = hashlib.blake2b(struct.pack('<BIQ', seed, n, counter), digest_size=2).digest()
+            mask |= 1 << (int.from_bytes(digest, 'little') & (BLOCK_BITS - 1))
+            counter += 1
+        patterns.append(mask)
+    return patterns
+
+
+class _FileLock:
+    """flock exclusivo sobre el archivo mientras dura el bloque with."""
+
+    def __init__(self, file):
+        self._file = file
+
+    def __enter__(self):
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_EX)
+
+    def __exit__(self, *exc):
+        fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+
+class _NoLock:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NO_LOCK = _NoLock()
+
+
+def open_suppression(job: Dict[str, Any]) -> Optional[SuppressionFilter]:
+    """Abre el filtro indicado en job['suppress'] (o None si la campaña no lo usa)."""
+    if not job.get('suppress'):
+        return None
+    return SuppressionFilter(job['suppress'], days=job.get('suppress_days', DEFAULT_DAYS))
+
+
+def main():
+    """Función principal"""
+    parser = argparse.ArgumentParser(
+        description='Consulta el filtro de supresión de duplicados',
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Ejemplos:
+  python suppression.py stats
+  python suppression.py check 5491123456789 promo_verano
+        """
+    )
+    parser.add_argument('command', choices=['stats', 'check'], help='Acción a realizar')
+    parser.add_argument('phone', nargs='?', help='Teléfono (para check)')
+    parser.add_argument('template', nargs='?', help='Plantilla (para check)')
+    parser.add_argument('--path', type=str, default=DEFAULT_PATH, help=f'Archivo del filtro (por defecto: {DEFAULT_PATH})')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"❌ No existe el archivo de supresión: {args.path}")
+        sys.exit(1)
+
+    suppression = SuppressionFilter(args.path)
+    if args.command == 'stats':
+        stats = suppression.stats()
+        print(f"📊 {stats['days']} días, {stats['bits_per_day']:,} bits por día, {stats['hashes']} hashes ({stats['size_mb']} MB)")
+        for day, fill in stats['fill'].items():
+            print(f"   {day}: {fill:.2%} ocupado")
+    else:
+        if not args.phone or not args.template:
+            parser.error("check requiere teléfono y plantilla")
+        if suppression.seen(args.phone, args.template):
+            print(f"🚫 {args.template} ya se envió a {args.phone} en los últimos {suppression.days} días")
+        else:
+            print(f"✅ {args.template} no se ha enviado a {args.phone}")
+    suppression.close()
+
+
+if __name__ == "__main__":
+    main()
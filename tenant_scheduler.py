@@ -0,0 +1,231 @@
+"""
+Planificador justo entre equipos (tenants) que comparten un WhatsAppSender
+Cuando varios equipos usan el mismo número, la campaña masiva de uno no debe
+dejar esperando a los demás. Cada tenant tiene su propia cola y las colas se
+atienden con Deficit Round Robin (DRR):
+
+- En cada vuelta, cada tenant con trabajo recibe un crédito igual a su peso y
+  despacha mientras tenga crédito. Con pesos iguales el límite de mensajes por
+  segundo del número se reparte en partes iguales; con pesos distintos, en
+  proporción a los pesos. Un tenant sin trabajo no acumula crédito.
+- Un envío nuevo de un tenant poco activo espera como máximo una vuelta, por
+  más mensajes que tenga encolados otro tenant: su p99 no depende del resto.
+- Cuotas opcionales por tenant: mensajes por segundo como máximo y mensajes
+  encolados como máximo (submit falla si se supera).
+
+Uso:
+    scheduler = TenantScheduler(WhatsAppSender(), rate=80, weights={'cobranza': 2})
+    marketing = scheduler.for_tenant('marketing')
+    marketing.send_marketing_template(phone, 'promo', ['Ana'])       # espera el resultado
+    scheduler.submit('cobranza', 'send_utility_template', phone, 'aviso', ['Ana'])
+    print(scheduler.metrics())
+"""
+
+import time
+import functools
+from collections import deque
+from concurrent.futures import Future
+from typing import Optional, Dict, Any
+from rate_limit import TokenBucket
+from metrics import LatencyWindow
+from send_scheduler import SendScheduler, SchedulerSender
+
+# Peso de los tenants no indicados en weights
+DEFAULT_WEIGHT = 1
+
+# Segundos que se miran para calcular el throughput de cada tenant
+THROUGHPUT_WINDOW = 60
+
+
+class _Tenant:
+    """Cola, crédito, cuotas y métricas de un tenant."""
+
+    def __init__(self, name: str, weight: float, rate_quota: Optional[float], max_queued: Optional[int]):
+        self.name = name
+        self.weight = weight
+        self.bucket = TokenBucket(rate_quota) if rate_quota else None
+        self.max_queued = max_queued
+        self.queue = deque()
+        self.deficit = 0.0
+
+        self.latency = LatencyWindow()
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        # (segundo, envíos completados en ese segundo) de los últimos THROUGHPUT_WINDOW segundos
+        self.per_second = deque(maxlen=THROUGHPUT_WINDOW)
+        self.created = time.monotonic()
+
+    def count_completion(self, now: float) -> None:
+        second = int(now)
+        if self.per_second and self.per_second[-1][0] == second:
+            self.per_second[-1][1] += 1
+        else:
+            self.per_second.append([second, 1])
+
+    def throughput(self, now: float) -> float:
+        since = int(now) - THROUGHPUT_WINDOW
+        elapsed = min(THROUGHPUT_WINDOW, max(1.0, now - self.created))
+        return sum(count for second, count in self.per_second if second > since) / elapsed
+
+
+class TenantScheduler(SendScheduler):
+    """
+    Colas por tenant delante de un WhatsAppSender (o SenderPool), atendidas con DRR.
+
+    Args:
+        sender: Objeto con los métodos send_* de WhatsAppSender
+        workers: Hilos de envío en total
+        rate: Mensajes por segundo permitidos (todos los tenants)
+        weights: Peso de cada tenant (por defecto 1)
+        rate_quotas: Mensajes por segundo máximos de cada tenant (opcional)
+        max_queued: Mensajes encolados máximos de cada tenant (opcional)
+    """
+
+    def __init__(
+        self,
+        sender,
+        workers: int = 8,
+        rate: float = 80,
+        weights: Optional[Dict[str, float]] = None,
+        rate_quotas: Optional[Dict[str, float]] = None,
+        max_queued: Optional[Dict[str, int]] = None
+    ):
+        if any(weight <= 0 for weight in (weights or {}).values()):
+            raise ValueError("Los pesos deben ser mayores que 0")
+
+        super().__init__(sender, rate)
+        self.weights = dict(weights or {})
+        self.rate_quotas = dict(rate_quotas or {})
+        self.max_queued = dict(max_queued or {})
+
+        self._tenants: Dict[str, _Tenant] = {}
+        # Tenants con mensajes encolados, en el orden de la ronda
+        self._active = deque()
+
+        self._start_workers([()] * workers)
+
+    def _tenant(self, name: str) -> _Tenant:
+        tenant = self._tenants.get(name)
+        if tenant is None:
+            tenant = self._tenants[name] = _Tenant(
+                name,
+                self.weights.get(name, DEFAULT_WEIGHT),
+                self.rate_quotas.get(name),
+                self.max_queued.get(name)
+            )
+        return tenant
+
+    # ===============================
+    # 📥 ENCOLAR
+    # ===============================
+    def submit(self, tenant: str, method: str, *args, **kwargs) -> Future:
+        """Encola una llamada a sender.<method>(*args, **kwargs) del tenant y retorna un Future."""
+        if not method.startswith('send_'):
+            raise ValueError(f"Método no permitido: {method}")
+
+        item = self._item(method, args, kwargs)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("El planificador está cerrado")
+
+            state = self._tenant(tenant)
+            if state.max_queued is not None and len(state.queue) >= state.max_queued:
+                state.rejected += 1
+                error_msg = (
+                    f"❌ Error: cuota de mensajes encolados agotada para '{tenant}'\n"
+                    f"Detalles: {len(state.queue)} mensajes en cola (máximo {state.max_queued})"
+                )
+                raise Exception(error_msg)
+
+            if not state.queue:
+                self._active.append(state)
+            state.queue.append(item)
+            self._cond.notify()
+        return item[3]
+
+    def for_tenant(self, tenant: str) -> SchedulerSender:
+        """Vista con los métodos send_* de WhatsAppSender que encola como `tenant`."""
+        return SchedulerSender(functools.partial(self.submit, tenant))
+
+    # ===============================
+    # ⚙️ DESPACHO
+    # ===============================
+    def _pick(self):
+        """
+        Próximo envío según DRR, o el tiempo a esperar si todos los tenants con
+        trabajo agotaron su cuota de tasa (None si no hay trabajo).
+        """
+        wait = None
+        blocked = 0
+        while self._active and blocked < len(self._active):
+            tenant = self._active[0]
+            # Los envíos cancelados se descartan sin gastar crédito ni cuota
+            while tenant.queue and tenant.queue[0][3].cancelled():
+                tenant.queue.popleft()
+            if not tenant.queue:
+                tenant.deficit = 0.0
+                self._active.popleft()
+                continue
+
+            if tenant.deficit < 1:
+                tenant.deficit += tenant.weight
+                if tenant.deficit < 1:
+                    self._active.rotate(-1)
+                    continue
+
+            if tenant.bucket is not None and not tenant.bucket.try_acquire():
+                # Sobre su cuota: se lo saltea sin perder el crédito
+                pending = (1 - tenant.bucket.available) / tenant.bucket.rate
+                wait = pending if wait is None else min(wait, pending)
+                blocked += 1
+                self._active.rotate(-1)
+                continue
+
+            tenant.deficit -= 1
+            item = tenant.queue.popleft()
+            if not tenant.queue:
+                # Sin trabajo no se guarda crédito para la próxima vez
+                tenant.deficit = 0.0
+                self._active.popleft()
+            elif tenant.deficit < 1:
+                self._active.rotate(-1)
+            return tenant, item, None
+
+        return None, None, wait
+
+    def _record(self, tenant: _Tenant, ok: bool, latency: float, now: float) -> None:
+        tenant.latency.record(latency)
+        if ok:
+            tenant.completed += 1
+        else:
+            tenant.failed += 1
+        tenant.count_completion(now)
+
+    # ===============================
+    # 📊 MÉTRICAS
+    # ===============================
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Por tenant: peso, en cola, completados, fallidos, rechazados por cuota,
+        mensajes por segundo (último minuto) y latencia desde que se encola hasta
+        que responde la API.
+        """
+        now = time.monotonic()
+        with self._cond:
+            tenants = list(self._tenants.values())
+            result = {
+                tenant.name: {
+                    'weight': tenant.weight,
+                    'queued': len(tenant.queue),
+                    'completed': tenant.completed,
+                    'failed': tenant.failed,
+                    'rejected': tenant.rejected,
+                    'throughput': round(tenant.throughput(now), 2),
+                }
+                for tenant in tenants
+            }
+        for tenant in tenants:
+            result[tenant.name].update(tenant.latency.snapshot())
+        return result
+
@@ -7,6 +7,7 @@ import sys
 import os
 import argparse
 from whatsapp_sender import WhatsAppSender
+from send_result import message_id_of
 from dotenv import load_dotenv
 
 # Configurar codificación UTF-8 para Windows
@@ -102,7 +103,7 @@ Ejemplos:
             language_code=args.lang
         )
         
-        message_id = result.get('messages', [{}])[0].get('id', 'N/A')
+        message_id = message_id_of(result)
         
         print("✅ Template enviado exitosamente!")
         print(f"   Message ID: {message_id}")
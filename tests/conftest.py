@@ -0,0 +1,24 @@
+"""
+Configuración común de las pruebas
+Los módulos del proyecto están en la raíz del repositorio y leen las
+credenciales del entorno: cada prueba corre con credenciales falsas y sin .env.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(autouse=True)
+def credenciales(monkeypatch):
+    """Credenciales falsas de un solo número (ninguna prueba toca la red)."""
+    for name in (
+        'WHATSAPP_PHONE_NUMBER_IDS', 'WHATSAPP_ACCESS_TOKENS', 'WHATSAPP_BUSINESS_ACCOUNT_IDS',
+        'WHATSAPP_RECORD', 'WHATSAPP_REPLAY', 'WHATSAPP_SUPPRESSION_PATH'
+    ):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv('WHATSAPP_ACCESS_TOKEN', 'test-token')
+    monkeypatch.setenv('WHATSAPP_PHONE_NUMBER_ID', '100000000000001')
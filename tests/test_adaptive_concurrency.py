@@ -0,0 +1,36 @@
+"""
+Pruebas de adaptive_concurrency.py: la latencia medida no incluye la espera por el límite de tasa.
+"""
+
+import time
+
+from adaptive_concurrency import AdaptiveLimiter, AdaptiveSender
+from sender_pool import SenderPool
+
+PHONE_NUMBER_ID = '100000000000001'
+
+
+class SlowBucket:
+    """Límite de tasa que siempre hace esperar."""
+
+    def acquire(self, tokens=1.0, timeout=None, reserve=0.0):
+        time.sleep(0.05)
+        return True
+
+
+class FastTransport:
+    def send(self, url, headers, payload):
+        return {'contacts': [{'wa_id': payload['to']}], 'messages': [{'id': 'wamid.1'}]}
+
+
+def test_latency_excludes_rate_limit_wait():
+    pool = SenderPool.from_env(transport=FastTransport(), typed_results=True, buckets={PHONE_NUMBER_ID: SlowBucket()})
+    limiter = AdaptiveLimiter()
+    sender = AdaptiveSender(pool, limiter)
+
+    for _ in range(3):
+        sender.send_text_message('56911111111', 'Hola')
+
+    # Solo se mide la llamada a la API, no los 50 ms de espera por el token
+    assert limiter.metrics()['completed'] == 3
+    assert limiter.metrics()['p50_ms'] < 25
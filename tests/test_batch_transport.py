@@ -0,0 +1,87 @@
+"""
+Pruebas de batch_transport.py: lotes, errores por operación y cierre con envíos concurrentes.
+"""
+
+import json
+import threading
+
+import pytest
+
+from batch_transport import GraphBatchTransport
+from graph_errors import GraphAPIError
+
+URL = 'https://graph.facebook.com/v21.0/100000000000001/messages'
+HEADERS = {'Authorization': 'Bearer test-token'}
+
+
+class BatchSession:
+    """Responde cada operación del lote; los teléfonos en `fail` reciben un 400 con código de Meta."""
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.batches = []
+
+    def post(self, url, headers, data, timeout):
+        operations = json.loads(data['batch'])
+        self.batches.append(len(operations))
+        results = []
+        for operation in operations:
+            to = operation['body'].split('to=')[1].split('&')[0]
+            if to in self.fail:
+                results.append({'code': 400, 'body': json.dumps({'error': {'code': 131026}})})
+            else:
+                results.append({'code': 200, 'body': json.dumps({'messages': [{'id': f"wamid.{to}"}]})})
+        return _Response(results)
+
+
+class _Response:
+    def __init__(self, results):
+        self.results = results
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.results
+
+
+def test_messages_share_a_batch_and_get_their_own_result():
+    session = BatchSession(fail={'2'})
+    transport = GraphBatchTransport(linger=0.05, session=session)
+    futures = [transport.submit(URL, HEADERS, {'to': str(i), 'type': 'text'}) for i in range(5)]
+    transport.close()
+
+    assert session.batches == [5]
+    assert futures[0].result()['messages'][0]['id'] == 'wamid.0'
+    with pytest.raises(GraphAPIError) as info:
+        futures[2].result()
+    assert info.value.code == 131026
+
+
+def test_close_resolves_every_accepted_message():
+    """Lo que submit() aceptó se envía aunque close() llegue en medio; lo demás se rechaza."""
+    session = BatchSession()
+    transport = GraphBatchTransport(linger=0.001, session=session)
+    accepted, rejected = [], []
+    lock = threading.Lock()
+
+    def submit_many():
+        for i in range(200):
+            try:
+                future = transport.submit(URL, HEADERS, {'to': str(i), 'type': 'text'})
+            except RuntimeError:
+                with lock:
+                    rejected.append(i)
+                continue
+            with lock:
+                accepted.append(future)
+
+    threads = [threading.Thread(target=submit_many) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    transport.close()
+    for thread in threads:
+        thread.join()
+
+    assert all(future.done() for future in accepted)
+    assert len(accepted) + len(rejected) == 800
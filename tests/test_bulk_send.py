@@ -0,0 +1,216 @@
+"""
+Pruebas de bulk_send.py: reanudar campañas con --resume, validación, circuito y filas ambiguas.
+"""
+
+import csv
+import multiprocessing
+
+import pytest
+import requests
+
+import bulk_send
+from campaign_checkpoint import CampaignCheckpoint, campaign_fingerprint, IN_FLIGHT
+from circuit_breaker import CircuitOpenError
+from recipient_store import RecipientStore
+from graph_errors import GraphAPIError
+from payload_validation import MAX_TEXT_CHARS
+from sender_pool import SenderPool
+from whatsapp_sender_v2 import WhatsAppSender
+
+
+class FlakyTransport:
+    """Responde como la API; falla una vez para los teléfonos indicados."""
+
+    def __init__(self, fail_once=()):
+        self.fail_once = set(fail_once)
+        self.sent = []
+
+    def send(self, url, headers, payload):
+        to = payload['to']
+        if to in self.fail_once:
+            self.fail_once.discard(to)
+            raise GraphAPIError("❌ Error enviando mensaje: HTTP 500\nDetalles: {}", 500, {})
+        self.sent.append(payload)
+        return {'contacts': [{'wa_id': to}], 'messages': [{'id': f"wamid.{to}.{len(self.sent)}"}]}
+
+
+def _marketing_job(image):
+    return {
+        'tipo': 'marketing',
+        'template': 'promo',
+        'language': 'es',
+        'image': image,
+        'message': None,
+        'batch_linger': None,
+        'dry_run': None,
+        'suppress': False,
+        'adaptive': None,
+        'pair_interval': 0,
+        'validate': 'reject',
+    }
+
+
+def test_resume_marketing_with_local_image(tmp_path, monkeypatch):
+    """Cada ejecución sube la imagen local con otra URL y aun así --resume reconoce la campaña."""
+    recipients = tmp_path / 'clientes.csv'
+    recipients.write_text('phone,nombre\n56911111111,Ana\n56922222222,Luis\n56933333333,Eva\n', encoding='utf-8')
+    image = tmp_path / 'promo.jpg'
+    image.write_bytes(b'\xff\xd8\xff')
+    output = tmp_path / 'resultados.csv'
+
+    uploads = []
+
+    def upload_media(self, file_path, media_type='image'):
+        uploads.append(file_path)
+        return f"https://cdn.example.com/promo-{len(uploads)}.jpg"
+
+    monkeypatch.setattr(WhatsAppSender, 'upload_media', upload_media)
+
+    transport = FlakyTransport(fail_once={'56922222222'})
+
+    def make_sender(job, **kwargs):
+        return SenderPool.from_env(transport=transport, typed_results=True, **kwargs), None
+
+    monkeypatch.setattr(bulk_send, 'make_sender', make_sender)
+
+    job = _marketing_job(str(image))
+    first = bulk_send.run_campaign(str(recipients), job, str(output), workers=2)
+    assert first == {'ok': 2, 'error': 1, 'suppressed': 0}
+
+    second = bulk_send.run_campaign(str(recipients), job, str(output), workers=2, resume=True)
+    assert second == {'ok': 1, 'error': 0, 'suppressed': 0}
+
+    # La imagen se subió en cada ejecución, solo se reintentó la fila fallida
+    assert len(uploads) == 2
+    assert [payload['to'] for payload in transport.sent].count('56922222222') == 1
+    assert len(transport.sent) == 3
+
+    with open(output, newline='', encoding='utf-8') as file:
+        statuses = [row['status'] for row in csv.DictReader(file)]
+    assert statuses.count('ok') == 3
+
+
+def test_text_is_validated_once_and_fixed(monkeypatch):
+    """run_rows valida (y corrige) el texto; el sender de la campaña no vuelve a validar."""
+    transport = FlakyTransport()
+    job = {'tipo': 'text', 'message': 'Hola {0}', 'pair_interval': 0, 'validate': 'fix'}
+    sender, _ = bulk_send.make_sender(job)
+    assert all(member.sender.validator is None for member in sender.members)
+    for member in sender.members:
+        member.sender.transport = transport
+
+    results = []
+    bulk_send.run_rows(sender, job, [(0, '56911111111', ['a' * 5000])], 1, results.append)
+
+    # El texto largo se recortó al máximo de la API en vez de fallar
+    assert results[0][2] == 'ok'
+    assert len(transport.sent[0]['text']['body']) == MAX_TEXT_CHARS
+
+
+def test_parked_row_fails_after_circuit_max_wait(monkeypatch):
+    class DownSender:
+        calls = 0
+
+        def send_text_message(self, to, message):
+            DownSender.calls += 1
+            raise CircuitOpenError('messages', 0)
+
+    monkeypatch.setattr(bulk_send, 'CIRCUIT_MAX_WAIT', 0.05)
+    monkeypatch.setattr(bulk_send, 'CIRCUIT_RETRY_MIN', 0.01)
+    job = {'tipo': 'text', 'message': 'Hola {0}', 'pair_interval': 0, 'validate': None}
+    results = []
+    bulk_send.run_rows(DownSender(), job, [(0, '56911111111', ['Ana'])], 1, results.append)
+
+    assert results[0][2] == 'error' and 'circuito' in results[0][4]
+    assert DownSender.calls > 1
+
+
+class TimeoutTransport(FlakyTransport):
+    """Como FlakyTransport, pero a los teléfonos indicados les falla una vez con el error dado."""
+
+    def __init__(self, errors):
+        super().__init__()
+        self.errors = dict(errors)
+
+    def send(self, url, headers, payload):
+        error = self.errors.pop(payload['to'], None)
+        if error is not None:
+            raise error
+        return super().send(url, headers, payload)
+
+
+def _text_campaign(tmp_path, monkeypatch, transport, phones):
+    recipients = tmp_path / 'clientes.csv'
+    recipients.write_text('phone,nombre\n' + ''.join(f"{phone},Ana\n" for phone in phones), encoding='utf-8')
+
+    def make_sender(job, **kwargs):
+        return SenderPool.from_env(transport=transport, typed_results=True, **kwargs), None
+
+    monkeypatch.setattr(bulk_send, 'make_sender', make_sender)
+    job = {'tipo': 'text', 'message': 'Hola {0}', 'pair_interval': 0, 'validate': 'reject'}
+    return str(recipients), job, str(tmp_path / 'resultados.csv')
+
+
+def test_ambiguous_errors_are_unknown_and_not_resent(tmp_path, monkeypatch):
+    """Un timeout de lectura queda desconocido (no se reenvía); un error al conectar se reintenta."""
+    transport = TimeoutTransport({
+        '56911111111': requests.exceptions.ReadTimeout('Read timed out'),
+        '56922222222': requests.exceptions.ConnectTimeout('Connect timed out'),
+    })
+    recipients, job, output = _text_campaign(tmp_path, monkeypatch, transport, ['56911111111', '56922222222', '56933333333'])
+
+    first = bulk_send.run_campaign(recipients, job, output, workers=1)
+    assert first == {'ok': 1, 'error': 2, 'suppressed': 0}
+    checkpoint = CampaignCheckpoint(f"{output}.ckpt")
+    assert checkpoint.counts()['unknown'] == 1 and checkpoint.counts()['failed'] == 1
+    checkpoint.close()
+    with open(output, newline='', encoding='utf-8') as file:
+        errors = {row['phone']: row['error'] for row in csv.DictReader(file)}
+    assert errors['56911111111'].startswith(bulk_send.UNKNOWN_ERROR)
+
+    second = bulk_send.run_campaign(recipients, job, output, workers=1, resume=True)
+    assert second == {'ok': 1, 'error': 0, 'suppressed': 0}
+    assert [payload['to'] for payload in transport.sent] == ['56933333333', '56922222222']
+
+
+def test_resume_rejects_edited_recipients(tmp_path, monkeypatch):
+    """La huella incluye el contenido: el mismo número de filas con otros teléfonos no se reanuda."""
+    recipients, job, output = _text_campaign(tmp_path, monkeypatch, FlakyTransport(), ['56911111111', '56922222222'])
+    bulk_send.run_campaign(recipients, job, output, workers=1)
+
+    with open(recipients, 'w', encoding='utf-8') as file:
+        file.write('phone,nombre\n56922222222,Ana\n56911111111,Ana\n')
+    with pytest.raises(Exception, match='otra campaña'):
+        bulk_send.run_campaign(recipients, job, output, workers=1, resume=True)
+
+
+def test_process_worker_failure_marks_checkpoint(tmp_path, monkeypatch):
+    """Si el proceso no puede crear el enviador, sus filas quedan fallidas también en el checkpoint."""
+    store = RecipientStore()
+    for phone in ('56911111111', '56922222222', '56933333333'):
+        store.append(phone)
+    job = {'tipo': 'text', 'message': 'Hola', 'pair_interval': 0, 'validate': None}
+    path = str(tmp_path / 'campania.ckpt')
+    checkpoint = CampaignCheckpoint.create(path, len(store), campaign_fingerprint(job, len(store)))
+    # La fila 2 quedó en vuelo en una ejecución anterior y no se reanudó (no debería pasar)
+    checkpoint.mark(2, IN_FLIGHT)
+    checkpoint.close()
+
+    def make_sender(job, **kwargs):
+        raise ValueError('sin credenciales')
+
+    monkeypatch.setattr(bulk_send, 'make_sender', make_sender)
+    parent, child = multiprocessing.Pipe(duplex=False)
+    bulk_send._process_worker(child, store, 0, 1, job, {}, 1, 10.0, path)
+
+    results = []
+    message = parent.recv()
+    while message is not None:
+        results.extend(message)
+        message = parent.recv()
+    assert [(row, status, error) for row, _, status, _, error in results] == [
+        (0, 'error', 'sin credenciales'), (1, 'error', 'sin credenciales')
+    ]
+    checkpoint = CampaignCheckpoint(path)
+    assert checkpoint.counts()['failed'] == 2 and checkpoint.counts()['in_flight'] == 1
+    checkpoint.close()
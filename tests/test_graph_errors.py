@@ -0,0 +1,69 @@
+"""
+Pruebas de graph_errors.py: errores tipados del sender y su clasificación compartida.
+"""
+
+import json
+
+import pytest
+
+from adaptive_concurrency import is_throttle_error
+from graph_errors import GraphAPIError, graph_error_code, is_pair_rate_error, is_throttling_error
+from http_transport import HTTPTransport
+from sender_pool import is_member_failure
+from whatsapp_sender_v2 import WhatsAppSender
+
+
+class ErrorTransport(HTTPTransport):
+    """Responde siempre con el status y el código de error de Meta indicados."""
+
+    def __init__(self, status, code):
+        self.status = status
+        self.code = code
+
+    def post(self, url, headers, body):
+        return self.status, json.dumps({'error': {'message': 'error', 'code': self.code}}).encode('utf-8')
+
+
+def _error(status, code):
+    sender = WhatsAppSender(transport=ErrorTransport(status, code))
+    with pytest.raises(GraphAPIError) as info:
+        sender.send_text_message('56912345678', 'Hola')
+    return info.value
+
+
+def test_sender_raises_typed_error_with_meta_code():
+    error = _error(400, 131056)
+    assert error.status == 400
+    assert graph_error_code(error) == 131056
+    assert "Detalles: {'error'" in str(error)
+
+
+@pytest.mark.parametrize('status, code', [(400, 131048), (400, 613), (400, 130429), (400, 80007), (429, 4)])
+def test_throttling_codes_are_classified_the_same_everywhere(status, code):
+    error = _error(status, code)
+    assert is_throttling_error(error)
+    assert is_throttle_error(error)
+    assert is_member_failure(error)
+    assert not is_pair_rate_error(error)
+
+
+def test_pair_rate_error_is_not_a_member_failure():
+    error = _error(400, 131056)
+    assert is_pair_rate_error(error)
+    assert not is_throttling_error(error)
+    assert not is_member_failure(error)
+
+
+def test_server_and_message_errors():
+    assert is_member_failure(_error(503, 1)) and is_throttle_error(_error(503, 1))
+    # Un número inválido es del mensaje, no del número ni una sobrecarga
+    invalid = _error(400, 131026)
+    assert not is_member_failure(invalid) and not is_throttle_error(invalid)
+    # Un error envuelto conserva el código en su causa
+    try:
+        try:
+            raise invalid
+        except GraphAPIError as e:
+            raise Exception("❌ Error en el envío") from e
+    except Exception as wrapped:
+        assert graph_error_code(wrapped) == 131026
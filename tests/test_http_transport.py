@@ -0,0 +1,51 @@
+"""
+Pruebas de http_transport.py contra la Graph API simulada de bench_transport.py.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bench_transport import MockGraphServer
+from http_transport import RequestsTransport, HTTP2Transport
+from whatsapp_sender_v2 import WhatsAppSender
+
+
+@pytest.fixture
+def server():
+    server = MockGraphServer(latency=0.01)
+    yield server
+    server.close()
+
+
+def _send_many(server, transport, count=20):
+    sender = WhatsAppSender(access_token='test', phone_number_id='000000000000000', transport=transport)
+    sender.base_url = server.url('/v21.0/000000000000000/messages')
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        return list(executor.map(lambda i: sender.send_text_message(f"569{i:08d}", 'Hola'), range(count)))
+
+
+def test_requests_transport(server):
+    transport = RequestsTransport()
+    results = _send_many(server, transport)
+    transport.close()
+
+    assert len({result['messages'][0]['id'] for result in results}) == 20
+    assert [result['contacts'][0]['wa_id'] for result in results] == [f"569{i:08d}" for i in range(20)]
+    assert server.requests == 20
+
+
+def test_http2_transport_multiplexes_on_one_connection(server):
+    pytest.importorskip('httpx')
+    pytest.importorskip('h2')
+    assert server.supports_http2
+
+    transport = HTTP2Transport(max_connections=1, prior_knowledge=True)
+    results = _send_many(server, transport)
+    transport.close()
+
+    assert len({result['messages'][0]['id'] for result in results}) == 20
+    assert [result['contacts'][0]['wa_id'] for result in results] == [f"569{i:08d}" for i in range(20)]
+    # Los 8 envíos en vuelo comparten una sola conexión h2c
+    assert server.connections == 1
+    assert server.requests == 20
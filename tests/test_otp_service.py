@@ -0,0 +1,52 @@
+"""
+Pruebas de otp_service.py: el payload pre-armado es el mismo que arma el sender.
+"""
+
+import pytest
+
+from otp_service import OTPService, OTP_VALID
+from whatsapp_sender_v2 import WhatsAppSender
+
+
+class RecordingTransport:
+    def __init__(self):
+        self.payloads = []
+
+    def send(self, url, headers, payload):
+        self.payloads.append(payload)
+        return {'contacts': [{'wa_id': payload['to']}], 'messages': [{'id': 'wamid.otp'}]}
+
+
+class TemplateOnlySender:
+    """Sender que no es WhatsAppSender (como SenderPool o DaemonSender)."""
+
+    def __init__(self, sender):
+        self.sender = sender
+
+    def send_template_message(self, *args):
+        return self.sender.send_template_message(*args)
+
+
+@pytest.mark.parametrize('copy_code_button', [False, True])
+def test_prerendered_payload_matches_template_message(copy_code_button):
+    transport = RecordingTransport()
+    sender = WhatsAppSender(transport=transport, validate='fix')
+    fast = OTPService(sender, 'codigo', language_code='es-cl', copy_code_button=copy_code_button)
+    slow = OTPService(TemplateOnlySender(sender), 'codigo', language_code='es_CL', copy_code_button=copy_code_button)
+
+    fast.send('+56 9 1234 5678', '123456')
+    slow.send('+56 9 1234 5678', '123456')
+
+    assert transport.payloads[0] == transport.payloads[1]
+    assert transport.payloads[0]['template']['language']['code'] == 'es_CL'
+    assert len(transport.payloads[0]['template']['components']) == (2 if copy_code_button else 1)
+
+
+def test_issue_and_verify():
+    transport = RecordingTransport()
+    otp = OTPService(WhatsAppSender(transport=transport), 'codigo')
+    code = otp.issue('56912345678')
+
+    sent = transport.payloads[0]['template']['components'][0]['parameters'][0]['text']
+    assert sent == code
+    assert otp.verify('56912345678', code) == OTP_VALID
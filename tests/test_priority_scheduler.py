@@ -0,0 +1,106 @@
+"""
+Pruebas de priority_scheduler.py y de los carriles en send_service.py.
+"""
+
+import time
+import threading
+
+from priority_scheduler import PriorityScheduler
+from rate_limit import SharedTokenBucket
+from send_service import SendService
+
+
+class GatedSender:
+    """Sender falso: registra el orden de los envíos y espera la compuerta antes de cada uno."""
+
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+
+    def _send(self, to):
+        self.gate.wait()
+        with self._lock:
+            self.calls.append(to)
+        return {'messages': [{'id': f"wamid.{to}"}]}
+
+    def send_marketing_template(self, to, *args):
+        return self._send(to)
+
+    def send_authentication_template(self, to, *args):
+        return self._send(to)
+
+
+def test_strict_lanes_send_otp_first():
+    sender = GatedSender()
+    scheduler = PriorityScheduler(sender, workers=2, auth_workers=1, rate=1e6)
+    sender.gate.clear()
+    blocker = scheduler.submit('send_marketing_template', 'm0', 'promo', [])
+    while scheduler.metrics()['marketing']['queued']:
+        time.sleep(0.001)
+
+    marketing = [scheduler.submit('send_marketing_template', f"m{i}", 'promo', []) for i in range(1, 4)]
+    otp = scheduler.submit('send_authentication_template', 'otp', 'codigo', '123456')
+    sender.gate.set()
+    for future in [blocker, otp] + marketing:
+        future.result(timeout=5)
+    scheduler.close()
+
+    assert sender.calls.index('otp') < sender.calls.index('m1')
+
+
+def test_cancelled_send_does_not_take_token():
+    sender = GatedSender()
+    # Dos tokens y sin reserva: uno para el envío que bloquea y otro para el que sigue
+    scheduler = PriorityScheduler(sender, workers=2, auth_workers=1, rate=2, auth_reserve=0)
+    sender.gate.clear()
+    first = scheduler.submit('send_marketing_template', 'gate', 'promo', [])
+    while scheduler.metrics()['marketing']['queued']:
+        time.sleep(0.001)
+
+    cancelled = scheduler.submit('send_marketing_template', 'cancelado', 'promo', [])
+    assert cancelled.cancel()
+    following = scheduler.submit('send_marketing_template', 'siguiente', 'promo', [])
+
+    start = time.monotonic()
+    sender.gate.set()
+    first.result(timeout=5)
+    following.result(timeout=5)
+    elapsed = time.monotonic() - start
+    scheduler.close()
+
+    assert 'cancelado' not in sender.calls
+    assert elapsed < 0.3
+
+
+def test_send_methods_wait_for_result():
+    scheduler = PriorityScheduler(GatedSender(), workers=2, rate=1e6)
+    result = scheduler.send_authentication_template('56912345678', 'otp', '123456')
+    scheduler.close()
+    assert result['messages'][0]['id'] == 'wamid.56912345678'
+
+
+def test_reserve_works_with_shared_bucket():
+    scheduler = PriorityScheduler(GatedSender(), workers=2, rate=1e6)
+    scheduler.bucket = SharedTokenBucket(1e6)
+    assert scheduler.send_marketing_template('56912345678', 'promo', [])['messages']
+    scheduler.close()
+
+
+def test_send_service_serves_otp_before_queued_marketing():
+    sender = GatedSender()
+    service = SendService(sender, workers=1)
+    sender.gate.clear()
+    blocker = service.submit('send_marketing_template', ['m0', 'promo'], {}, wait=True)
+    while service.health()['queued']:
+        time.sleep(0.001)
+
+    marketing = [service.submit('send_marketing_template', [f"m{i}", 'promo'], {}, wait=True) for i in range(1, 4)]
+    otp = service.submit('send_authentication_template', ['otp', 'codigo', '123456'], {}, wait=True)
+    sender.gate.set()
+    for job in [blocker, otp] + marketing:
+        assert job.future.result(timeout=5)['status'] == 'sent'
+    service.close()
+
+    assert sender.calls == ['m0', 'otp', 'm1', 'm2', 'm3']
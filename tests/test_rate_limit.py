@@ -0,0 +1,21 @@
+"""
+Pruebas de rate_limit.py: TokenBucket y SharedTokenBucket tienen la misma interfaz.
+"""
+
+import pytest
+
+from rate_limit import TokenBucket, SharedTokenBucket
+
+
+@pytest.mark.parametrize('bucket_class', [TokenBucket, SharedTokenBucket])
+def test_reserve_keeps_tokens_for_priority_traffic(bucket_class):
+    bucket = bucket_class(rate=0.001, capacity=4)
+    # Con 2 tokens reservados, el tráfico normal solo toma 2 de los 4
+    assert bucket.try_acquire(reserve=2)
+    assert bucket.acquire(reserve=2, timeout=0.01)
+    assert not bucket.try_acquire(reserve=2)
+    assert not bucket.acquire(reserve=2, timeout=0.01)
+    # El tráfico prioritario (sin reserva) usa lo reservado
+    assert bucket.acquire(timeout=0.01)
+    assert bucket.try_acquire()
+    assert not bucket.try_acquire()
@@ -0,0 +1,103 @@
+"""
+Pruebas de recipient_store.py: ida y vuelta por archivo, columnas sobre el mmap y rows() con skip.
+"""
+
+import pickle
+
+import pytest
+
+import recipient_store
+from recipient_store import RecipientStore
+
+ROWS = [
+    ('+56 9 1111-1111', ['Ana', 'Santiago']),
+    ('56922222222', ['Luis', 'Temuco']),
+    ('no-es-telefono', ['Eva', 'Santiago']),
+    ('0056933333333', ['Ana', '']),
+    ('56944444444', ['José ñandú', 'Arica']),
+]
+
+
+def _store():
+    store = RecipientStore(['nombre', 'ciudad'])
+    for phone, params in ROWS:
+        store.append(phone, params)
+    return store
+
+
+def _expected():
+    return [(i, _store().phone(i), params) for i, (_, params) in enumerate(ROWS)]
+
+
+def test_save_and_open_round_trip(tmp_path):
+    path = str(tmp_path / 'clientes.rcp')
+    _store().save(path)
+    store = RecipientStore.open(path)
+
+    assert len(store) == len(ROWS)
+    assert store.columns == ['nombre', 'ciudad']
+    assert list(store) == _expected()
+    # Los teléfonos no numéricos o con cero inicial se guardan tal cual
+    assert [store.phone(i) for i in range(len(store))] == [
+        '56911111111', '56922222222', 'noestelefono', '0056933333333', '56944444444'
+    ]
+    assert store.params(4) == ['José ñandú', 'Arica']
+    with pytest.raises(ValueError):
+        store.append('56955555555', ['Ema', 'Arica'])
+
+    # Entre procesos se reabre el archivo
+    assert list(pickle.loads(pickle.dumps(store))) == _expected()
+
+
+def test_large_columns_stay_on_the_mmap(tmp_path, monkeypatch):
+    monkeypatch.setattr(recipient_store, 'MATERIALIZE_VALUES', 2)
+    path = str(tmp_path / 'clientes.rcp')
+    _store().save(path)
+    store = RecipientStore.open(path)
+
+    names, cities = store._params
+    # 'nombre' tiene 4 valores distintos (más que el límite): se lee del mmap
+    assert isinstance(names.values, recipient_store._MappedStrings)
+    assert list(names.values) == ['Ana', 'Luis', 'Eva', 'José ñandú']
+    assert isinstance(store._raw_phones, recipient_store._MappedRawPhones)
+    assert list(store) == _expected()
+
+
+def test_open_rejects_other_files(tmp_path):
+    path = tmp_path / 'clientes.csv'
+    path.write_bytes(b'phone,nombre\n56911111111,Ana\n')
+    with pytest.raises(ValueError):
+        RecipientStore.open(str(path))
+
+
+def test_rows_with_step_stop_and_skip(tmp_path):
+    path = str(tmp_path / 'clientes.rcp')
+    _store().save(path)
+    store = RecipientStore.open(path)
+    expected = _expected()
+
+    assert list(store.rows(skip=lambda index: index % 2 == 0)) == [expected[1], expected[3]]
+    assert list(store.rows(start=1, step=2)) == [expected[1], expected[3]]
+    assert list(store.rows(start=1, stop=3)) == expected[1:3]
+    assert list(store.rows(stop=4, skip={0, 2}.__contains__)) == [expected[1], expected[3]]
+
+
+def test_from_csv_skips_rows_without_phone(tmp_path):
+    path = tmp_path / 'clientes.csv'
+    path.write_text('nombre,phone\nAna,56911111111\nLuis,\nEva,56922222222\n', encoding='utf-8')
+    store = RecipientStore.from_csv(str(path))
+    assert store.columns == ['nombre']
+    assert list(store) == [(0, '56911111111', ['Ana']), (1, '56922222222', ['Eva'])]
+
+
+def test_digest_follows_content(tmp_path):
+    path = str(tmp_path / 'clientes.rcp')
+    _store().save(path)
+    # Igual en memoria y abierto desde el archivo
+    assert RecipientStore.open(path).digest() == _store().digest()
+
+    edited = RecipientStore(['nombre', 'ciudad'])
+    for phone, params in reversed(ROWS):
+        edited.append(phone, params)
+    assert len(edited) == len(ROWS)
+    assert edited.digest() != _store().digest()
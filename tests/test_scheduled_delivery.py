@@ -0,0 +1,69 @@
+"""
+Pruebas de la rueda de tiempo de scheduled_delivery.py: bajada entre niveles, heap de
+desborde y orden por vencimiento.
+"""
+
+import random
+
+from scheduled_delivery import TimingWheel
+
+
+def _release_ticks(wheel, items, until):
+    """Avanza de a un tick y retorna {item: tick en que salió}."""
+    released = {}
+    for tick in range(wheel.current + 1, until + 1):
+        for item in wheel.advance(tick):
+            assert item not in released
+            released[item] = tick
+    return released
+
+
+def test_items_cascade_across_levels_and_fire_on_time():
+    # 4 + 4 + 4 ranuras: los niveles cubren 64 ticks
+    wheel = TimingWheel(1000, bits=(2, 2, 2))
+    rng = random.Random(7)
+    items = {f"m{i}": 1000 + rng.randint(1, 63) for i in range(300)}
+    for item, tick in items.items():
+        wheel.add(tick, item)
+    assert wheel.size == 300
+    # La mayoría queda en los niveles superiores y debe bajar antes de vencer
+    assert sum(len(slot) for slot in wheel.levels[0]) < 300
+
+    released = _release_ticks(wheel, items, 1063)
+    assert released == items
+    assert wheel.size == 0
+
+
+def test_overflow_heap_items_fire_on_time():
+    wheel = TimingWheel(0, bits=(2, 2, 2))
+    items = {'lejos': 200, 'muy_lejos': 1000, 'borde': 64, 'cerca': 3}
+    for item, tick in items.items():
+        wheel.add(tick, item)
+    # Más allá del alcance de los niveles esperan en el heap
+    assert len(wheel._overflow) == 3
+
+    released = _release_ticks(wheel, items, 1000)
+    assert released == items
+
+
+def test_advance_returns_items_in_due_order():
+    wheel = TimingWheel(0, bits=(2, 2, 2))
+    rng = random.Random(3)
+    ticks = [rng.randint(1, 500) for _ in range(200)]
+    for number, tick in enumerate(ticks):
+        wheel.add(tick, (tick, number))
+
+    first = wheel.advance(250)
+    rest = wheel.advance(500)
+
+    # Un solo advance que cruza muchos ticks entrega en orden de vencimiento
+    assert [tick for tick, _ in first] == sorted(tick for tick in ticks if tick <= 250)
+    assert [tick for tick, _ in rest] == sorted(tick for tick in ticks if tick > 250)
+
+
+def test_past_and_current_ticks_are_ready_on_next_advance():
+    wheel = TimingWheel(100)
+    wheel.add(90, 'atrasado')
+    wheel.add(100, 'ahora')
+    assert sorted(wheel.advance(100)) == ['ahora', 'atrasado']
+    assert wheel.size == 0
@@ -0,0 +1,45 @@
+"""
+Pruebas de send_result.py: campos leídos de los bytes y respuesta completa solo con keep_raw.
+"""
+
+import json
+
+import pytest
+
+from send_result import SendResult
+from whatsapp_sender_v2 import WhatsAppSender
+
+RESPONSE = {
+    'messaging_product': 'whatsapp',
+    'contacts': [{'input': '56911111111', 'wa_id': '56911111111'}],
+    'messages': [{'id': 'wamid.1', 'message_status': 'accepted'}],
+}
+
+
+class StaticTransport:
+    def send(self, url, headers, payload):
+        return RESPONSE
+
+
+def test_fields_are_read_from_bytes():
+    result = SendResult.from_bytes(json.dumps(RESPONSE).encode('utf-8'), 0.5)
+    assert (result.message_id, result.wa_id, result.message_status) == ('wamid.1', '56911111111', 'accepted')
+    assert result.latency == 0.5
+
+
+def test_raw_is_none_unless_kept():
+    body = json.dumps(RESPONSE).encode('utf-8')
+    assert SendResult.from_bytes(body).raw is None
+    with pytest.raises(ValueError):
+        SendResult.from_bytes(body).get('messages')
+    assert SendResult.from_bytes(body, keep_raw=True).raw == RESPONSE
+
+
+def test_sender_forwards_keep_raw():
+    plain = WhatsAppSender(transport=StaticTransport(), typed_results=True)
+    kept = WhatsAppSender(transport=StaticTransport(), typed_results=True, keep_raw=True)
+
+    assert plain.send_text_message('56911111111', 'Hola').raw is None
+    result = kept.send_text_message('56911111111', 'Hola')
+    assert result.raw == RESPONSE
+    assert result.get('contacts') == RESPONSE['contacts']
@@ -0,0 +1,68 @@
+"""
+Pruebas de send_service.py: límite del cuerpo de un envío individual, también con chunked.
+"""
+
+import http.client
+import json
+import threading
+
+import pytest
+
+import send_service
+from send_service import SendService, SendServiceServer
+
+
+class Sender:
+    def send_text_message(self, to, message):
+        return {'contacts': [{'wa_id': to}], 'messages': [{'id': 'wamid.1'}]}
+
+
+@pytest.fixture
+def server(monkeypatch):
+    monkeypatch.setattr(send_service, 'MAX_BODY_BYTES', 1024)
+    service = SendService(Sender(), workers=1)
+    server = SendServiceServer(service, port=0, token='')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+    service.close()
+
+
+def _post_chunked(server, chunks):
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+    conn.putrequest('POST', '/messages?wait=1')
+    conn.putheader('Transfer-Encoding', 'chunked')
+    conn.endheaders()
+    try:
+        for chunk in chunks:
+            conn.send(b'%x\r\n%s\r\n' % (len(chunk), chunk))
+        conn.send(b'0\r\n\r\n')
+    except (BrokenPipeError, ConnectionResetError):
+        # El servidor ya respondió 413 y cerró sin leer el resto
+        pass
+    response = conn.getresponse()
+    body = json.loads(response.read())
+    conn.close()
+    return response.status, body
+
+
+def test_chunked_body_within_limit_is_sent(server):
+    item = json.dumps({'method': 'send_text_message', 'args': ['56911111111', 'Hola']}).encode('utf-8')
+    status, body = _post_chunked(server, [item[:10], item[10:]])
+    assert status == 200 and body['status'] == 'sent'
+
+
+def test_chunked_body_over_limit_is_rejected(server):
+    filler = b' ' * 600
+    item = json.dumps({'method': 'send_text_message', 'args': ['56911111111', 'Hola']}).encode('utf-8')
+    status, body = _post_chunked(server, [filler, filler, item])
+    assert status == 413 and '1024' in body['error']
+
+
+def test_content_length_over_limit_is_rejected(server):
+    conn = http.client.HTTPConnection('127.0.0.1', server.server_address[1], timeout=5)
+    conn.request('POST', '/messages', body=b' ' * 2000)
+    response = conn.getresponse()
+    assert response.status == 413
+    conn.close()
@@ -0,0 +1,176 @@
+"""
+Pruebas de shard_coordinator.py: leases, retoma de shards vencidos, fencing, destinatarios
+y unión de resultados.
+"""
+
+import csv
+import sqlite3
+import time
+
+import pytest
+
+import bulk_send
+from campaign_checkpoint import CampaignCheckpoint, IN_FLIGHT, SENT
+from recipient_store import RecipientStore
+from sender_pool import SenderPool
+from shard_coordinator import ShardCoordinator, run_shard, merge, _ShardCheckpoint
+
+PHONES = ['56911111111', '56911111111', '56922222222']
+
+
+class RecordingTransport:
+    """Responde como la API y registra los teléfonos enviados."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, url, headers, payload):
+        self.sent.append(payload['to'])
+        return {'contacts': [{'wa_id': payload['to']}], 'messages': [{'id': f"wamid.{len(self.sent)}"}]}
+
+
+def _job(pair_interval=0):
+    return {'tipo': 'text', 'message': 'Hola {0}', 'pair_interval': pair_interval, 'validate': 'reject'}
+
+
+def _store(tmp_path, phones):
+    recipients = tmp_path / 'clientes.csv'
+    lines = ['phone,nombre'] + [f"{phone},Ana" for phone in phones]
+    recipients.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return RecipientStore.from_csv(str(recipients)), str(recipients)
+
+
+def _use_transport(monkeypatch, transport):
+    def make_sender(job, **kwargs):
+        return SenderPool.from_env(transport=transport, typed_results=True, **kwargs), None
+
+    monkeypatch.setattr(bulk_send, 'make_sender', make_sender)
+
+
+def _read_results(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        return list(csv.DictReader(file))
+
+
+def test_claim_takes_each_shard_once(tmp_path):
+    coordinator = ShardCoordinator.create(str(tmp_path / 'campania.db'), 'clientes.csv', 5, _job(), shard_size=2)
+    leases = [coordinator.claim(f"host{i}") for i in range(3)]
+
+    assert [(lease.shard, lease.start, lease.stop) for lease in leases] == [(0, 0, 2), (1, 2, 4), (2, 4, 5)]
+    assert all(lease.attempt == 1 and lease.valid() for lease in leases)
+    # Todos tomados y vigentes: no hay nada que reclamar hasta que venza alguno
+    assert coordinator.claim('host3') is None
+    assert coordinator.next_expiry() > 0
+    coordinator.close()
+
+
+def test_expired_lease_is_taken_over(tmp_path):
+    path = str(tmp_path / 'campania.db')
+    coordinator = ShardCoordinator.create(path, 'clientes.csv', 2, _job())
+    first = coordinator.claim('host1')
+
+    # El host1 deja de renovar y su lease vence
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE shards SET lease_until = 0 WHERE id = ?", (first.shard,))
+    conn.commit()
+    conn.close()
+
+    second = coordinator.claim('host2')
+    assert second.shard == first.shard
+    assert second.attempt == 2
+
+    # El host1 se entera al renovar y ya no puede dar el shard por terminado
+    assert not coordinator.renew(first)
+    assert not first.valid()
+    assert not coordinator.complete(first, {'sent': 2, 'failed': 0, 'unknown': 0, 'suppressed': 0})
+    assert coordinator.renew(second)
+    coordinator.close()
+
+
+def test_deferred_rows_are_fenced_by_lease(tmp_path, monkeypatch):
+    """Las filas diferidas por pair pacing no se envían después del vencimiento del lease."""
+    store, recipients = _store(tmp_path, PHONES)
+    transport = RecordingTransport()
+    _use_transport(monkeypatch, transport)
+    coordinator = ShardCoordinator.create(str(tmp_path / 'campania.db'), recipients, len(store), _job(pair_interval=1))
+
+    lease = coordinator.claim('host1')
+    # El lease vence antes de que la segunda fila (mismo teléfono) tenga su turno
+    lease.deadline = time.monotonic() + 0.3
+    assert not run_shard(coordinator, lease, store, workers=1, rate=1000)
+
+    assert transport.sent == ['56911111111', '56922222222']
+    checkpoint = CampaignCheckpoint(coordinator.shard_path(lease.shard, '.ckpt'))
+    counts = checkpoint.counts()
+    checkpoint.close()
+    assert counts['pending'] == 1 and counts['sent'] == 2
+    # El shard quedó libre para otro host
+    assert coordinator.shards()[0]['state'] == 'pending'
+
+    retry = coordinator.claim('host2')
+    assert retry.attempt == 2
+    assert run_shard(coordinator, retry, store, workers=1, rate=1000)
+    assert transport.sent == ['56911111111', '56922222222', '56911111111']
+    coordinator.close()
+
+
+def test_merge_keeps_best_result_per_row(tmp_path, monkeypatch):
+    store, recipients = _store(tmp_path, PHONES)
+    _use_transport(monkeypatch, RecordingTransport())
+    coordinator = ShardCoordinator.create(str(tmp_path / 'campania.db'), recipients, len(store), _job())
+    lease = coordinator.claim('host1')
+    assert run_shard(coordinator, lease, store, workers=2, rate=1000)
+
+    # Un intento posterior con la fila 0 fallida y la fila 1 repetida no baja ni duplica resultados
+    with open(coordinator.shard_path(lease.shard, '.a2.csv'), 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(bulk_send.RESULT_FIELDS)
+        writer.writerow((0, PHONES[0], 'error', '', 'HTTP 500'))
+        writer.writerow((1, PHONES[1], 'ok', 'wamid.retry', ''))
+
+    output = str(tmp_path / 'resultados.csv')
+    counts = merge(coordinator, output)
+    coordinator.close()
+
+    assert counts == {'ok': 3, 'error': 0, 'suppressed': 0}
+    results = _read_results(output)
+    assert [row['row'] for row in results] == ['0', '1', '2']
+    assert results[1]['message_id'] == 'wamid.retry'
+    checkpoint = CampaignCheckpoint(f"{output}.ckpt")
+    assert checkpoint.counts()['sent'] == 3
+    checkpoint.close()
+
+
+def test_work_rejects_recipients_with_other_content(tmp_path):
+    store, recipients = _store(tmp_path, PHONES)
+    coordinator = ShardCoordinator.create(
+        str(tmp_path / 'campania.db'), recipients, len(store), _job(), digest=store.digest()
+    )
+    coordinator.check_recipients(store)
+
+    # Mismas filas, otro orden: las filas ya enviadas serían otras personas
+    edited, _ = _store(tmp_path, list(reversed(PHONES)))
+    with pytest.raises(Exception, match='otro contenido'):
+        coordinator.check_recipients(edited)
+    shorter, _ = _store(tmp_path, PHONES[:2])
+    with pytest.raises(Exception, match='2 filas'):
+        coordinator.check_recipients(shorter)
+    coordinator.close()
+
+
+def test_in_flight_rows_are_flushed_before_sending():
+    class Checkpoint:
+        def __init__(self):
+            self.events = []
+
+        def mark(self, index, state):
+            self.events.append((index, state))
+
+        def flush(self):
+            self.events.append('flush')
+
+    checkpoint = Checkpoint()
+    shard_checkpoint = _ShardCheckpoint(checkpoint, 100)
+    shard_checkpoint.mark(105, IN_FLIGHT)
+    shard_checkpoint.mark(105, SENT)
+    assert checkpoint.events == [(5, IN_FLIGHT), 'flush', (5, SENT)]
@@ -0,0 +1,68 @@
+"""
+Pruebas de suppression.py: sin falsos negativos a través de las rotaciones diarias.
+"""
+
+import pytest
+
+import suppression
+from suppression import SuppressionFilter, SECONDS_PER_DAY
+
+DAY = 20000
+
+
+class Clock:
+    def __init__(self):
+        self.day = DAY
+
+    def time(self):
+        return self.day * SECONDS_PER_DAY + 3600
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(suppression.time, 'time', clock.time)
+    return clock
+
+
+def _phones(day, count=500):
+    return [f"569{day % 1000:03d}{n:05d}" for n in range(count)]
+
+
+def test_no_false_negatives_across_rotations(tmp_path, clock):
+    path = str(tmp_path / 'supresion.bloom')
+    # Capacidad chica a propósito: aun con filtros muy llenos no puede haber falsos negativos
+    bloom = SuppressionFilter(path, days=3, capacity=200, fp_rate=0.01)
+
+    for day in range(DAY, DAY + 6):
+        clock.day = day
+        for phone in _phones(day):
+            bloom.add(phone, 'promo')
+        # Todo lo enviado en los últimos 3 días (incluido hoy) sigue registrado
+        for previous in range(max(DAY, day - 2), day + 1):
+            assert all(bloom.seen(phone, 'promo') for phone in _phones(previous))
+    bloom.close()
+
+
+def test_old_days_expire_and_other_processes_see_entries(tmp_path, clock):
+    path = str(tmp_path / 'supresion.bloom')
+    bloom = SuppressionFilter(path, days=2, capacity=100000)
+    bloom.add('+56 9 1111-1111', 'promo')
+    assert bloom.seen('56911111111', 'promo')
+    assert not bloom.seen('56911111111', 'otra')
+
+    # Otro proceso que abre el mismo archivo ve el envío
+    other = SuppressionFilter(path)
+    assert other.seen('56911111111', 'promo')
+    assert other.days == 2
+
+    clock.day = DAY + 1
+    assert bloom.seen('56911111111', 'promo')
+    clock.day = DAY + 2
+    # El filtro de DAY se limpió al rotar
+    assert not bloom.seen('56911111111', 'promo')
+    assert not other.seen('56911111111', 'promo')
+    assert not bloom.check_and_add('56911111111', 'promo')
+    assert other.check_and_add('56911111111', 'promo')
+    bloom.close()
+    other.close()
@@ -0,0 +1,153 @@
+"""
+Pruebas de tenant_scheduler.py: reparto DRR, cuotas, aislamiento de latencia y cancelación.
+"""
+
+import time
+import threading
+
+import pytest
+
+from tenant_scheduler import TenantScheduler
+
+
+class RecordingSender:
+    """Sender falso: registra el orden de los envíos y puede demorar o bloquear."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self._lock = threading.Lock()
+
+    def send_text_message(self, to, message):
+        self.gate.wait()
+        if self.delay:
+            time.sleep(self.delay)
+        with self._lock:
+            self.calls.append(to)
+        return {'messages': [{'id': f"wamid.{to}"}]}
+
+
+def _blocked_scheduler(sender, **kwargs):
+    """Planificador con su único hilo bloqueado en un envío, para llenar las colas antes de despachar."""
+    scheduler = TenantScheduler(sender, workers=1, rate=1e6, **kwargs)
+    sender.gate.clear()
+    first = scheduler.submit('x', 'send_text_message', 'gate', 'hola')
+    while scheduler.metrics()['x']['queued'] != 0:
+        time.sleep(0.001)
+    return scheduler, first
+
+
+def test_drr_alternates_with_equal_weights():
+    sender = RecordingSender()
+    scheduler, first = _blocked_scheduler(sender)
+    futures = [scheduler.submit('a', 'send_text_message', f"a{i}", 'hola') for i in range(10)]
+    futures += [scheduler.submit('b', 'send_text_message', f"b{i}", 'hola') for i in range(10)]
+    sender.gate.set()
+    for future in [first] + futures:
+        future.result(timeout=5)
+    scheduler.close()
+
+    order = ''.join(to[0] for to in sender.calls[1:])
+    assert order == 'ab' * 10
+
+
+def test_drr_follows_weights():
+    sender = RecordingSender()
+    scheduler, first = _blocked_scheduler(sender, weights={'a': 2})
+    futures = [scheduler.submit('a', 'send_text_message', f"a{i}", 'hola') for i in range(10)]
+    futures += [scheduler.submit('b', 'send_text_message', f"b{i}", 'hola') for i in range(10)]
+    sender.gate.set()
+    for future in [first] + futures:
+        future.result(timeout=5)
+    scheduler.close()
+
+    order = ''.join(to[0] for to in sender.calls[1:])
+    assert order == 'aab' * 5 + 'b' * 5
+
+
+def test_max_queued_quota():
+    sender = RecordingSender()
+    scheduler, first = _blocked_scheduler(sender, max_queued={'a': 3})
+    futures = [scheduler.submit('a', 'send_text_message', f"a{i}", 'hola') for i in range(3)]
+    with pytest.raises(Exception, match='cuota de mensajes encolados'):
+        scheduler.submit('a', 'send_text_message', 'a3', 'hola')
+    # Otro tenant no se ve afectado por la cuota de 'a'
+    futures.append(scheduler.submit('b', 'send_text_message', 'b0', 'hola'))
+
+    sender.gate.set()
+    for future in [first] + futures:
+        future.result(timeout=5)
+    metrics = scheduler.metrics()
+    scheduler.close()
+
+    assert metrics['a']['rejected'] == 1
+    assert metrics['a']['completed'] == 3
+    assert metrics['b']['completed'] == 1
+
+
+def test_rate_quota_does_not_slow_other_tenants():
+    sender = RecordingSender()
+    scheduler = TenantScheduler(sender, workers=4, rate=1e6, rate_quotas={'lento': 20})
+
+    start = time.monotonic()
+    slow = [scheduler.submit('lento', 'send_text_message', f"l{i}", 'hola') for i in range(30)]
+    fast = [scheduler.submit('rapido', 'send_text_message', f"r{i}", 'hola') for i in range(30)]
+    for future in fast:
+        future.result(timeout=5)
+    fast_elapsed = time.monotonic() - start
+    for future in slow:
+        future.result(timeout=5)
+    slow_elapsed = time.monotonic() - start
+    scheduler.close()
+
+    # 20 de ráfaga y los otros 10 a 20 msg/s: al menos ~0.5 s
+    assert slow_elapsed >= 0.4
+    assert fast_elapsed < 0.3
+
+
+def test_backlog_does_not_delay_other_tenant():
+    """Con 400 mensajes encolados de un tenant, el envío de otro espera a lo más una vuelta."""
+    sender = RecordingSender(delay=0.005)
+    scheduler = TenantScheduler(sender, workers=2, rate=1e6)
+    backlog = [scheduler.submit('marketing', 'send_text_message', f"m{i}", 'hola') for i in range(400)]
+    time.sleep(0.05)
+
+    start = time.monotonic()
+    scheduler.submit('otp', 'send_text_message', 'otp', '123456').result(timeout=5)
+    latency = time.monotonic() - start
+    queued = scheduler.metrics()['marketing']['queued']
+
+    scheduler.close(wait=False)
+    for future in backlog:
+        future.cancel()
+
+    assert queued > 200
+    # En orden de llegada esperaría ~1 s (400 envíos de 5 ms con 2 hilos)
+    assert latency < 0.1
+
+
+def test_cancelled_send_does_not_take_global_token():
+    sender = RecordingSender()
+    # Dos tokens: uno para el envío que bloquea y otro para el que sigue
+    scheduler = TenantScheduler(sender, workers=1, rate=2)
+    sender.gate.clear()
+    first = scheduler.submit('a', 'send_text_message', 'gate', 'hola')
+    while scheduler.metrics()['a']['queued'] != 0:
+        time.sleep(0.001)
+
+    cancelled = scheduler.submit('a', 'send_text_message', 'cancelado', 'hola')
+    assert cancelled.cancel()
+    following = scheduler.submit('a', 'send_text_message', 'siguiente', 'hola')
+
+    start = time.monotonic()
+    sender.gate.set()
+    first.result(timeout=5)
+    following.result(timeout=5)
+    elapsed = time.monotonic() - start
+    scheduler.close()
+
+    assert 'cancelado' not in sender.calls
+    # Si el cancelado hubiera tomado un token, el siguiente esperaría ~0.5 s
+    assert elapsed < 0.3
@@ -0,0 +1,62 @@
+"""
+Pruebas de text_coalescing.py: textos seguidos desde un mismo hilo, orden y largo máximo.
+"""
+
+import threading
+
+from payload_validation import MAX_TEXT_CHARS
+from text_coalescing import TextCoalescer
+from whatsapp_sender_v2 import WhatsAppSender
+
+
+class RecordingTransport:
+    def __init__(self):
+        self.bodies = []
+        self.lock = threading.Lock()
+
+    def send(self, url, headers, payload):
+        with self.lock:
+            self.bodies.append(payload.get('text', {}).get('body', payload['type']))
+            number = len(self.bodies)
+        return {'contacts': [{'wa_id': payload['to']}], 'messages': [{'id': f"wamid.{number}"}]}
+
+
+def test_sequential_submits_from_one_thread_coalesce():
+    transport = RecordingTransport()
+    sender = WhatsAppSender(transport=transport, coalesce_linger=0.2)
+
+    first = sender.submit_text('56911111111', 'Pedido recibido')
+    second = sender.submit_text('56911111111', 'Pago confirmado')
+    assert not first.done()
+
+    assert second.result() == first.result()
+    assert transport.bodies == ['Pedido recibido\nPago confirmado']
+
+
+def test_submit_text_without_linger_sends_right_away():
+    transport = RecordingTransport()
+    sender = WhatsAppSender(transport=transport)
+    future = sender.submit_text('56911111111', 'Hola')
+    assert future.done() and transport.bodies == ['Hola']
+    assert sender.send_text_message('56911111111', 'Chao')['messages'][0]['id'] == 'wamid.2'
+
+
+def test_groups_respect_max_chars_and_order():
+    sent = []
+    coalescer = TextCoalescer(lambda to, body: sent.append(body) or len(sent), linger=0.2)
+    texts = ['a' * 3000, 'b' * 1000, 'c' * 200, 'd']
+    futures = [coalescer.submit('56911111111', text) for text in texts]
+    coalescer.close()
+
+    assert [len(body) for body in sent] == [3000 + 1 + 1000, 200 + 1 + 1]
+    assert all(len(body) <= MAX_TEXT_CHARS for body in sent)
+    assert [future.result() for future in futures] == [1, 1, 2, 2]
+    assert coalescer.stats() == {'texts': 4, 'messages': 2, 'pending': 0}
+
+
+def test_template_waits_for_pending_texts():
+    transport = RecordingTransport()
+    sender = WhatsAppSender(transport=transport, coalesce_linger=5)
+    sender.submit_text('56911111111', 'Hola')
+    sender.send_template_message('56911111111', 'aviso')
+    assert transport.bodies == ['Hola', 'template']
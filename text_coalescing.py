@@ -0,0 +1,151 @@
+"""
+Agrupación de mensajes de texto al mismo destinatario
+Cuando una integración manda varios textos seguidos a la misma persona (por
+ejemplo tres actualizaciones de estado en un segundo), se esperan `linger`
+segundos y se envían como un solo mensaje, uniendo los textos con un salto de
+línea. Ahorra llamadas a la API y cupo del límite de mensajes por segundo.
+
+- Un mensaje agrupado nunca supera `max_chars` (4096, el límite de WhatsApp):
+  si el texto siguiente no cabe, el grupo se envía ya y se empieza otro.
+- Orden: los textos de un destinatario se unen en el orden en que llegaron, y
+  los grupos sucesivos se envían uno después del otro, nunca en paralelo.
+- submit() no espera: retorna un Future con la respuesta del grupo (el mismo
+  message_id para todos sus textos) o su error. Así un mismo hilo puede mandar
+  varios textos seguidos y que se agrupen; send_text() espera el resultado.
+
+Uso:
+    sender = WhatsAppSender(coalesce_linger=0.5)
+    first = sender.submit_text(phone, "Pedido recibido")   # no espera
+    second = sender.submit_text(phone, "Pago confirmado")  # -> un solo mensaje
+    second.result()
+"""
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Any, List
+from payload_validation import MAX_TEXT_CHARS
+
+
+class _Group:
+    """Textos pendientes de un destinatario que saldrán en un solo mensaje."""
+
+    __slots__ = ('texts', 'length', 'future', 'ready', 'previous')
+
+    def __init__(self, previous: Future):
+        self.texts: List[str] = []
+        self.length = 0
+        self.future: Future = Future()
+        self.ready = threading.Event()
+        # Envío anterior del mismo destinatario: este grupo sale después
+        self.previous = previous
+
+
+class TextCoalescer:
+    """
+    Agrupa los textos a un mismo destinatario que llegan dentro de `linger` segundos.
+
+    Args:
+        send: Función (to, body) que envía un mensaje de texto y retorna la respuesta
+        linger: Segundos que se espera a que lleguen más textos
+        max_chars: Largo máximo del mensaje agrupado
+        separator: Texto que se pone entre los mensajes agrupados
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str, str], Any],
+        linger: float = 0.5,
+        max_chars: int = MAX_TEXT_CHARS,
+        separator: str = '\n'
+    ):
+        self.send = send
+        self.linger = linger
+        self.max_chars = max_chars
+        self.separator = separator
+
+        self._groups: Dict[str, _Group] = {}
+        self._last: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+
+        self.texts = 0
+        self.messages = 0
+
+    def submit(self, to: str, text: str) -> Future:
+        """Agrega el texto al grupo del destinatario y retorna el Future de su envío."""
+        leader = None
+        with self._lock:
+            self.texts += 1
+            group = self._groups.get(to)
+            if group is not None and group.length + len(self.separator) + len(text) > self.max_chars:
+                # No cabe: el grupo actual sale ya y este texto empieza otro
+                group.ready.set()
+                del self._groups[to]
+                group = None
+
+            if group is None:
+                group = leader = self._groups[to] = _Group(self._last.get(to))
+                self._last[to] = group.future
+            else:
+                group.length += len(self.separator)
+            group.texts.append(text)
+            group.length += len(text)
+
+        if leader is not None:
+            threading.Thread(target=self._flush_group, args=(to, leader), daemon=True).start()
+        return group.future
+
+    def send_text(self, to: str, text: str) -> Any:
+        """Como submit, pero espera el envío y retorna la respuesta (o lanza su error)."""
+        return self.submit(to, text).result()
+
+    def _flush_group(self, to: str, group: _Group) -> None:
+        group.ready.wait(self.linger)
+        with self._lock:
+            if self._groups.get(to) is group:
+                del self._groups[to]
+
+        # Los grupos del mismo destinatario salen en orden
+        if group.previous is not None:
+            try:
+                group.previous.result()
+            except Exception:
+                pass
+
+        try:
+            result = self.send(to, self.separator.join(group.texts))
+        except Exception as e:
+            group.future.set_exception(e)
+        else:
+            group.future.set_result(result)
+        finally:
+            with self._lock:
+                self.messages += 1
+                if self._last.get(to) is group.future:
+                    del self._last[to]
+
+    def flush(self, to: str) -> None:
+        """
+        Envía ya los textos pendientes del destinatario y espera a que salgan (por
+        ejemplo, antes de mandarle una plantilla, para no alterar el orden).
+        """
+        with self._lock:
+            group = self._groups.get(to)
+            if group is not None:
+                group.ready.set()
+            last = self._last.get(to)
+        if last is not None:
+            try:
+                last.result()
+            except Exception:
+                pass
+
+    def close(self) -> None:
+        """Envía todos los textos pendientes y espera a que salgan."""
+        with self._lock:
+            recipients = list(self._last)
+        for to in recipients:
+            self.flush(to)
+
+    def stats(self) -> Dict[str, int]:
+        """Textos recibidos y mensajes realmente enviados."""
+        return {'texts': self.texts, 'messages': self.messages, 'pending': len(self._groups)}
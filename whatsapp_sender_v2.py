@@ -13,10 +13,21 @@ Incluye envío de:
 
 import os
 import sys
+import json
+import time
 import requests
 from pathlib import Path
+from contextlib import nullcontext
+from concurrent.futures import Future
 from dotenv import load_dotenv
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Union, Iterator
+from send_result import SendResult
+from circuit_breaker import CircuitBreaker
+from single_flight import SingleFlight
+from text_coalescing import TextCoalescer
+from payload_validation import PayloadValidator
+from graph_errors import GraphAPIError
+from http_transport import Transport, HTTPTransport, RequestsTransport, TransportError, default_timeout
 
 # Configurar codificación UTF-8 para Windows
 if sys.platform == 'win32':
@@ -30,11 +41,53 @@ load_dotenv()
 class WhatsAppSender:
     """Clase principal para enviar mensajes mediante WhatsApp Business API."""
 
-    def __init__(self):
-        self.access_token = os.getenv('WHATSAPP_ACCESS_TOKEN')
-        self.phone_number_id = os.getenv('WHATSAPP_PHONE_NUMBER_ID')
-        self.waba_id = os.getenv('WHATSAPP_BUSINESS_ACCOUNT_ID')  # Opcional, para listar plantillas
-        self.api_version = os.getenv('WHATSAPP_API_VERSION', 'v21.0')
+    def __init__(
+        self,
+        access_token: Optional[str] = None,
+        phone_number_id: Optional[str] = None,
+        waba_id: Optional[str] = None,
+        api_version: Optional[str] = None,
+        transport: Optional[Transport] = None,
+        typed_results: bool = False,
+        keep_raw: bool = False,
+        circuit_breaker: bool = True,
+        coalesce_linger: Optional[float] = None,
+        validate: Optional[str] = None
+    ):
+        """
+        Las credenciales no indicadas se leen del .env (ver env_template.txt).
+        Pasarlas explícitamente permite tener varios números en un mismo proceso
+        (ver sender_pool.py).
+
+        transport: objeto opcional con send(url, headers, payload) -> dict por el que
+        se envían los mensajes en lugar de un POST directo (ej. GraphBatchTransport).
+        Un HTTPTransport (ej. HTTP2Transport) solo reemplaza la capa HTTP del POST;
+        por defecto se usa RequestsTransport (ver http_transport.py).
+
+        typed_results: si es True, los métodos send_* retornan un SendResult compacto
+        en lugar del dict con la respuesta completa.
+
+        keep_raw: con typed_results, guarda además la respuesta completa en cada
+        SendResult (result.raw); por defecto no se guarda y result.raw es None.
+
+        circuit_breaker: si es True (por defecto), cada endpoint (mensajes, media,
+        plantillas) tiene un circuito que falla al instante con CircuitOpenError
+        mientras la Graph API está caída (ver circuit_breaker.py).
+
+        coalesce_linger: si se indica, los textos al mismo destinatario que llegan
+        dentro de esos segundos se envían como un solo mensaje (ver text_coalescing.py).
+
+        validate: None (por defecto) envía los payloads tal como llegan; 'reject' hace
+        fallar al instante con PayloadError los que la API rechazaría (textos de más
+        de 4096 caracteres, parámetros con saltos de línea o que no son texto, idiomas
+        inválidos); 'fix' los corrige, convirtiendo con str() los parámetros que no
+        son texto (ver payload_validation.py). bulk_send.py y shard_coordinator.py
+        usan 'reject' por defecto.
+        """
+        self.access_token = access_token or os.getenv('WHATSAPP_ACCESS_TOKEN')
+        self.phone_number_id = phone_number_id or os.getenv('WHATSAPP_PHONE_NUMBER_ID')
+        self.waba_id = waba_id or os.getenv('WHATSAPP_BUSINESS_ACCOUNT_ID')  # Opcional, para listar plantillas
+        self.api_version = api_version or os.getenv('WHATSAPP_API_VERSION', 'v21.0')
 
         if not self.access_token or not self.phone_number_id:
             raise ValueError(
@@ -43,6 +96,46 @@ class WhatsAppSender:
 
         self.base_url = f"https://graph.facebook.com/{self.api_version}/{self.phone_number_id}/messages"
 
+        # Sesión HTTP reutilizable: mantiene conexiones TLS abiertas (keep-alive)
+        # entre envíos en lugar de hacer un handshake nuevo por petición.
+        self.session = requests.Session()
+        self.transport = transport
+        self.typed_results = typed_results
+        self.keep_raw = keep_raw
+
+        # Ninguna petición espera indefinidamente: (conexión, lectura) en segundos
+        self.timeout = default_timeout()
+        # Capa HTTP de los envíos de mensajes (media y plantillas usan la sesión)
+        if isinstance(transport, HTTPTransport):
+            self.http = transport
+        else:
+            self.http = RequestsTransport(self.session, self.timeout)
+
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        if circuit_breaker:
+            self.breakers = {
+                endpoint: CircuitBreaker(endpoint, probe=self._probe)
+                for endpoint in ('messages', 'media', 'templates')
+            }
+
+        # Cachés en memoria (útiles en procesos de larga vida, ej. sender_daemon.py)
+        self._media_cache: Dict[tuple, str] = {}
+        self._templates_cache: Optional[Dict[str, Any]] = None
+        self._templates_cache_time = 0.0
+        self.templates_cache_ttl = float(os.getenv('WHATSAPP_TEMPLATES_CACHE_TTL', '300'))
+
+        # Peticiones idénticas simultáneas (catálogo, misma imagen, mismo estado) se
+        # hacen una sola vez y comparten el resultado (ver single_flight.py)
+        self.flight = SingleFlight()
+
+        if validate not in ('reject', 'fix', None):
+            raise ValueError("validate debe ser 'reject', 'fix' o None")
+        self.validator = PayloadValidator(fix=validate == 'fix') if validate else None
+
+        self.coalescer: Optional[TextCoalescer] = None
+        if coalesce_linger is not None:
+            self.coalescer = TextCoalescer(self._send_text_now, linger=coalesce_linger)
+
     def _get_headers(self) -> Dict[str, str]:
         """Headers de autorización."""
         return {
@@ -54,15 +147,56 @@ class WhatsAppSender:
         """Normaliza el número al formato internacional requerido por Meta."""
         return phone.replace(' ', '').replace('-', '').replace('+', '')
 
+    def warm_up(self) -> None:
+        """
+        Abre por adelantado la conexión TLS con graph.facebook.com (no envía mensajes),
+        para que el primer envío real no pague el handshake.
+        """
+        try:
+            self.session.head(f"https://graph.facebook.com/{self.api_version}/", timeout=5)
+        except requests.exceptions.RequestException:
+            pass
+
+    def _probe(self) -> None:
+        """Petición de prueba para los circuitos abiertos (no envía mensajes)."""
+        response = self.session.head(f"https://graph.facebook.com/{self.api_version}/", timeout=5)
+        if response.status_code >= 500:
+            raise Exception(f"Graph API respondió {response.status_code}")
+
+    def _guard(self, endpoint: str):
+        """Circuito del endpoint (lanza CircuitOpenError si está abierto)."""
+        breaker = self.breakers.get(endpoint)
+        return breaker.guard() if breaker is not None else nullcontext()
+
     # ===============================
     # 📌 MENSAJES DE TEXTO (24H)
     # ===============================
     def send_text_message(self, to: str, message: str) -> Dict[str, Any]:
         """
         Envía un mensaje de texto gratuito mientras estés dentro de la ventana de 24 horas.
+        Con coalesce_linger, espera a agruparlo con otros textos al mismo destinatario
+        (para mandar varios seguidos desde un mismo hilo, ver submit_text).
+        """
+        return self.submit_text(to, message).result()
+
+    def submit_text(self, to: str, message: str) -> Future:
+        """
+        Como send_text_message, pero sin esperar: retorna un Future con la respuesta.
+        Con coalesce_linger los textos que se envían seguidos al mismo destinatario
+        salen en un solo mensaje; sin él, el texto se envía antes de retornar.
         """
         formatted_phone = self._format_phone_number(to)
+        if self.coalescer is not None:
+            return self.coalescer.submit(formatted_phone, message)
 
+        future: Future = Future()
+        try:
+            future.set_result(self._send_text_now(formatted_phone, message))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _send_text_now(self, formatted_phone: str, message: str) -> Dict[str, Any]:
         payload = {
             "messaging_product": "whatsapp",
             "recipient_type": "individual",
@@ -247,11 +381,21 @@ class WhatsAppSender:
         """
         if not os.path.exists(file_path):
             raise FileNotFoundError(f"No se encontró el archivo: {file_path}")
-        
+
+        # Si el mismo archivo (sin modificaciones) ya se subió, reutilizar la URL
+        stat = os.stat(file_path)
+        cache_key = (os.path.abspath(file_path), stat.st_mtime, stat.st_size, media_type)
+        if cache_key in self._media_cache:
+            return self._media_cache[cache_key]
+
+        return self.flight.do(('media',) + cache_key, self._upload_media, file_path, media_type, cache_key)
+
+    def _upload_media(self, file_path: str, media_type: str, cache_key: tuple) -> str:
+        """Sube el archivo (una sola vez aunque varios hilos lo pidan a la vez)."""
         media_url = f"https://graph.facebook.com/{self.api_version}/{self.phone_number_id}/media"
         
         try:
-            with open(file_path, 'rb') as file:
+            with self._guard('media'), open(file_path, 'rb') as file:
                 files = {
                     'file': (os.path.basename(file_path), file, f'image/{file_path.split(".")[-1]}')
                 }
@@ -263,11 +407,12 @@ class WhatsAppSender:
                     'Authorization': f'Bearer {self.access_token}'
                 }
                 
-                response = requests.post(
+                response = self.session.post(
                     media_url,
                     headers=headers,
                     files=files,
-                    data=data
+                    data=data,
+                    timeout=self.timeout
                 )
                 response.raise_for_status()
                 result = response.json()
@@ -279,9 +424,10 @@ class WhatsAppSender:
                 
                 # Obtener la URL de la imagen desde el media_id
                 media_info_url = f"https://graph.facebook.com/{self.api_version}/{media_id}"
-                info_response = requests.get(
+                info_response = self.session.get(
                     media_info_url,
-                    headers=headers
+                    headers=headers,
+                    timeout=self.timeout
                 )
                 info_response.raise_for_status()
                 media_info = info_response.json()
@@ -289,6 +435,7 @@ class WhatsAppSender:
                 # La URL puede estar en diferentes campos según la API
                 url = media_info.get('url') or media_info.get('link')
                 if url:
+                    self._media_cache[cache_key] = url
                     return url
                 
                 # Para plantillas, WhatsApp requiere URLs públicas accesibles
@@ -298,8 +445,9 @@ class WhatsAppSender:
                 
                 # Intentar verificar si la URL es accesible
                 try:
-                    test_response = requests.head(download_url, headers=headers, timeout=5)
+                    test_response = self.session.head(download_url, headers=headers, timeout=5)
                     if test_response.status_code == 200:
+                        self._media_cache[cache_key] = download_url
                         return download_url
                 except:
                     pass
@@ -324,50 +472,141 @@ class WhatsAppSender:
     # ===============================
     # 📋 LISTAR PLANTILLAS DISPONIBLES
     # ===============================
-    def list_templates(self) -> Dict[str, Any]:
+    def list_templates(self, refresh: bool = False) -> Dict[str, Any]:
         """
         Lista todas las plantillas disponibles en tu cuenta de WhatsApp Business.
         Requiere el WhatsApp Business Account ID (WABA ID) en la variable de entorno
         WHATSAPP_BUSINESS_ACCOUNT_ID, o se intentará obtenerlo automáticamente.
+
+        El catálogo se guarda en memoria durante WHATSAPP_TEMPLATES_CACHE_TTL segundos
+        (300 por defecto). Usa refresh=True para forzar una nueva consulta.
         """
-        waba_id = self.waba_id
-        
-        # Si no está en .env, intentar obtenerlo desde el access token
-        if not waba_id:
+        if (
+            not refresh
+            and self._templates_cache is not None
+            and time.monotonic() - self._templates_cache_time < self.templates_cache_ttl
+        ):
+            return self._templates_cache
+
+        return self.flight.do('templates', self._fetch_templates)
+
+    def _fetch_templates(self) -> Dict[str, Any]:
+        """Descarga el catálogo completo y lo guarda en la caché."""
+        self._templates_cache = {'data': list(self.iter_templates())}
+        self._templates_cache_time = time.monotonic()
+        return self._templates_cache
+
+    def iter_templates(
+        self,
+        waba_id: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        status: Optional[str] = None,
+        category: Optional[str] = None,
+        language: Optional[str] = None,
+        page_size: int = 100
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Recorre las plantillas de un WABA página por página (siguiendo los cursores
+        de la Graph API), entregando cada plantilla apenas llega su página.
+
+        Args:
+            waba_id: WABA a consultar (por defecto WHATSAPP_BUSINESS_ACCOUNT_ID)
+            fields: Campos a pedir (ej. ['name', 'status']); por defecto todos
+            status: Filtro del lado del servidor (APPROVED, PENDING, REJECTED, ...)
+            category: Filtro por categoría (UTILITY, MARKETING, AUTHENTICATION)
+            language: Filtro por idioma (ej. es_CL)
+            page_size: Plantillas por página
+        """
+        waba_id = waba_id or self._require_waba_id()
+
+        params = {'limit': page_size}
+        if fields:
+            params['fields'] = ','.join(fields)
+        if status:
+            params['status'] = status.upper()
+        if category:
+            params['category'] = category.upper()
+        if language:
+            params['language'] = language
+
+        url = f"https://graph.facebook.com/{self.api_version}/{waba_id}/message_templates"
+        while url:
             try:
-                # Obtener información del usuario/app para encontrar el WABA ID
-                me_url = f"https://graph.facebook.com/{self.api_version}/me"
-                response = requests.get(
-                    me_url,
-                    headers=self._get_headers()
-                )
-                response.raise_for_status()
-                
-                # Intentar obtener WABA desde el access token (puede requerir permisos adicionales)
-                # Si esto no funciona, el usuario debe agregar WHATSAPP_BUSINESS_ACCOUNT_ID al .env
-                raise Exception(
-                    "No se encontró WHATSAPP_BUSINESS_ACCOUNT_ID en .env. "
-                    "Agrega esta variable con tu WABA ID. "
-                    "Puedes encontrarlo en Meta Business Manager > Configuración de WhatsApp > Configuración de API"
-                )
-            except requests.exceptions.RequestException:
-                raise Exception(
-                    "No se encontró WHATSAPP_BUSINESS_ACCOUNT_ID en .env. "
-                    "Agrega esta variable con tu WABA ID."
-                )
-        
-        # Listar plantillas
+                with self._guard('templates'):
+                    response = self.session.get(
+                        url,
+                        headers=self._get_headers(),
+                        params=params,
+                        timeout=self.timeout
+                    )
+                    response.raise_for_status()
+            except requests.exceptions.RequestException as e:
+                error_msg = f"❌ Error listando plantillas: {str(e)}"
+                if hasattr(e, 'response') and e.response is not None:
+                    try:
+                        detail = e.response.json()
+                        error_msg += f"\nDetalles: {detail}"
+                    except:
+                        error_msg += f"\nStatus Code: {e.response.status_code}"
+                raise Exception(error_msg)
+
+            page = response.json()
+            yield from page.get('data', [])
+
+            # La URL "next" ya incluye los filtros, los campos y el cursor
+            url = page.get('paging', {}).get('next')
+            params = None
+
+    def _require_waba_id(self) -> str:
+        """WABA ID del .env o un error explicando cómo configurarlo."""
+        if self.waba_id:
+            return self.waba_id
+
         try:
-            templates_url = f"https://graph.facebook.com/{self.api_version}/{waba_id}/message_templates"
-            response = requests.get(
-                templates_url,
-                headers=self._get_headers()
+            # Obtener información del usuario/app para encontrar el WABA ID
+            me_url = f"https://graph.facebook.com/{self.api_version}/me"
+            response = self.session.get(
+                me_url,
+                headers=self._get_headers(),
+                timeout=self.timeout
             )
             response.raise_for_status()
+
+            # Intentar obtener WABA desde el access token (puede requerir permisos adicionales)
+            # Si esto no funciona, el usuario debe agregar WHATSAPP_BUSINESS_ACCOUNT_ID al .env
+            raise Exception(
+                "No se encontró WHATSAPP_BUSINESS_ACCOUNT_ID en .env. "
+                "Agrega esta variable con tu WABA ID. "
+                "Puedes encontrarlo en Meta Business Manager > Configuración de WhatsApp > Configuración de API"
+            )
+        except requests.exceptions.RequestException:
+            raise Exception(
+                "No se encontró WHATSAPP_BUSINESS_ACCOUNT_ID en .env. "
+                "Agrega esta variable con tu WABA ID."
+            )
+
+    # ===============================
+    # 📌 ESTADO DE UN MENSAJE
+    # ===============================
+    def get_message_status(self, message_id: str) -> Dict[str, Any]:
+        """
+        Consulta un mensaje enviado (wamid.xxx) en la Graph API. Si varios hilos
+        consultan el mismo mensaje a la vez, se hace una sola petición.
+        """
+        return self.flight.do(('status', message_id), self._fetch_message_status, message_id)
+
+    def _fetch_message_status(self, message_id: str) -> Dict[str, Any]:
+        try:
+            with self._guard('messages'):
+                response = self.session.get(
+                    f"https://graph.facebook.com/{self.api_version}/{message_id}",
+                    headers=self._get_headers(),
+                    timeout=self.timeout
+                )
+                response.raise_for_status()
             return response.json()
-            
         except requests.exceptions.RequestException as e:
-            error_msg = f"❌ Error listando plantillas: {str(e)}"
+            error_msg = f"❌ Error al verificar mensaje: {str(e)}"
             if hasattr(e, 'response') and e.response is not None:
                 try:
                     detail = e.response.json()
@@ -376,28 +615,54 @@ class WhatsAppSender:
                     error_msg += f"\nStatus Code: {e.response.status_code}"
             raise Exception(error_msg)
 
+    def send_payload(self, payload: Dict[str, Any], validated: bool = False) -> Union[Dict[str, Any], SendResult]:
+        """
+        Envía un payload ya armado de la API de mensajes (ej. el pre-renderizado
+        de otp_service.py) por la misma vía que los demás envíos. validated=True
+        omite la validación para payloads cuyas partes ya se revisaron.
+        """
+        return self._post(payload, validated=validated)
+
     # ===============================
     # 📌 FUNCIÓN PRIVADA PARA PETICIONES
     # ===============================
-    def _post(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-        """Maneja la petición POST y errores."""
+    def _post(self, payload: Dict[str, Any], validated: bool = False) -> Union[Dict[str, Any], SendResult]:
+        """
+        Maneja la petición POST y errores. validated=True omite la validación para
+        payloads ya revisados (ver send_payload).
+        """
+        # Una plantilla no se adelanta a los textos del mismo destinatario aún agrupándose
+        if self.coalescer is not None and payload.get('type') != 'text':
+            self.coalescer.flush(payload['to'])
+
+        if self.validator is not None and not validated:
+            payload = self.validator.payload(payload)
+
+        start = time.perf_counter()
+
+        if self.transport is not None and self.transport is not self.http:
+            result = self.transport.send(self.base_url, self._get_headers(), payload)
+            if self.typed_results:
+                return SendResult.from_dict(result, time.perf_counter() - start, self.keep_raw)
+            return result
+
         try:
-            response = requests.post(
-                self.base_url,
-                headers=self._get_headers(),
-                json=payload
-            )
-            response.raise_for_status()
-            return response.json()
+            with self._guard('messages'):
+                content = self.http.send_bytes(self.base_url, self._get_headers(), payload)
+            if self.typed_results:
+                return SendResult.from_bytes(content, time.perf_counter() - start, self.keep_raw)
+            return json.loads(content)
 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, TransportError) as e:
             error_msg = f"❌ Error enviando mensaje: {str(e)}"
+            status, detail = 0, None
 
             if hasattr(e, 'response') and e.response is not None:
+                status = e.response.status_code
                 try:
                     detail = e.response.json()
                     error_msg += f"\nDetalles: {detail}"
                 except:
                     error_msg += f"\nStatus Code: {e.response.status_code}"
 
-            raise Exception(error_msg)
+            raise GraphAPIError(error_msg, status, detail)